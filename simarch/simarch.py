@@ -14,6 +14,11 @@ import numbers
 import collections
 import sys
 import operator
+import bisect
+import heapq
+import array
+import itertools
+import re
 
 __author__ = "Pavel Pisa"
 __copyright__ = "Copyright 2017-2019, Czech Technical University"
@@ -93,6 +98,7 @@ argdesbycode = {
     'J': argdes('n', 'CODE19', 0, 0x7ffff, 0) , # 19 bit wait function code (OP_*_CODE19)
     'x': argdes('g', 'ign', 0, 31, 0) , # accept and ignore register name
     'z': argdes('n', 'ign', 0, 0, 0) , # must be zero register
+    'G': argdes('n', 'RD', 0, 31, 0) , # coprocessor 0 register number (OP_*_RD)
 }
 
 instdes = collections.namedtuple('instdes', ['name', 'args', 'match',
@@ -138,10 +144,55 @@ IOCT    = 0x00000001
 IOCTP   = 0x00000002
 IOCT2   = 0x00000004
 
+REG_HI    = 32
+REG_LO    = 33
+REG_HILO_MASK = (1 << REG_HI) | (1 << REG_LO)
+
 DEP_RAW   = 1
 DEP_WAW   = 2
 DEP_MEM_POSSIBLE  = 4
 
+# Instruction operation results, None means normal completion
+EXEC_STOP = 1       # not executed, state unchanged and run stopped
+EXEC_REDIRECT = 2   # control flow has been set by the operation
+EXEC_EXCEPTION = 3  # not completed, exception is delivered by run loop
+
+# Exception codes (CP0 Cause ExcCode field)
+EXC_INT   = 0
+EXC_ADEL  = 4       # address error on load
+EXC_ADES  = 5       # address error on store
+EXC_SYS   = 8
+EXC_BP    = 9
+EXC_RI    = 10      # reserved or unimplemented instruction
+EXC_OV    = 12
+EXC_TR    = 13      # trap, used for division by zero
+
+CP0_BADVADDR = 8
+CP0_COUNT    = 9
+CP0_COMPARE  = 11
+CP0_STATUS   = 12
+CP0_CAUSE    = 13
+CP0_EPC      = 14
+CP0_PRID     = 15
+
+CAUSE_BD = 0x80000000
+CAUSE_EXCCODE = 0x0000007c
+CAUSE_IP = 0x0000ff00
+
+IRQ_TIMER = 7       # Count/Compare interrupt line (Cause IP7)
+
+EVENT_NEVER = 1 << 64
+
+if array.array('I').itemsize == 4:
+    WORDTYPE = 'I'
+else:
+    WORDTYPE = 'L'
+
+DATA_BASE = 0x10010000
+
+labelre = re.compile(r'\s*([A-Za-z0-9_.$]+)\s*:')
+stringre = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
 # Instructions array extracted from GNU binutils
 instdeslist = [
     instdes("nop", [], 0x00000000, 0xffffffff, 0, INSN2_ALIAS, I1, 0),
@@ -192,6 +243,7 @@ instdeslist = [
     instdes("lhu", ['t','o(b)'], 0x94000000, 0xfc000000, LDD|RD_b|WR_t, 0, I1, 0),
     instdes("lui", ['t','u'], 0x3c000000, 0xffe00000, WR_t, 0, I1, 0),
     instdes("lw", ['t','o(b)'], 0x8c000000, 0xfc000000, LDD|RD_b|WR_t, 0, I1, 0),
+    instdes("ll", ['t','o(b)'], 0xc0000000, 0xfc000000, LDD|RD_b|WR_t, 0, I1, 0),
     instdes("lwc0", ['E','o(b)'], 0xc0000000, 0xfc000000, CLD|RD_b|WR_CC, 0, I1, IOCT|IOCTP|IOCT2),
     instdes("lwc2", ['E','o(b)'], 0xc8000000, 0xfc000000, CLD|RD_b|WR_CC, 0, I1, IOCT|IOCTP|IOCT2),
     instdes("lwc3", ['E','o(b)'], 0xcc000000, 0xfc000000, CLD|RD_b|WR_CC, 0, I1, IOCT|IOCTP|IOCT2),
@@ -232,6 +284,7 @@ instdeslist = [
     instdes("sub", ['d','v','t'], 0x00000022, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
     instdes("subu", ['d','v','t'], 0x00000023, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
     instdes("sw", ['t','o(b)'], 0xac000000, 0xfc000000, SM|RD_t|RD_b, 0, I1, 0),
+    instdes("sc", ['t','o(b)'], 0xe0000000, 0xfc000000, SM|RD_t|WR_t|RD_b, 0, I1, 0),
     instdes("swc0", ['E','o(b)'], 0xe0000000, 0xfc000000, SM|RD_C0|RD_b, 0, I1, IOCT|IOCTP|IOCT2),
     instdes("swc2", ['E','o(b)'], 0xe8000000, 0xfc000000, SM|RD_C2|RD_b, 0, I1, IOCT|IOCTP|IOCT2),
     instdes("swc3", ['E','o(b)'], 0xec000000, 0xfc000000, SM|RD_C3|RD_b, 0, I1, IOCT|IOCTP|IOCT2),
@@ -264,129 +317,131 @@ instdeslist = [
     instdes("c3", ['C'], 0x4e000000, 0xfe000000, CP, 0, I1, IOCT|IOCTP|IOCT2),
 ]
 
+"""
+   RISC-V RV32I argument codes (follow GNU binutils riscv-opc.c naming)
+
+   "d" 5 bit destination register specifier (rd)
+   "s" 5 bit source register 1 specifier (rs1)
+   "t" 5 bit source register 2 specifier (rs2)
+   "j" 12 bit signed immediate (I-type)
+   "o" 12 bit signed load/jalr offset (I-type)
+   "q" 12 bit signed store offset (S-type)
+   "p" 13 bit PC relative branch offset (B-type)
+   "a" 21 bit PC relative jump offset (J-type)
+   "u" 20 bit upper immediate (U-type)
+   ">" 5 bit shift amount
+"""
+
+argdesbycode_rv = {
+    'd': argdes('g', 'RD', 0, 31, 0),    # 5 bit destination register specifier (rd)
+    's': argdes('g', 'RS', 0, 31, 0),    # 5 bit source register 1 specifier (rs1)
+    't': argdes('g', 'RT', 0, 31, 0),    # 5 bit source register 2 specifier (rs2)
+    'j': argdes('n', 'IMM_I', -0x800, 0x7ff, 0), # 12 bit signed immediate (I-type)
+    'o': argdes('o', 'IMM_I', -0x800, 0x7ff, 0), # 12 bit signed load/jalr offset (I-type)
+    'q': argdes('o', 'IMM_S', -0x800, 0x7ff, 0), # 12 bit signed store offset (S-type)
+    'p': argdes('p', 'IMM_B', -0x1000, 0xffe, 1), # 13 bit PC relative branch offset (B-type)
+    'a': argdes('p', 'IMM_J', -0x100000, 0xffffe, 1), # 21 bit PC relative jump offset (J-type)
+    'u': argdes('n', 'IMM_U', 0, 0xfffff, 0), # 20 bit upper immediate (U-type)
+    '>': argdes('n', 'SHAMT', 0, 31, 0),  # 5 bit shift amount
+}
+
+# RISC-V immediates are scattered over the instruction word,
+# fields lists (value startbit, bits, instruction startbit)
+immdes = collections.namedtuple('immdes', ['fields', 'bits', 'signed'])
+
+immdesbycode_rv = {
+    'IMM_I' : immdes([(0, 12, 20)], 12, True),
+    'IMM_S' : immdes([(0, 5, 7), (5, 7, 25)], 12, True),
+    'IMM_B' : immdes([(1, 4, 8), (5, 6, 25), (11, 1, 7), (12, 1, 31)], 13, True),
+    'IMM_U' : immdes([(0, 20, 12)], 20, False),
+    'IMM_J' : immdes([(1, 10, 21), (11, 1, 20), (12, 8, 12), (20, 1, 31)], 21, True),
+    'SHAMT' : immdes([(0, 5, 20)], 5, False),
+}
+
+def imm_encode_rv(immdes, value):
+    encoding = 0
+    for vbit, bits, ibit in immdes.fields:
+        encoding |= ((value >> vbit) & ((1 << bits) - 1)) << ibit
+    return encoding
+
+def imm_decode_rv(immdes, encoding):
+    value = 0
+    for vbit, bits, ibit in immdes.fields:
+        value |= ((encoding >> ibit) & ((1 << bits) - 1)) << vbit
+    if immdes.signed and (value & (1 << (immdes.bits - 1))):
+        value -= 1 << immdes.bits
+    return value
+
+# WR_31 marks RISC-V forms which implicitly write link register ra (x1)
 instdeslist_rv = [
-    instdes("nop", [], 0x00000000, 0xffffffff, 0, INSN2_ALIAS, I1, 0),
-#    instdes("ssnop", [], 0x00000040, 0xffffffff, 0, INSN2_ALIAS, I1, 0),
-#    instdes("ehb", [], 0x000000c0, 0xffffffff, 0, INSN2_ALIAS, I1, 0),
-    instdes("li", ['t','j'], 0x24000000, 0xffe00000, WR_t, INSN2_ALIAS, I1, 0),
-    instdes("li", ['t','i'], 0x34000000, 0xffe00000, WR_t, INSN2_ALIAS, I1, 0),
-    instdes("move", ['d','s'], 0x00000021, 0xfc1f07ff, WR_d|RD_s, INSN2_ALIAS, I1, 0),
-    instdes("move", ['d','s'], 0x00000025, 0xfc1f07ff, WR_d|RD_s, INSN2_ALIAS, I1, 0),
-    instdes("b", ['p'], 0x10000000, 0xffff0000, UBD, INSN2_ALIAS, I1, 0),
-    instdes("b", ['p'], 0x04010000, 0xffff0000, UBD, INSN2_ALIAS, I1, 0),
-#    instdes("bal", ['p'], 0x04110000, 0xffff0000, UBD|WR_31, INSN2_ALIAS, I1, 0),
-    instdes("add", ['d','v','t'], 0x00000020, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
-    instdes("addi", ['t','r','j'], 0x20000000, 0xfc000000, WR_t|RD_s, 0, I1, 0),
-    instdes("addiu", ['t','r','j'], 0x24000000, 0xfc000000, WR_t|RD_s, 0, I1, 0),
-    instdes("addu", ['d','v','t'], 0x00000021, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
-    instdes("and", ['d','v','t'], 0x00000024, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
-    instdes("andi", ['t','r','i'], 0x30000000, 0xfc000000, WR_t|RD_s, 0, I1, 0),
-    instdes("beqz", ['s','p'], 0x10000000, 0xfc1f0000, CBD|RD_s, 0, I1, 0),
-    instdes("beq", ['s','t','p'], 0x10000000, 0xfc000000, CBD|RD_s|RD_t, 0, I1, 0),
-    instdes("bgez", ['s','p'], 0x04010000, 0xfc1f0000, CBD|RD_s, 0, I1, 0),
-    instdes("bgezal", ['s','p'], 0x04110000, 0xfc1f0000, CBD|RD_s|WR_31, 0, I1, 0),
-    instdes("bgtz", ['s','p'], 0x1c000000, 0xfc1f0000, CBD|RD_s, 0, I1, 0),
-    instdes("blez", ['s','p'], 0x18000000, 0xfc1f0000, CBD|RD_s, 0, I1, 0),
-    instdes("bltz", ['s','p'], 0x04000000, 0xfc1f0000, CBD|RD_s, 0, I1, 0),
-    instdes("bltzal", ['s','p'], 0x04100000, 0xfc1f0000, CBD|RD_s|WR_31, 0, I1, 0),
-    instdes("bnez", ['s','p'], 0x14000000, 0xfc1f0000, CBD|RD_s, 0, I1, 0),
-    instdes("bne", ['s','t','p'], 0x14000000, 0xfc000000, CBD|RD_s|RD_t, 0, I1, 0),
-    instdes("break", [], 0x0000000d, 0xffffffff, TRAP, 0, I1, 0),
-    instdes("break", ['c'], 0x0000000d, 0xfc00ffff, TRAP, 0, I1, 0),
-    instdes("break", ['c','q'], 0x0000000d, 0xfc00003f, TRAP, 0, I1, 0),
-#    instdes("cfc0", ['t','G'], 0x40400000, 0xffe007ff, LCD|WR_t|RD_C0, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("ctc0", ['t','G'], 0x40c00000, 0xffe007ff, COD|RD_t|WR_CC, 0, I1, IOCT|IOCTP|IOCT2),
-    instdes("div", ['z','s','t'], 0x0000001a, 0xfc00ffff, RD_s|RD_t|WR_HILO, 0, I1, 0),
-    instdes("div", ['z','t'], 0x0000001a, 0xffe0ffff, RD_s|RD_t|WR_HILO, 0, I1, 0),
-    instdes("divu", ['z','s','t'], 0x0000001b, 0xfc00ffff, RD_s|RD_t|WR_HILO, 0, I1, 0),
-    instdes("divu", ['z','t'], 0x0000001b, 0xffe0ffff, RD_s|RD_t|WR_HILO, 0, I1, 0),
-#    instdes("jr", ['s'], 0x00000008, 0xfc1fffff, UBD|RD_s, 0, I1, 0),
-#    instdes("j", ['s'], 0x00000008, 0xfc1fffff, UBD|RD_s, 0, I1, 0),
-#    instdes("j", ['a'], 0x08000000, 0xfc000000, UBD, 0, I1, 0),
-#    instdes("jalr", ['s'], 0x0000f809, 0xfc1fffff, UBD|RD_s|WR_d, 0, I1, 0),
-#    instdes("jalr", ['d','s'], 0x00000009, 0xfc1f07ff, UBD|RD_s|WR_d, 0, I1, 0),
-#    instdes("jal", ['a'], 0x0c000000, 0xfc000000, UBD|WR_31, 0, I1, 0),
-#    instdes("jalx", ['a'], 0x74000000, 0xfc000000, UBD|WR_31, 0, I1, 0),
-#    instdes("lb", ['t','o(b)'], 0x80000000, 0xfc000000, LDD|RD_b|WR_t, 0, I1, 0),
-#    instdes("lbu", ['t','o(b)'], 0x90000000, 0xfc000000, LDD|RD_b|WR_t, 0, I1, 0),
-#    instdes("lh", ['t','o(b)'], 0x84000000, 0xfc000000, LDD|RD_b|WR_t, 0, I1, 0),
-#    instdes("lhu", ['t','o(b)'], 0x94000000, 0xfc000000, LDD|RD_b|WR_t, 0, I1, 0),
-    instdes("lui", ['t','u'], 0x3c000000, 0xffe00000, WR_t, 0, I1, 0),
-    instdes("lw", ['t','o(b)'], 0x8c000000, 0xfc000000, LDD|RD_b|WR_t, 0, I1, 0),
-#    instdes("lwc0", ['E','o(b)'], 0xc0000000, 0xfc000000, CLD|RD_b|WR_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("lwc2", ['E','o(b)'], 0xc8000000, 0xfc000000, CLD|RD_b|WR_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("lwc3", ['E','o(b)'], 0xcc000000, 0xfc000000, CLD|RD_b|WR_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("lwl", ['t','o(b)'], 0x88000000, 0xfc000000, LDD|RD_b|WR_t, 0, I1, 0),
-#    instdes("lwr", ['t','o(b)'], 0x98000000, 0xfc000000, LDD|RD_b|WR_t, 0, I1, 0),
-#    instdes("mfc0", ['t','G'], 0x40000000, 0xffe007ff, LCD|WR_t|RD_C0, 0, I1, 0),
-#    instdes("mfhi", ['d'], 0x00000010, 0xffff07ff, WR_d|RD_HI, 0, I1, 0),
-#    instdes("mflo", ['d'], 0x00000012, 0xffff07ff, WR_d|RD_LO, 0, I1, 0),
-#    instdes("mtc0", ['t','G'], 0x40800000, 0xffe007ff, COD|RD_t|WR_C0|WR_CC, 0, I1, 0),
-#    instdes("mthi", ['s'], 0x00000011, 0xfc1fffff, RD_s|WR_HI, 0, I1, 0),
-#    instdes("mtlo", ['s'], 0x00000013, 0xfc1fffff, RD_s|WR_LO, 0, I1, 0),
-#    instdes("mult", ['s','t'], 0x00000018, 0xfc00ffff, RD_s|RD_t|WR_HILO|IS_M, 0, I1, 0),
-#    instdes("multu", ['s','t'], 0x00000019, 0xfc00ffff, RD_s|RD_t|WR_HILO|IS_M, 0, I1, 0),
-#    instdes("neg", ['d','w'], 0x00000022, 0xffe007ff, WR_d|RD_t, 0, I1, 0),
-#    instdes("negu", ['d','w'], 0x00000023, 0xffe007ff, WR_d|RD_t, 0, I1, 0),
-#    instdes("nor", ['d','v','t'], 0x00000027, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
-#    instdes("not", ['d','v'], 0x00000027, 0xfc1f07ff, WR_d|RD_s|RD_t, 0, I1, 0),
-    instdes("or", ['d','v','t'], 0x00000025, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
-    instdes("ori", ['t','r','i'], 0x34000000, 0xfc000000, WR_t|RD_s, 0, I1, 0),
-#    instdes("rem", ['z','s','t'], 0x0000001a, 0xfc00ffff, RD_s|RD_t|WR_HILO, 0, I1, 0),
-#    instdes("remu", ['z','s','t'], 0x0000001b, 0xfc00ffff, RD_s|RD_t|WR_HILO, 0, I1, 0),
-#    instdes("rfe", [], 0x42000010, 0xffffffff, 0, 0, I1|T3, 0),
-#    instdes("sb", ['t','o(b)'], 0xa0000000, 0xfc000000, SM|RD_t|RD_b, 0, I1, 0),
-#    instdes("sh", ['t','o(b)'], 0xa4000000, 0xfc000000, SM|RD_t|RD_b, 0, I1, 0),
-#    instdes("sllv", ['d','t','s'], 0x00000004, 0xfc0007ff, WR_d|RD_t|RD_s, 0, I1, 0),
-    instdes("sll", ['d','w','s'], 0x00000004, 0xfc0007ff, WR_d|RD_t|RD_s, 0, I1, 0),
-    instdes("slli", ['d','v','<'], 0x00000000, 0xffe0003f, WR_d|RD_s, 0, I1, 0),
-    instdes("slt", ['d','v','t'], 0x0000002a, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
-    instdes("slti", ['t','r','j'], 0x28000000, 0xfc000000, WR_t|RD_s, 0, I1, 0),
-    instdes("sltiu", ['t','r','j'], 0x2c000000, 0xfc000000, WR_t|RD_s, 0, I1, 0),
-    instdes("sltu", ['d','v','t'], 0x0000002b, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
-#    instdes("srav", ['d','t','s'], 0x00000007, 0xfc0007ff, WR_d|RD_t|RD_s, 0, I1, 0),
-    instdes("sra", ['d','w','s'], 0x00000007, 0xfc0007ff, WR_d|RD_t|RD_s, 0, I1, 0),
-    instdes("srai", ['d','v','<'], 0x00000003, 0xffe0003f, WR_d|RD_s, 0, I1, 0),
-#    instdes("srlv", ['d','t','s'], 0x00000006, 0xfc0007ff, WR_d|RD_t|RD_s, 0, I1, 0),
-    instdes("srl", ['d','v','s'], 0x00000006, 0xfc0007ff, WR_d|RD_t|RD_s, 0, I1, 0),
-    instdes("srli", ['d','v','<'], 0x00000002, 0xffe0003f, WR_d|RD_s, 0, I1, 0),
-    instdes("sub", ['d','v','t'], 0x00000022, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
-    instdes("subu", ['d','v','t'], 0x00000023, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
-    instdes("sw", ['t','o(b)'], 0xac000000, 0xfc000000, SM|RD_t|RD_b, 0, I1, 0),
-#    instdes("swc0", ['E','o(b)'], 0xe0000000, 0xfc000000, SM|RD_C0|RD_b, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("swc2", ['E','o(b)'], 0xe8000000, 0xfc000000, SM|RD_C2|RD_b, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("swc3", ['E','o(b)'], 0xec000000, 0xfc000000, SM|RD_C3|RD_b, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("swl", ['t','o(b)'], 0xa8000000, 0xfc000000, SM|RD_t|RD_b, 0, I1, 0),
-#    instdes("swr", ['t','o(b)'], 0xb8000000, 0xfc000000, SM|RD_t|RD_b, 0, I1, 0),
-#    instdes("syscall", [], 0x0000000c, 0xffffffff, TRAP, 0, I1, 0),
-#    instdes("syscall", ['B'], 0x0000000c, 0xfc00003f, TRAP, 0, I1, 0),
-#    instdes("tlbp", [], 0x42000008, 0xffffffff, INSN_TLB, 0, I1, 0),
-#    instdes("tlbr", [], 0x42000001, 0xffffffff, INSN_TLB, 0, I1, 0),
-#    instdes("tlbwi", [], 0x42000002, 0xffffffff, INSN_TLB, 0, I1, 0),
-#    instdes("tlbwr", [], 0x42000006, 0xffffffff, INSN_TLB, 0, I1, 0),
-    instdes("xor", ['d','v','t'], 0x00000026, 0xfc0007ff, WR_d|RD_s|RD_t, 0, I1, 0),
-    instdes("xori", ['t','r','j'], 0x38000000, 0xfc000000, WR_t|RD_s, 0, I1, 0),
-#    instdes("bc2f", ['p'], 0x49000000, 0xffff0000, CBD|RD_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("bc2t", ['p'], 0x49010000, 0xffff0000, CBD|RD_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("cfc2", ['t','G'], 0x48400000, 0xffe007ff, LCD|WR_t|RD_C2, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("ctc2", ['t','G'], 0x48c00000, 0xffe007ff, COD|RD_t|WR_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("mfc2", ['t','G'], 0x48000000, 0xffe007ff, LCD|WR_t|RD_C2, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("mtc2", ['t','G'], 0x48800000, 0xffe007ff, COD|RD_t|WR_C2|WR_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("bc3f", ['p'], 0x4d000000, 0xffff0000, CBD|RD_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("bc3t", ['p'], 0x4d010000, 0xffff0000, CBD|RD_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("cfc3", ['t','G'], 0x4c400000, 0xffe007ff, LCD|WR_t|RD_C3, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("ctc3", ['t','G'], 0x4cc00000, 0xffe007ff, COD|RD_t|WR_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("mfc3", ['t','G'], 0x4c000000, 0xffe007ff, LCD|WR_t|RD_C3, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("mtc3", ['t','G'], 0x4c800000, 0xffe007ff, COD|RD_t|WR_C3|WR_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("bc0f", ['p'], 0x41000000, 0xffff0000, CBD|RD_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("bc0t", ['p'], 0x41010000, 0xffff0000, CBD|RD_CC, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("c0", ['C'], 0x42000000, 0xfe000000, CP, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("c2", ['C'], 0x4a000000, 0xfe000000, CP, 0, I1, IOCT|IOCTP|IOCT2),
-#    instdes("c3", ['C'], 0x4e000000, 0xfe000000, CP, 0, I1, IOCT|IOCTP|IOCT2),
+    instdes("nop", [], 0x00000013, 0xffffffff, 0, INSN2_ALIAS, I1, 0),
+    instdes("li", ['d','j'], 0x00000013, 0x000ff07f, WR_d, INSN2_ALIAS, I1, 0),
+    instdes("mv", ['d','s'], 0x00000013, 0xfff0707f, WR_d|RD_s, INSN2_ALIAS, I1, 0),
+    instdes("not", ['d','s'], 0xfff04013, 0xfff0707f, WR_d|RD_s, INSN2_ALIAS, I1, 0),
+    instdes("neg", ['d','t'], 0x40000033, 0xfe0ff07f, WR_d|RD_t, INSN2_ALIAS, I1, 0),
+    instdes("seqz", ['d','s'], 0x00103013, 0xfff0707f, WR_d|RD_s, INSN2_ALIAS, I1, 0),
+    instdes("snez", ['d','t'], 0x00003033, 0xfe0ff07f, WR_d|RD_t, INSN2_ALIAS, I1, 0),
+    instdes("beqz", ['s','p'], 0x00000063, 0x01f0707f, CBD|RD_s, INSN2_ALIAS, I1, 0),
+    instdes("bnez", ['s','p'], 0x00001063, 0x01f0707f, CBD|RD_s, INSN2_ALIAS, I1, 0),
+    instdes("j", ['a'], 0x0000006f, 0x00000fff, UBD, INSN2_ALIAS, I1, 0),
+    instdes("jal", ['a'], 0x000000ef, 0x00000fff, UBD|WR_31, INSN2_ALIAS, I1, 0),
+    instdes("ret", [], 0x00008067, 0xffffffff, UBD|RD_s, INSN2_ALIAS, I1, 0),
+    instdes("jr", ['s'], 0x00000067, 0xfff07fff, UBD|RD_s, INSN2_ALIAS, I1, 0),
+    instdes("jalr", ['s'], 0x000000e7, 0xfff07fff, UBD|RD_s|WR_31, INSN2_ALIAS, I1, 0),
+    instdes("lui", ['d','u'], 0x00000037, 0x0000007f, WR_d, 0, I1, 0),
+    instdes("auipc", ['d','u'], 0x00000017, 0x0000007f, WR_d, 0, I1, 0),
+    instdes("jal", ['d','a'], 0x0000006f, 0x0000007f, UBD|WR_d, 0, I1, 0),
+    instdes("jalr", ['d','o(s)'], 0x00000067, 0x0000707f, UBD|RD_s|WR_d, 0, I1, 0),
+    instdes("beq", ['s','t','p'], 0x00000063, 0x0000707f, CBD|RD_s|RD_t, 0, I1, 0),
+    instdes("bne", ['s','t','p'], 0x00001063, 0x0000707f, CBD|RD_s|RD_t, 0, I1, 0),
+    instdes("blt", ['s','t','p'], 0x00004063, 0x0000707f, CBD|RD_s|RD_t, 0, I1, 0),
+    instdes("bge", ['s','t','p'], 0x00005063, 0x0000707f, CBD|RD_s|RD_t, 0, I1, 0),
+    instdes("bltu", ['s','t','p'], 0x00006063, 0x0000707f, CBD|RD_s|RD_t, 0, I1, 0),
+    instdes("bgeu", ['s','t','p'], 0x00007063, 0x0000707f, CBD|RD_s|RD_t, 0, I1, 0),
+    instdes("lb", ['d','o(s)'], 0x00000003, 0x0000707f, LDD|RD_s|WR_d, 0, I1, 0),
+    instdes("lh", ['d','o(s)'], 0x00001003, 0x0000707f, LDD|RD_s|WR_d, 0, I1, 0),
+    instdes("lw", ['d','o(s)'], 0x00002003, 0x0000707f, LDD|RD_s|WR_d, 0, I1, 0),
+    instdes("lbu", ['d','o(s)'], 0x00004003, 0x0000707f, LDD|RD_s|WR_d, 0, I1, 0),
+    instdes("lhu", ['d','o(s)'], 0x00005003, 0x0000707f, LDD|RD_s|WR_d, 0, I1, 0),
+    instdes("sb", ['t','q(s)'], 0x00000023, 0x0000707f, SM|RD_t|RD_s, 0, I1, 0),
+    instdes("sh", ['t','q(s)'], 0x00001023, 0x0000707f, SM|RD_t|RD_s, 0, I1, 0),
+    instdes("sw", ['t','q(s)'], 0x00002023, 0x0000707f, SM|RD_t|RD_s, 0, I1, 0),
+    instdes("addi", ['d','s','j'], 0x00000013, 0x0000707f, WR_d|RD_s, 0, I1, 0),
+    instdes("slti", ['d','s','j'], 0x00002013, 0x0000707f, WR_d|RD_s, 0, I1, 0),
+    instdes("sltiu", ['d','s','j'], 0x00003013, 0x0000707f, WR_d|RD_s, 0, I1, 0),
+    instdes("xori", ['d','s','j'], 0x00004013, 0x0000707f, WR_d|RD_s, 0, I1, 0),
+    instdes("ori", ['d','s','j'], 0x00006013, 0x0000707f, WR_d|RD_s, 0, I1, 0),
+    instdes("andi", ['d','s','j'], 0x00007013, 0x0000707f, WR_d|RD_s, 0, I1, 0),
+    instdes("slli", ['d','s','>'], 0x00001013, 0xfe00707f, WR_d|RD_s, 0, I1, 0),
+    instdes("srli", ['d','s','>'], 0x00005013, 0xfe00707f, WR_d|RD_s, 0, I1, 0),
+    instdes("srai", ['d','s','>'], 0x40005013, 0xfe00707f, WR_d|RD_s, 0, I1, 0),
+    instdes("add", ['d','s','t'], 0x00000033, 0xfe00707f, WR_d|RD_s|RD_t, 0, I1, 0),
+    instdes("sub", ['d','s','t'], 0x40000033, 0xfe00707f, WR_d|RD_s|RD_t, 0, I1, 0),
+    instdes("sll", ['d','s','t'], 0x00001033, 0xfe00707f, WR_d|RD_s|RD_t, 0, I1, 0),
+    instdes("slt", ['d','s','t'], 0x00002033, 0xfe00707f, WR_d|RD_s|RD_t, 0, I1, 0),
+    instdes("sltu", ['d','s','t'], 0x00003033, 0xfe00707f, WR_d|RD_s|RD_t, 0, I1, 0),
+    instdes("xor", ['d','s','t'], 0x00004033, 0xfe00707f, WR_d|RD_s|RD_t, 0, I1, 0),
+    instdes("srl", ['d','s','t'], 0x00005033, 0xfe00707f, WR_d|RD_s|RD_t, 0, I1, 0),
+    instdes("sra", ['d','s','t'], 0x40005033, 0xfe00707f, WR_d|RD_s|RD_t, 0, I1, 0),
+    instdes("or", ['d','s','t'], 0x00006033, 0xfe00707f, WR_d|RD_s|RD_t, 0, I1, 0),
+    instdes("and", ['d','s','t'], 0x00007033, 0xfe00707f, WR_d|RD_s|RD_t, 0, I1, 0),
+    instdes("fence", [], 0x0ff0000f, 0xffffffff, 0, 0, I1, 0),
+    instdes("ecall", [], 0x00000073, 0xffffffff, TRAP, 0, I1, 0),
+    instdes("ebreak", [], 0x00100073, 0xffffffff, TRAP, 0, I1, 0),
 ]
 
 instopdes = collections.namedtuple('instopdes', ['fnc', 'operator', 'info', 'size'])
 
+def maskregs(mask):
+    regs = []
+    r = 0
+    while mask:
+        if mask & 1:
+            regs.append(r)
+        mask >>= 1
+        r += 1
+    return tuple(regs)
+
 def reg_to_sig(rv):
     if rv >= 0x80000000:
         rv -= 0x100000000
@@ -442,27 +497,83 @@ def instop_b(cpustate, inst, op):
         if not op.operator(argin[0], argin[1]):
             return
     npc = cpustate.pc + 4
-    cpustate.b_pend_pc = npc + (inst.args[aincnt].value << 2)
+    cpustate.b_pend_pc = val_to_reg(npc + (inst.args[aincnt].value << 2))
     if (inst.pinfo & WR_31) != 0:
-        cpustate.wrgpreg(31, npc)
+        cpustate.wrgpreg(31, npc + 4)
+    return
+def instop_alu_ov(cpustate, inst, op):
+    args = inst.args
+    a = reg_to_sig(cpustate.rdarg(args[1]))
+    if len(args) > 2:
+        res = op.operator(a, reg_to_sig(cpustate.rdarg(args[2])))
+    else:
+        res = op.operator(a)
+    if (res < -0x80000000) or (res > 0x7fffffff):
+        return cpustate.exception(EXC_OV)
+    cpustate.wrarg(args[0], res)
     return
-def instop_break(cpustate, inst):
+def instop_div(cpustate, inst, op):
+    a = cpustate.rdarg(inst.args[-2])
+    b = cpustate.rdarg(inst.args[-1])
+    if b == 0:
+        return cpustate.exception(EXC_TR)
+    if op.info == 's':
+        a = reg_to_sig(a)
+        b = reg_to_sig(b)
+    q, r = op.operator(a, b)
+    cpustate.mlo = val_to_reg(q)
+    cpustate.mhi = val_to_reg(r)
+    return
+def instop_break(cpustate, inst, op):
+    return cpustate.exception(EXC_BP)
+def instop_ri(cpustate, inst, op):
+    return cpustate.exception(EXC_RI)
+def instop_mfc0(cpustate, inst, op):
+    cpustate.wrarg(inst.args[0], cpustate.rdcp0(inst.args[1].value))
+    return
+def instop_mtc0(cpustate, inst, op):
+    cpustate.wrcp0(inst.args[1].value, cpustate.rdarg(inst.args[0]))
+    return
+def instop_rfe(cpustate, inst, op):
+    # pop the KU/IE stack of the Status register
+    status = cpustate.cp0[CP0_STATUS]
+    cpustate.cp0[CP0_STATUS] = (status & ~0xf) | ((status >> 2) & 0xf)
+    cpustate.irqcheck()
+    return
+def instop_nop(cpustate, inst, op):
+    return
+def instop_bkpt(cpustate, inst, op):
+    # op.operator holds the original operation, op.info the condition
+    if cpustate.bkpt_resume == cpustate.pc:
+        cpustate.bkpt_resume = None
+    elif (op.info is None) or op.info(cpustate):
+        cpustate.stopreq = True
+        cpustate.stopreason = 'breakpoint'
+        return EXEC_STOP
+    return op.operator.fnc(cpustate, inst, op.operator)
+def instop_syscall(cpustate, inst, op):
+    if cpustate.syscalls is None:
+        return cpustate.exception(EXC_SYS)
+    cpustate.syscalls.syscall(cpustate)
     return
 def instop_j(cpustate, inst, op):
-    a = inst.args[0]
-    if len(inst.args) > 1:
-        a = inst.args[1]
+    a = inst.args[-1]
     npc = cpustate.pc + 4
-    cpustate.b_pend_pc = npc & ~((1 << 28) - 1)
-    cpustate.b_pend_pc |= a.value << 2
+    if a.regkind is not None:
+        target = cpustate.rdarg(a)
+    else:
+        target = (npc & ~((1 << 28) - 1)) | (a.value << 2)
     if (inst.pinfo & (WR_31 | WR_d)) != 0:
         if len(inst.args) > 1:
-            cpustate.wrarg(inst.args[0], res)
+            cpustate.wrarg(inst.args[0], npc + 4)
         else:
-            cpustate.wrgpreg(31, npc)
+            cpustate.wrgpreg(31, npc + 4)
+    cpustate.b_pend_pc = target
     return
 def instop_l(cpustate, inst, op):
     addr = cpustate.rdarg(inst.args[1])
+    if addr & ((op.size >> 3) - 1):
+        return cpustate.exception(EXC_ADEL, addr)
     res = cpustate.rdmem(addr, op.size, op.info == 's')
     cpustate.wrarg(inst.args[0], res)
     return
@@ -480,10 +591,31 @@ def instop_mt(cpustate, inst, op):
     return
 def instop_s(cpustate, inst, op):
     addr = cpustate.rdarg(inst.args[1])
+    if addr & ((op.size >> 3) - 1):
+        return cpustate.exception(EXC_ADES, addr)
     res = cpustate.rdarg(inst.args[0])
     res = cpustate.wrmem(addr, op.size, res)
     return
 
+def instop_ll(cpustate, inst, op):
+    addr = cpustate.rdarg(inst.args[1])
+    if addr & 3:
+        return cpustate.exception(EXC_ADEL, addr)
+    cpustate.wrarg(inst.args[0], cpustate.rdmem(addr, 32))
+    cpustate.reserve(addr)
+    return
+def instop_sc(cpustate, inst, op):
+    addr = cpustate.rdarg(inst.args[1])
+    if addr & 3:
+        return cpustate.exception(EXC_ADES, addr)
+    if cpustate.llbit and (cpustate.lladdr == val_to_reg(addr)):
+        cpustate.wrmem(addr, 32, cpustate.rdarg(inst.args[0]))
+        cpustate.wrarg(inst.args[0], 1)
+    else:
+        cpustate.wrarg(inst.args[0], 0)
+    cpustate.unreserve()
+    return
+
 def op_nor(a, b):
     return operator.inv(a | b)
 
@@ -494,20 +626,89 @@ def op_lui(a):
     return a << 16
 
 def op_div_rem(a, b):
-    q = operator.div(a, b)
-    r = operator.mod(a, b)
-    return (r << 32) | q
+    # quotient is rounded toward zero as by the hardware
+    q = abs(a) // abs(b)
+    if (a < 0) != (b < 0):
+        q = -q
+    return q, a - q * b
+
+def instop_rv_alu(cpustate, inst, op):
+    args = inst.args
+    a = cpustate.rdarg(args[1])
+    if op.info == 's':
+        a = reg_to_sig(a)
+    if len(args) == 2:
+        res = op.operator(a)
+    else:
+        b = cpustate.rdarg(args[2])
+        if op.info == 's':
+            b = reg_to_sig(b)
+        else:
+            b = val_to_reg(b)
+        res = op.operator(a, b)
+    cpustate.wrgpreg(args[0].reg, res)
+    return
+def instop_rv_lui(cpustate, inst, op):
+    res = inst.args[1].value << 12
+    if op.info == 'p':
+        res += cpustate.pc
+    cpustate.wrgpreg(inst.args[0].reg, res)
+    return
+def instop_rv_b(cpustate, inst, op):
+    args = inst.args
+    a = cpustate.rdarg(args[0])
+    if len(args) > 2:
+        b = cpustate.rdarg(args[1])
+    else:
+        b = 0
+    if op.info == 's':
+        a = reg_to_sig(a)
+        b = reg_to_sig(b)
+    if op.operator(a, b):
+        cpustate.b_pend_pc = val_to_reg(cpustate.pc + args[-1].value)
+    return
+def instop_rv_jal(cpustate, inst, op):
+    args = inst.args
+    npc = cpustate.pc + 4
+    if args[-1].regkind is not None:
+        target = cpustate.rdarg(args[-1]) & ~1
+    else:
+        target = cpustate.pc + args[-1].value
+    if len(args) > 1:
+        cpustate.wrgpreg(args[0].reg, npc)
+    elif (inst.pinfo & WR_31) != 0:
+        cpustate.wrgpreg(1, npc)
+    cpustate.b_pend_pc = val_to_reg(target)
+    return
+def instop_rv_ret(cpustate, inst, op):
+    cpustate.b_pend_pc = cpustate.gpreg[1] & ~1
+    return
+
+def op_sll_rv(a, b):
+    return a << (b & 0x1f)
+
+def op_sr_rv(a, b):
+    return a >> (b & 0x1f)
+
+def op_lt_rv(a, b):
+    return int(a < b)
+
+def op_eqz_rv(a):
+    return int(a == 0)
+
+def op_nez_rv(a):
+    return int(a != 0)
 
 instopdeslist = {
-    'nop':   instopdes(None, None, 0, 32),
-    'ssnop': instopdes(None, None, 0, 32),
-    'ehb':   instopdes(None, None, 0, 32),
+    'nop':   instopdes(instop_nop, None, 0, 32),
+    'ssnop': instopdes(instop_nop, None, 0, 32),
+    'ehb':   instopdes(instop_nop, None, 0, 32),
     'li':    instopdes(instop_alu, op_copy, 'u', 32),
     'move':  instopdes(instop_alu, op_copy, 'u', 32),
     'b':     instopdes(instop_b, None, None, 32),
     'bal':   instopdes(instop_b, None, None, 32),
-    'add':   instopdes(instop_alu, operator.add, 's', 32),
-    'addi':  instopdes(instop_alu, operator.add, 's', 32),
+    'add':   instopdes(instop_alu_ov, operator.add, 's', 32),
+    'addi':  instopdes(instop_alu_ov, operator.add, 's', 32),
     'addiu': instopdes(instop_alu, operator.add, 'u', 32),
     'addu':  instopdes(instop_alu, operator.add, 'u', 32),
     'and':   instopdes(instop_alu, operator.and_, 'u', 32),
@@ -517,15 +718,16 @@ instopdeslist = {
     'bgez':  instopdes(instop_b, operator.ge, None, 32),
     'bgezal':instopdes(instop_b, operator.ge, None, 32),
     'bgtz':  instopdes(instop_b, operator.gt, None, 32),
-    'blez':  instopdes(instop_alu, operator.le, None, 32),
-    'bltz':  instopdes(instop_alu, operator.lt, None, 32),
-    'bltzal':instopdes(instop_alu, operator.lt, None, 32),
-    'bnez':  instopdes(instop_alu, operator.ne, None, 32),
-    'bne':   instopdes(instop_alu, operator.ne, None, 32),
+    'blez':  instopdes(instop_b, operator.le, None, 32),
+    'bltz':  instopdes(instop_b, operator.lt, None, 32),
+    'bltzal':instopdes(instop_b, operator.lt, None, 32),
+    'bnez':  instopdes(instop_b, operator.ne, None, 32),
+    'bne':   instopdes(instop_b, operator.ne, None, 32),
     'break': instopdes(instop_break, None, None, 32),
     'cfc0':  instopdes(None, None, None, 32),
-    'div':   instopdes(instop_alu, op_div_rem, 's', 32),
-    'divu':  instopdes(instop_alu, op_div_rem, 'u', 32),
+    'ctc0':  instopdes(None, None, None, 32),
+    'div':   instopdes(instop_div, op_div_rem, 's', 32),
+    'divu':  instopdes(instop_div, op_div_rem, 'u', 32),
     'jr':    instopdes(instop_j, None, None, 32),
     'j':     instopdes(instop_j, None, None, 32),
     'jal':   instopdes(instop_j, None, None, 32),
@@ -537,28 +739,29 @@ instopdeslist = {
     'lhu':   instopdes(instop_l, None, 'u', 16),
     'lui':   instopdes(instop_alu, op_lui, 'u', 32),
     'lw':    instopdes(instop_l, None, 's', 32),
+    'll':    instopdes(instop_ll, None, None, 32),
     'lwc0':  instopdes(None, None, None, 32),
     'lwc2':  instopdes(None, None, None, 32),
     'lwc3':  instopdes(None, None, None, 32),
     'lwl':   instopdes(None, None, None, 32),
     'lwr':   instopdes(None, None, None, 32),
-    'mfc0':  instopdes(None, None, None, 32),
+    'mfc0':  instopdes(instop_mfc0, None, None, 32),
     'mfhi':  instopdes(instop_mf, None, 'h', 32),
     'mflo':  instopdes(instop_mf, None, 'l', 32),
-    'mtc0':  instopdes(None, None, None, 32),
+    'mtc0':  instopdes(instop_mtc0, None, None, 32),
     'mthi':  instopdes(instop_mt, None, 'h', 32),
     'mtlo':  instopdes(instop_mt, None, 'l', 32),
     'mult':  instopdes(instop_alu, operator.mul, 's', 32),
     'multu': instopdes(instop_alu, operator.mul, 'u', 32),
-    'neg':   instopdes(instop_alu, operator.neg, 's', 32),
+    'neg':   instopdes(instop_alu_ov, operator.neg, 's', 32),
     'negu':  instopdes(instop_alu, operator.neg, 'u', 32),
     'nor':   instopdes(instop_alu, op_nor, 'u', 32),
     'not':   instopdes(instop_alu, operator.inv, 'u', 32),
     'or':    instopdes(instop_alu, operator.or_, 'u', 32),
     'ori':   instopdes(instop_alu, operator.or_, 'u', 32),
-    'rem':   instopdes(instop_alu, operator.mod, 's', 32),
-    'remu':  instopdes(instop_alu, operator.mod, 'u', 32),
-    'rfe':   instopdes(None, None, None, 32),
+    'rem':   instopdes(instop_div, op_div_rem, 's', 32),
+    'remu':  instopdes(instop_div, op_div_rem, 'u', 32),
+    'rfe':   instopdes(instop_rfe, None, None, 32),
     'sb':    instopdes(instop_s, None, None, 8),
     'sh':    instopdes(instop_s, None, None, 16),
     'sllv':  instopdes(instop_alu, operator.lshift, 'u', 32),
@@ -574,15 +777,16 @@ instopdeslist = {
     'srlv':  instopdes(instop_alu, operator.rshift, 'u', 32),
     'srl':   instopdes(instop_alu, operator.rshift, 'u', 32),
     'srli':   instopdes(instop_alu, operator.rshift, 'u', 32),
-    'sub':   instopdes(instop_alu, operator.sub, 's', 32),
+    'sub':   instopdes(instop_alu_ov, operator.sub, 's', 32),
     'subu':  instopdes(instop_alu, operator.sub, 'u', 32),
     'sw':    instopdes(instop_s, None, None, 32),
+    'sc':    instopdes(instop_sc, None, None, 32),
     'swc0':  instopdes(None, None, None, 32),
     'swc2':  instopdes(None, None, None, 32),
     'swc3':  instopdes(None, None, None, 32),
     'swl':   instopdes(None, None, None, 32),
     'swr':   instopdes(None, None, None, 32),
-    'syscall': instopdes(None, None, None, 32),
+    'syscall': instopdes(instop_syscall, None, None, 32),
     'tlbp':  instopdes(None, None, None, 32),
     'tlbr':  instopdes(None, None, None, 32),
     'tlbwi': instopdes(None, None, None, 32),
@@ -608,6 +812,67 @@ instopdeslist = {
     'c3':    instopdes(None, None, None, 32),
 }
 
+instopdeslist_rv = {
+    'nop':   instopdes(instop_nop, None, 0, 32),
+    'li':    instopdes(instop_rv_alu, op_copy, 'u', 32),
+    'mv':    instopdes(instop_rv_alu, op_copy, 'u', 32),
+    'not':   instopdes(instop_rv_alu, operator.inv, 'u', 32),
+    'neg':   instopdes(instop_rv_alu, operator.neg, 'u', 32),
+    'seqz':  instopdes(instop_rv_alu, op_eqz_rv, 'u', 32),
+    'snez':  instopdes(instop_rv_alu, op_nez_rv, 'u', 32),
+    'beqz':  instopdes(instop_rv_b, operator.eq, 'u', 32),
+    'bnez':  instopdes(instop_rv_b, operator.ne, 'u', 32),
+    'j':     instopdes(instop_rv_jal, None, None, 32),
+    'ret':   instopdes(instop_rv_ret, None, None, 32),
+    'jr':    instopdes(instop_rv_jal, None, None, 32),
+    'lui':   instopdes(instop_rv_lui, None, 'u', 32),
+    'auipc': instopdes(instop_rv_lui, None, 'p', 32),
+    'jal':   instopdes(instop_rv_jal, None, None, 32),
+    'jalr':  instopdes(instop_rv_jal, None, None, 32),
+    'beq':   instopdes(instop_rv_b, operator.eq, 'u', 32),
+    'bne':   instopdes(instop_rv_b, operator.ne, 'u', 32),
+    'blt':   instopdes(instop_rv_b, operator.lt, 's', 32),
+    'bge':   instopdes(instop_rv_b, operator.ge, 's', 32),
+    'bltu':  instopdes(instop_rv_b, operator.lt, 'u', 32),
+    'bgeu':  instopdes(instop_rv_b, operator.ge, 'u', 32),
+    'lb':    instopdes(instop_l, None, 's', 8),
+    'lh':    instopdes(instop_l, None, 's', 16),
+    'lw':    instopdes(instop_l, None, 's', 32),
+    'lbu':   instopdes(instop_l, None, 'u', 8),
+    'lhu':   instopdes(instop_l, None, 'u', 16),
+    'sb':    instopdes(instop_s, None, None, 8),
+    'sh':    instopdes(instop_s, None, None, 16),
+    'sw':    instopdes(instop_s, None, None, 32),
+    'addi':  instopdes(instop_rv_alu, operator.add, 'u', 32),
+    'slti':  instopdes(instop_rv_alu, op_lt_rv, 's', 32),
+    'sltiu': instopdes(instop_rv_alu, op_lt_rv, 'u', 32),
+    'xori':  instopdes(instop_rv_alu, operator.xor, 'u', 32),
+    'ori':   instopdes(instop_rv_alu, operator.or_, 'u', 32),
+    'andi':  instopdes(instop_rv_alu, operator.and_, 'u', 32),
+    'slli':  instopdes(instop_rv_alu, op_sll_rv, 'u', 32),
+    'srli':  instopdes(instop_rv_alu, op_sr_rv, 'u', 32),
+    'srai':  instopdes(instop_rv_alu, op_sr_rv, 's', 32),
+    'add':   instopdes(instop_rv_alu, operator.add, 'u', 32),
+    'sub':   instopdes(instop_rv_alu, operator.sub, 'u', 32),
+    'sll':   instopdes(instop_rv_alu, op_sll_rv, 'u', 32),
+    'slt':   instopdes(instop_rv_alu, op_lt_rv, 's', 32),
+    'sltu':  instopdes(instop_rv_alu, op_lt_rv, 'u', 32),
+    'xor':   instopdes(instop_rv_alu, operator.xor, 'u', 32),
+    'srl':   instopdes(instop_rv_alu, op_sr_rv, 'u', 32),
+    'sra':   instopdes(instop_rv_alu, op_sr_rv, 's', 32),
+    'or':    instopdes(instop_rv_alu, operator.or_, 'u', 32),
+    'and':   instopdes(instop_rv_alu, operator.and_, 'u', 32),
+    'fence': instopdes(instop_nop, None, None, 32),
+    'ecall': instopdes(instop_syscall, None, None, 32),
+    'ebreak':instopdes(instop_break, None, None, 32),
+}
+
+# operations without implementation raise reserved instruction exception
+for opdeslist in (instopdeslist, instopdeslist_rv):
+    for name, op in opdeslist.items():
+        if op.fnc is None:
+            opdeslist[name] = op._replace(fnc = instop_ri)
+
 locdes = collections.namedtuple('locdes', ['rd_mask', 'wr_mask', 'startbit', 'bits'])
 
 locdesbycode = {
@@ -617,6 +882,13 @@ locdesbycode = {
     'SHAMT' : locdes(0,        0,  6,  5),
     'IMMEDIATE' : locdes(0,    0,  0, 16),
     'DELTA' : locdes(0,        0,  0, 16),
+    'TARGET' : locdes(0,       0,  0, 26),
+}
+
+locdesbycode_rv = {
+    'RS' : locdes(RD_s | RD_b, 0, 15,  5),
+    'RT' : locdes(RD_t,        0, 20,  5),
+    'RD' : locdes(0,        WR_d,  7,  5),
 }
 
 regname2regnum = {
@@ -643,7 +915,8 @@ regname2regnum_rv = {
 regnum2regname_rv = {}
 
 for r in regname2regnum_rv:
-    regnum2regname_rv[regname2regnum_rv[r]] = r
+    if r != 'fp':
+        regnum2regname_rv[regname2regnum_rv[r]] = r
 
 
 instdesbyname = {}
@@ -662,6 +935,82 @@ for inst in instdeslist_rv:
     else:
         instdesbyname_rv[inst.name].append(inst)
 
+instdesbyopcode = {}
+
+for inst in instdeslist:
+    opcode = inst.match >> 26
+    if not opcode in instdesbyopcode:
+        instdesbyopcode[opcode] = [inst]
+    else:
+        instdesbyopcode[opcode].append(inst)
+
+instdesbyopcode_rv = {}
+
+for inst in instdeslist_rv:
+    opcode = inst.match & 0x7f
+    if not opcode in instdesbyopcode_rv:
+        instdesbyopcode_rv[opcode] = [inst]
+    else:
+        instdesbyopcode_rv[opcode].append(inst)
+
+
+ssresult = collections.namedtuple('ssresult', ['cycles', 'ipc', 'groups'])
+
+muldivstats = collections.namedtuple('muldivstats', ['busy', 'overlap', 'stalls'])
+
+# Pipeline configuration of timing analysis, model is 'forward'
+# (load-use stalls and forwarding), 'nofwd' (no forwarding) or 'cfg'
+# (forwarding across control flow graph edges), muldiv is simmuldiv
+# unit of the 'forward' model and base the address of the first
+# instruction for the 'cfg' model
+pipeconfig = collections.namedtuple('pipeconfig', ['model', 'muldiv', 'base'])
+pipeconfig.__new__.__defaults__ = ('forward', None, 0)
+
+class simtiming(object):
+    """
+    Timing analysis result of instruction list for one pipeline
+    configuration. Stalls and forwarding distances are held in arrays
+    indexed by instruction, the analysed instructions are not modified.
+    """
+    def __init__(self, config, n):
+        self.config = config
+        self.stalls = array.array('H', [0]) * n
+        self.forward_rs = array.array('B', [0]) * n
+        self.forward_rt = array.array('B', [0]) * n
+        self.cycles = 4
+        self.muldivstats = None
+    def __len__(self):
+        return len(self.stalls)
+    def forward(self, i):
+        return (self.forward_rs[i], self.forward_rt[i])
+    def apply(self, instlist):
+        """
+        Store the results into stalls and forward of the instructions
+        """
+        for i, inst in enumerate(instlist.instlist):
+            inst.stalls = self.stalls[i]
+            inst.forward = (self.forward_rs[i], self.forward_rt[i])
+
+statechanges = collections.namedtuple('statechanges', ['pc', 'regs', 'hi', 'lo',
+                   'memory', 'full'])
+
+class simmuldiv(object):
+    """
+    Multiply/divide unit with multicycle latencies, results
+    are written to HI/LO after latency cycles from issue.
+    """
+    multops = ('mult', 'multu')
+    divops = ('div', 'divu', 'rem', 'remu')
+
+    def __init__(self, multlatency = 4, divlatency = 32):
+        self.multlatency = multlatency
+        self.divlatency = divlatency
+    def latency(self, inst):
+        if inst.operation in self.multops:
+            return self.multlatency
+        if inst.operation in self.divops:
+            return self.divlatency
+        return 0
 
 class simarg(object):
     def __init__(self, argspec, regkind = None, reg = None, value = 0, rddep = False, wrdep = False, encoding = 0, text = None):
@@ -686,14 +1035,29 @@ class siminst(object):
         return int(regin)
     @staticmethod
     def regnum_rv(regin):
-        if regin[0] == 'x':
-            if isinstance(regin[1:], numbers.Number):
-                return int(regin[1:])
+        if isinstance(regin, numbers.Number):
+            return int(regin)
+        if (regin[0] == 'x') and regin[1:].isdigit():
+            return int(regin[1:])
         if regin in regname2regnum_rv:
             return regname2regnum_rv[regin]
         return None
     @staticmethod
-    def parse_argument(argspec, arg, pinfo):
+    def parse_target(text, symbols, origin):
+        """
+        Branch or jump operand given as number or as symbol, symbol
+        address is taken relative to origin. None when the symbol
+        is not known.
+        """
+        try:
+            return int(text, 0)
+        except ValueError:
+            pass
+        if (symbols is None) or (text not in symbols):
+            return None
+        return symbols[text] - origin
+    @staticmethod
+    def parse_argument(argspec, arg, pinfo, symbols = None, addr = 0):
         argtext = arg
         p = argspec.find('(')
         if p != -1:
@@ -763,31 +1127,35 @@ class siminst(object):
                 if locdes is not None:
                     encoding |= rn << locdes.startbit
             elif argdes.kind == 'p':
-                try:
-                    value = int(a, 0)
-                except ValueError:
-                    value = 0
+                value = siminst.parse_target(a, symbols, addr + 4)
+                if value is None:
+                    return None
                 if value & ((1 << argdes.shift) - 1):
                     return None
                 value >>= argdes.shift
                 if (value < argdes.min) or (value > argdes.max):
                     return None
+                if locdes is not None:
+                    encoding |= (value & ((1 << locdes.bits) - 1)) << locdes.startbit
             elif argdes.kind == 'a':
-                try:
-                    value = int(a, 0)
-                except ValueError:
-                    value = 0
+                value = siminst.parse_target(a, symbols, 0)
+                if value is None:
+                    return None
+                if (symbols is not None) and (a in symbols):
+                    # jump keeps the upper bits of the delay slot address
+                    value &= 0x0fffffff
                 if value & ((1 << argdes.shift) - 1):
                     return None
                 value >>= argdes.shift
                 if (value < argdes.min) or (value > argdes.max):
                     return None
+                if locdes is not None:
+                    encoding |= (value & ((1 << locdes.bits) - 1)) << locdes.startbit
             else:
                 return None
         return simarg(argspec = argspec, regkind = regkind, reg = rn, value = value, rddep = rddep, wrdep = wrdep, encoding = encoding, text = argtext)
     @staticmethod
-    def parse_argument_rv(argspec, argtext, pinfo):
-        argtext = arg
+    def parse_argument_rv(argspec, argtext, pinfo, symbols = None, addr = 0):
         p = argspec.find('(')
         if p != -1:
             if argspec[-1] != ')':
@@ -797,9 +1165,9 @@ class siminst(object):
             if p != -1:
                 if argtext[-1] != ')':
                     return None
-                arg = [ argtext[0 : p], argtext[p + 1: -1]]
+                arg = [ argtext[0 : p].strip(), argtext[p + 1: -1].strip()]
             else:
-                arg = [ argtext[0 : p], None]
+                arg = [ argtext, None]
         else:
             aspcs = [argspec]
             arg = [argtext]
@@ -810,76 +1178,126 @@ class siminst(object):
         regkind = None
         encoding = 0
         for i in range(0, len(aspcs)):
-            if aspcs[i] not in argdesbycode:
+            if aspcs[i] not in argdesbycode_rv:
                 return None
-            argdes = argdesbycode[aspcs[i]]
-            if argdes.loc in locdesbycode:
-                locdes = locdesbycode[argdes.loc]
-            else:
-                locdes = None
+            argdes = argdesbycode_rv[aspcs[i]]
             a = arg[i]
-            if (argdes.kind == 'n') or (argdes.kind == 'o'):
+            if argdes.kind in ('n', 'o', 'p'):
                 if (argdes.kind == 'o') and (len(a) == 0):
                     continue
-                try:
-                    value = int(a, 0)
-                except ValueError:
+                if argdes.kind == 'p':
+                    value = siminst.parse_target(a, symbols, addr)
+                    if value is None:
+                        return None
+                else:
+                    try:
+                        value = int(a, 0)
+                    except ValueError:
+                        return None
+                if value & ((1 << argdes.shift) - 1):
                     return None
                 if (value < argdes.min) or (value > argdes.max):
                     return None
-                if value >= 0:  # TODO error? value>=value
-                    valunsig = value
-                else:
-                    valunsig = value + 0x100000000
-                if locdes is not None:
-                    valunsig &= (1 << locdes.bits) - 1
-                    encoding |=  valunsig << locdes.startbit
+                encoding |= imm_encode_rv(immdesbycode_rv[argdes.loc], value)
             elif argdes.kind == 'g':
                 reg = a
                 regkind = argdes.kind
                 if reg is None:
-                    rn = 0
-                elif (reg in regname2regnum_rv) or (reg[0] == 'x'):
-                    rn = siminst.regnum(reg)
-                    if rn is None:
-                        return None
-                    if rn != 0:
-                        if locdes is not None:
-                            if rn >= 1 << locdes.bits:
-                                return None
-                            if pinfo & locdes.rd_mask != 0:
-                                rddep = True
-                            if pinfo & locdes.wr_mask != 0:
-                                wrdep = True
-                else:
                     return None
-                if locdes is not None:
-                    encoding |= rn << locdes.startbit
-            elif argdes.kind == 'p':
-                try:
-                    value = int(a, 0)
-                except ValueError:
-                    value = 0
-                if value & ((1 << argdes.shift) - 1):
-                    return None
-                value >>= argdes.shift
-                if (value < argdes.min) or (value > argdes.max):
-                    return None
-            elif argdes.kind == 'a':
-                try:
-                    value = int(a, 0)
-                except ValueError:
-                    value = 0
-                if value & ((1 << argdes.shift) - 1):
-                    return None
-                value >>= argdes.shift
-                if (value < argdes.min) or (value > argdes.max):
+                rn = siminst.regnum_rv(reg)
+                if (rn is None) or (rn > argdes.max):
                     return None
+                locdes = locdesbycode_rv[argdes.loc]
+                if rn != 0:
+                    if pinfo & locdes.rd_mask != 0:
+                        rddep = True
+                    if pinfo & locdes.wr_mask != 0:
+                        wrdep = True
+                encoding |= rn << locdes.startbit
             else:
                 return None
         return simarg(argspec = argspec, regkind = regkind, reg = rn, value = value, rddep = rddep, wrdep = wrdep, encoding = encoding, text = argtext)
     @staticmethod
-    def parse(asline):
+    def decode(encoding):
+        opcode = encoding >> 26
+        if opcode not in instdesbyopcode:
+            return None
+        for des in instdesbyopcode[opcode]:
+            if (encoding & des.mask) != des.match:
+                continue
+            args = []
+            for argspec in des.args:
+                p = argspec.find('(')
+                if p != -1:
+                    aspcs = [argspec[0 : p], argspec[p + 1: -1]]
+                else:
+                    aspcs = [argspec]
+                txt = []
+                for aspc in aspcs:
+                    argdes = argdesbycode.get(aspc)
+                    if argdes is None:
+                        txt = None
+                        break
+                    locdes = locdesbycode.get(argdes.loc)
+                    if locdes is None:
+                        txt.append('0')
+                        continue
+                    val = (encoding >> locdes.startbit) & ((1 << locdes.bits) - 1)
+                    if argdes.kind == 'g':
+                        txt.append(regnum2regname[val])
+                        continue
+                    if (argdes.min < 0) and (val & (1 << (locdes.bits - 1))):
+                        val -= 1 << locdes.bits
+                    txt.append(str(val << argdes.shift))
+                if txt is None:
+                    args = None
+                    break
+                if len(txt) > 1:
+                    argtext = txt[0] + '(' + txt[1] + ')'
+                else:
+                    argtext = txt[0]
+                a = siminst.parse_argument(argspec, argtext, des.pinfo)
+                if a is None:
+                    args = None
+                    break
+                args.append(a)
+            if args is None:
+                continue
+            return siminst(des.name, args, encoding, des.pinfo)
+        return None
+    @staticmethod
+    def decode_rv(encoding):
+        opcode = encoding & 0x7f
+        if opcode not in instdesbyopcode_rv:
+            return None
+        for des in instdesbyopcode_rv[opcode]:
+            if (encoding & des.mask) != des.match:
+                continue
+            args = []
+            for argspec in des.args:
+                p = argspec.find('(')
+                if p != -1:
+                    aspcs = [argspec[0 : p], argspec[p + 1: -1]]
+                else:
+                    aspcs = [argspec]
+                txt = []
+                for aspc in aspcs:
+                    argdes = argdesbycode_rv[aspc]
+                    if argdes.kind == 'g':
+                        locdes = locdesbycode_rv[argdes.loc]
+                        rn = (encoding >> locdes.startbit) & ((1 << locdes.bits) - 1)
+                        txt.append(regnum2regname_rv[rn])
+                    else:
+                        txt.append(str(imm_decode_rv(immdesbycode_rv[argdes.loc], encoding)))
+                if len(txt) > 1:
+                    argtext = txt[0] + '(' + txt[1] + ')'
+                else:
+                    argtext = txt[0]
+                args.append(siminst.parse_argument_rv(argspec, argtext, des.pinfo))
+            return siminst(des.name, args, encoding, des.pinfo, isa = 'rv')
+        return None
+    @staticmethod
+    def parse(asline, symbols = None, addr = 0):
         p = asline.find('#')
         if p >= 0:
             asline = asline[0:p]
@@ -901,6 +1319,7 @@ class siminst(object):
                     args.append(a)
         if operation not in instdesbyname:
             sys.stderr.write('operation "%s" in line "%s" is not known\n'%(operation, asline))
+            return None
         matchdes = None
         for des in instdesbyname[operation]:
             if len(args) != len(des.args):
@@ -908,7 +1327,7 @@ class siminst(object):
             matchargs = []
             argmismatch = False
             for i in range(0,len(args)):
-                ma = siminst.parse_argument(des.args[i], args[i], des.pinfo)
+                ma = siminst.parse_argument(des.args[i], args[i], des.pinfo, symbols, addr)
                 if ma == None:
                     argmismatch = True
                     break
@@ -925,7 +1344,7 @@ class siminst(object):
             encoding |= a.encoding
         return siminst(operation, matchargs, encoding, matchdes.pinfo)
     @staticmethod
-    def parse_rv(asline):
+    def parse_rv(asline, symbols = None, addr = 0):
         p = asline.find('#')
         if p >= 0:
             asline = asline[0:p]
@@ -947,6 +1366,7 @@ class siminst(object):
                     args.append(a)
         if operation not in instdesbyname_rv:
             sys.stderr.write('operation "%s" in line "%s" is not known\n'%(operation, asline))
+            return None
         matchdes = None
         for des in instdesbyname_rv[operation]:
             if len(args) != len(des.args):
@@ -954,7 +1374,7 @@ class siminst(object):
             matchargs = []
             argmismatch = False
             for i in range(0,len(args)):
-                ma = siminst.parse_argument(des.args[i], args[i], des.pinfo)
+                ma = siminst.parse_argument_rv(des.args[i], args[i], des.pinfo, symbols, addr)
                 if ma == None:
                     argmismatch = True
                     break
@@ -969,15 +1389,99 @@ class siminst(object):
         encoding = matchdes.match
         for a in matchargs:
             encoding |= a.encoding
-        return siminst(operation, matchargs, encoding, matchdes.pinfo)
+        return siminst(operation, matchargs, encoding, matchdes.pinfo, isa = 'rv')
 
-    def __init__(self, operation = None, args = [], encoding = 0, pinfo = 0):
+    def __init__(self, operation = None, args = [], encoding = 0, pinfo = 0, isa = 'mips'):
         self.operation = operation
         self.args = args
         self.encoding = encoding
         self.pinfo = pinfo
+        self.isa = isa
         self.stalls = 0
         self.forward = (0, 0)
+        if isa == 'rv':
+            self.rdmask, self.wrmask = self.regmasks(1)
+        else:
+            self.rdmask, self.wrmask = self.regmasks(31)
+        self.rdregs = maskregs(self.rdmask)
+        self.wrregs = maskregs(self.wrmask)
+        self.srcregs = self.forwardregs()
+
+    def forwardregs(self):
+        """
+        Registers read through RS and RT operand (forwarding) paths
+        """
+        rs = None
+        rt = None
+        for a in self.args:
+            if not a.rddep:
+                continue
+            aspec = a.argspec
+            p = aspec.find('(')
+            if p != -1:
+                aspec = aspec[p+1:-1]
+            loc = self.argdesc(aspec).loc
+            if loc == "RS":
+                rs = a.reg
+            elif loc == "RT":
+                rt = a.reg
+        return rs, rt
+
+    def target(self, addr):
+        """
+        Static branch or jump target of the instruction placed at addr,
+        None for register jumps and other instructions
+        """
+        if not (self.pinfo & (CBD | UBD)) or not self.args:
+            return None
+        a = self.args[-1]
+        if a.regkind is not None:
+            return None
+        if self.isa == 'rv':
+            return val_to_reg(addr + a.value)
+        if argdesbycode[a.argspec].kind == 'a':
+            return ((addr + 4) & ~((1 << 28) - 1)) | (a.value << 2)
+        return val_to_reg(addr + 4 + (a.value << 2))
+
+    def regmasks(self, linkreg = 31):
+        """
+        Registers read and written by the instruction as bit masks,
+        general purpose registers are bits 0-31, REG_HI and REG_LO
+        stand for HI/LO registers. Implicit link register accesses
+        are included.
+        """
+        rdmask = 0
+        wrmask = 0
+        for a in self.args:
+            if (a.regkind == 'g') and (a.reg is not None):
+                if a.rddep:
+                    rdmask |= 1 << a.reg
+                if a.wrdep:
+                    wrmask |= 1 << a.reg
+        pinfo = self.pinfo
+        if pinfo & WR_31:
+            wrmask |= 1 << linkreg
+        elif (pinfo & UBD) and (pinfo & (WR_d | WR_t)) and not wrmask:
+            wrmask |= 1 << linkreg
+        if (pinfo & (UBD | RD_s)) == (UBD | RD_s) and not rdmask:
+            rdmask |= 1 << linkreg
+        if pinfo & (WR_HILO | WR_HI):
+            wrmask |= 1 << REG_HI
+        if pinfo & (WR_HILO | WR_LO):
+            wrmask |= 1 << REG_LO
+        if pinfo & RD_HI:
+            rdmask |= 1 << REG_HI
+        if pinfo & RD_LO:
+            rdmask |= 1 << REG_LO
+        return rdmask, wrmask
+
+    def argdesc(self, argspec):
+        """
+        Description of operand code from the table of the instruction ISA
+        """
+        if self.isa == 'rv':
+            return argdesbycode_rv[argspec]
+        return argdesbycode[argspec]
 
     def depanalyze(self, instb, bidir = False):
         deps = 0
@@ -1009,7 +1513,240 @@ class siminst(object):
                     s += a.text
         return s
 
+class simconsole(object):
+    """
+    Console for simulated programs. The output is collected in memory
+    and passed to the output file in bulk when flushed or when more
+    than bufsize characters are pending, input is taken from preloaded
+    text.
+    """
+    def __init__(self, input = '', output = None, bufsize = 65536):
+        self.inbuf = input
+        self.inpos = 0
+        self.outbuf = []
+        self.outlen = 0
+        self.output = output
+        self.bufsize = bufsize
+    def write(self, s):
+        self.outbuf.append(s)
+        self.outlen += len(s)
+        if (self.output is not None) and (self.outlen >= self.bufsize):
+            self.flush()
+    def flush(self):
+        if self.output is None:
+            return
+        self.output.write(''.join(self.outbuf))
+        self.outbuf = []
+        self.outlen = 0
+    def getvalue(self):
+        return ''.join(self.outbuf)
+    def drain(self):
+        s = ''.join(self.outbuf)
+        self.outbuf = []
+        self.outlen = 0
+        return s
+    def feed(self, s):
+        self.inbuf = self.inbuf[self.inpos:] + s
+        self.inpos = 0
+    def read(self, size):
+        s = self.inbuf[self.inpos:self.inpos + size]
+        self.inpos += len(s)
+        return s
+    def readline(self, size = None):
+        p = self.inbuf.find('\n', self.inpos)
+        if p == -1:
+            p = len(self.inbuf)
+        else:
+            p += 1
+        if (size is not None) and (p - self.inpos > size):
+            p = self.inpos + size
+        s = self.inbuf[self.inpos:p]
+        self.inpos = p
+        return s
+
+class simsyscalls(object):
+    """
+    SPIM/MARS style syscall services together with the subset
+    of Linux o32 (and RISC-V Linux) write/read/exit calls.
+    Service number, arguments and result registers are taken
+    from the sysreg_* attributes of the CPU state.
+    """
+    def __init__(self, console = None, errconsole = None, heap = 0x10040000):
+        if console is None:
+            console = simconsole()
+        self.console = console
+        if errconsole is None:
+            errconsole = console
+        self.errconsole = errconsole
+        self.brk = heap
+        self.services = {
+            1: simsyscalls.sys_print_int,
+            4: simsyscalls.sys_print_string,
+            5: simsyscalls.sys_read_int,
+            8: simsyscalls.sys_read_string,
+            9: simsyscalls.sys_sbrk,
+            10: simsyscalls.sys_exit,
+            11: simsyscalls.sys_print_char,
+            12: simsyscalls.sys_read_char,
+            17: simsyscalls.sys_exit2,
+            34: simsyscalls.sys_print_hex,
+            36: simsyscalls.sys_print_uint,
+            63: simsyscalls.sys_read,
+            64: simsyscalls.sys_write,
+            93: simsyscalls.sys_exit2,
+            94: simsyscalls.sys_exit2,
+            4001: simsyscalls.sys_exit2,
+            4003: simsyscalls.sys_read,
+            4004: simsyscalls.sys_write,
+            4246: simsyscalls.sys_exit2,
+        }
+    def syscall(self, cpustate):
+        nr = cpustate.gpreg[cpustate.sysreg_nr]
+        if nr not in self.services:
+            sys.stderr.write('unknown syscall %d at 0x%08x\n'%(nr, cpustate.pc))
+            cpustate.halt('syscall')
+            return
+        args = [cpustate.gpreg[r] for r in cpustate.sysreg_args]
+        res = self.services[nr](self, cpustate, args)
+        if nr >= 4000:
+            # o32 ABI reports errors by a3 and positive errno in v0
+            err = (res is not None) and (res >= 0xfffff001)
+            if err:
+                res = val_to_reg(-reg_to_sig(res))
+            cpustate.wrgpreg(7, int(err))
+        if res is not None:
+            cpustate.wrgpreg(cpustate.sysreg_ret, res)
+    def console_for_fd(self, fd):
+        if fd == 2:
+            return self.errconsole
+        return self.console
+    def sys_print_int(self, cpustate, args):
+        self.console.write(str(reg_to_sig(args[0])))
+    def sys_print_uint(self, cpustate, args):
+        self.console.write(str(args[0]))
+    def sys_print_hex(self, cpustate, args):
+        self.console.write('0x%08x'%(args[0]))
+    def sys_print_char(self, cpustate, args):
+        self.console.write(chr(args[0] & 0xff))
+    def sys_print_string(self, cpustate, args):
+        self.console.write(cpustate.rdmemstr(args[0]))
+    def sys_read_int(self, cpustate, args):
+        try:
+            return int(self.console.readline().strip(), 0)
+        except ValueError:
+            return 0
+    def sys_read_char(self, cpustate, args):
+        s = self.console.read(1)
+        if len(s) == 0:
+            return 0
+        return ord(s)
+    def sys_read_string(self, cpustate, args):
+        if args[1] < 1:
+            return
+        s = self.console.readline(args[1] - 1)
+        cpustate.wrmemblock(args[0], s + '\0')
+    def sys_sbrk(self, cpustate, args):
+        addr = self.brk
+        self.brk = (self.brk + reg_to_sig(args[0]) + 3) & ~3
+        return addr
+    def sys_exit(self, cpustate, args):
+        cpustate.exitcode = 0
+        cpustate.halt('exit')
+    def sys_exit2(self, cpustate, args):
+        cpustate.exitcode = reg_to_sig(args[0])
+        cpustate.halt('exit')
+    def sys_write(self, cpustate, args):
+        if args[0] not in (1, 2):
+            return val_to_reg(-9)
+        self.console_for_fd(args[0]).write(cpustate.rdmemblock(args[1], args[2]))
+        return args[2]
+    def sys_read(self, cpustate, args):
+        if args[0] != 0:
+            return val_to_reg(-9)
+        s = self.console.read(args[2])
+        cpustate.wrmemblock(args[1], s)
+        return len(s)
+
+class simdevice(object):
+    """
+    Base of memory mapped peripherals. Accesses are passed with
+    offset relative to the device base, subword accesses are mapped
+    to rdreg/wrreg of the containing 32-bit register.
+    """
+    bigendian = True
+
+    def rdreg(self, offset):
+        return 0
+    def wrreg(self, offset, val):
+        return
+    def rdmem(self, offset, size):
+        val = self.rdreg(offset & ~3)
+        if size < 32:
+            if self.bigendian:
+                val >>= 32 - size - (offset & 3) * 8
+            else:
+                val >>= (offset & 3) * 8
+            val &= (1 << size) - 1
+        return val
+    def wrmem(self, offset, size, val):
+        if size < 32:
+            old = self.rdreg(offset & ~3)
+            mask = (1 << size) - 1
+            val &= mask
+            if self.bigendian:
+                sh = 32 - size - (offset & 3) * 8
+            else:
+                sh = (offset & 3) * 8
+            val = (old & ~(mask << sh)) | (val << sh)
+        self.wrreg(offset & ~3, val)
+
+class simbus(object):
+    """
+    Peripheral bus. Devices are kept in the range index sorted
+    by start address, pages which contain any device are flagged
+    in pages set so plain RAM accesses do not search the index.
+    """
+    pageshift = 12
+
+    def __init__(self):
+        self.starts = []
+        self.ranges = []
+        self.pages = set()
+    def register(self, device, base, size):
+        i = bisect.bisect_right(self.starts, base)
+        if (i > 0) and (self.ranges[i - 1][1] > base):
+            sys.stderr.write('device range 0x%08x overlaps existing one\n'%(base))
+            return False
+        if (i < len(self.starts)) and (self.starts[i] < base + size):
+            sys.stderr.write('device range 0x%08x overlaps existing one\n'%(base))
+            return False
+        self.starts.insert(i, base)
+        self.ranges.insert(i, (base, base + size, device))
+        for page in range(base >> self.pageshift, ((base + size - 1) >> self.pageshift) + 1):
+            self.pages.add(page)
+        return True
+    def lookup(self, addr):
+        i = bisect.bisect_right(self.starts, addr) - 1
+        if i >= 0:
+            start, end, device = self.ranges[i]
+            if addr < end:
+                return device, addr - start
+        return None, 0
+
 class simcpustate(object):
+    instopdeslist = instopdeslist
+    regname2regnum = regname2regnum
+    regnum2regname = regnum2regname
+    regprefix = '$'
+    delayslot = True
+    bigendian = True
+    hilo = True
+    sysreg_nr = 2
+    sysreg_args = (4, 5, 6, 7)
+    sysreg_ret = 2
+    linkreg = 31
+    excvector = 0x80000080
+
     def __init__(self):
         self.gpreg = [0] * 32
         self.pc = 0
@@ -1017,22 +1754,623 @@ class simcpustate(object):
         self.mhi = 0
         self.mlo = 0
         self.memory = {}
+        self.instmem = {}
+        self.halted = False
+        self.stopreq = False
+        self.stopreason = None
+        self.breakpoints = {}
+        self.bkpt_resume = None
+        self.watchpoints = []
+        self.watchpages = {}
+        self.watchhit = None
+        self.undolog = None
+        self.undochanges = None
+        self.undoirreversible = False
+        self.tracking = False
+        self.trackers = []
+        self.dirtyregs = 0
+        self.dirtywords = set()
+        self.dirtyfull = False
+        self.lasthilo = None
+        self.exitcode = None
+        self.syscalls = None
+        self.bus = None
+        self.cp0 = [0] * 32
+        self.excpolicy = 'halt'
+        self.cycle = 0
+        self.events = []
+        self.eventseq = 0
+        self.nextdue = EVENT_NEVER
+        self.eventmode = False
+        self.countbase = 0
+        self.compareevent = None
+        self.llbit = False
+        self.lladdr = None
+        self.llwatch = False
+        self.system = None
     def executeinst(self, inst):
-        op = instopdeslist[inst.operation]
-        op.fnc(self, inst, op)
+        op = self.instopdeslist[inst.operation]
+        res = op.fnc(self, inst, op)
+        if res == EXEC_EXCEPTION:
+            self.deliverexception(None)
+        return res
+    def exception(self, exccode, badvaddr = None):
+        """
+        Record exception cause, called by the operation which then
+        returns EXEC_EXCEPTION for delivery by the run loop
+        """
+        cp0 = self.cp0
+        cp0[CP0_CAUSE] = (cp0[CP0_CAUSE] & ~(CAUSE_BD | CAUSE_EXCCODE)) | (exccode << 2)
+        if badvaddr is not None:
+            cp0[CP0_BADVADDR] = val_to_reg(badvaddr)
+        return EXEC_EXCEPTION
+    def deliverexception(self, pend):
+        """
+        Exception is delivered according to excpolicy: 'halt' stops
+        with the state before the faulting instruction, 'vector'
+        continues at excvector, callable is called with CPU state and
+        exception code and returns True when it has set the state to
+        continue. The pend is pending branch target when the faulting
+        instruction is in the delay slot. Returns False when halted.
+        """
+        cp0 = self.cp0
+        self.unreserve()
+        if pend is not None:
+            cp0[CP0_EPC] = (self.pc - 4) & 0xffffffff
+            cp0[CP0_CAUSE] |= CAUSE_BD
+        else:
+            cp0[CP0_EPC] = self.pc
+        policy = self.excpolicy
+        if policy == 'vector':
+            status = cp0[CP0_STATUS]
+            cp0[CP0_STATUS] = (status & ~0x3f) | ((status << 2) & 0x3c)
+            self.pc = self.excvector
+            self.b_pend_pc = None
+            return True
+        if callable(policy) and policy(self, (cp0[CP0_CAUSE] & CAUSE_EXCCODE) >> 2):
+            return True
+        self.b_pend_pc = pend
+        self.halt('exception')
+        return False
+    @property
+    def exccode(self):
+        return (self.cp0[CP0_CAUSE] & CAUSE_EXCCODE) >> 2
+    def loadinstlist(self, instlist, addr = 0):
+        sections = []
+        if isinstance(instlist, siminstlist):
+            sections = instlist.sections
+            instlist = instlist.instlist
+        # memory views have to be read again after program load
+        self.dirtyfull = True
+        for inst in instlist:
+            self.instmem[addr] = (inst, self.instopdeslist[inst.operation])
+            self.memory[addr] = inst.encoding
+            if addr in self.breakpoints:
+                self.installbreakpoint(addr)
+            addr += 4
+        for saddr, data in sections:
+            self.loadsection(saddr, data)
+        return addr
+    def loadsection(self, addr, data):
+        """
+        Copy bytes to the memory, whole words are stored
+        by one update of the memory dictionary
+        """
+        data = bytearray(data)
+        end = addr + len(data)
+        self.dirtyfull = True
+        wstart = (addr + 3) & ~3
+        wend = max(end & ~3, wstart)
+        for a in range(addr, min(wstart, end)) + range(max(wend, wstart), end):
+            self.wrmem_ram(a, 8, data[a - addr])
+        words = array.array(WORDTYPE)
+        words.fromstring(bytes(data[wstart - addr : wend - addr]))
+        if self.bigendian != (sys.byteorder == 'big'):
+            words.byteswap()
+        self.memory.update(itertools.izip(xrange(wstart, wend, 4), itertools.imap(int, words)))
+    def halt(self, reason):
+        self.halted = True
+        self.stopreq = True
+        self.stopreason = reason
+    def run(self, maxsteps):
+        if self.halted:
+            return 0
+        self.stopreq = False
+        self.stopreason = None
+        self.bkpt_resume = self.pc
+        steps = 0
+        while True:
+            eventmode = self.eventmode
+            if self.undolog is not None:
+                runloop = self.runrecord
+            elif eventmode:
+                runloop = self.runloop_events
+            else:
+                runloop = self.runloop
+            steps += runloop(maxsteps - steps)
+            if (self.eventmode == eventmode) or (self.stopreason is not None):
+                break
+            # event was scheduled or the last one fired, switch the loop
+            self.stopreq = False
+        return steps
+    def runloop(self, maxsteps):
+        instmem = self.instmem
+        delayslot = self.delayslot
+        steps = 0
+        while (steps < maxsteps) and not self.stopreq:
+            try:
+                inst, op = instmem[self.pc]
+            except KeyError:
+                sys.stderr.write('no instruction at address 0x%08x\n'%(self.pc))
+                self.halt('fetch')
+                break
+            if delayslot:
+                pend = self.b_pend_pc
+                self.b_pend_pc = None
+                res = op.fnc(self, inst, op)
+            else:
+                res = op.fnc(self, inst, op)
+                pend = self.b_pend_pc
+                self.b_pend_pc = None
+            if res:
+                if res == EXEC_STOP:
+                    if delayslot:
+                        self.b_pend_pc = pend
+                    break
+                if res == EXEC_EXCEPTION:
+                    if not delayslot:
+                        pend = None
+                    if not self.deliverexception(pend):
+                        break
+            elif pend is None:
+                self.pc = (self.pc + 4) & 0xffffffff
+            else:
+                self.pc = pend
+            steps += 1
+            # kept current for events scheduled by devices and callbacks
+            self.cycle += 1
+        return steps
+    def runloop_events(self, maxsteps):
+        """
+        Run loop variant used when events are scheduled, the cycle
+        counter is kept exact for each instruction and compared
+        with the due cycle of the nearest event.
+        """
+        instmem = self.instmem
+        delayslot = self.delayslot
+        steps = 0
+        while (steps < maxsteps) and not self.stopreq:
+            if self.cycle >= self.nextdue:
+                self.fireevents()
+                if self.stopreq or not self.eventmode:
+                    break
+            try:
+                inst, op = instmem[self.pc]
+            except KeyError:
+                sys.stderr.write('no instruction at address 0x%08x\n'%(self.pc))
+                self.halt('fetch')
+                break
+            if delayslot:
+                pend = self.b_pend_pc
+                self.b_pend_pc = None
+                res = op.fnc(self, inst, op)
+            else:
+                res = op.fnc(self, inst, op)
+                pend = self.b_pend_pc
+                self.b_pend_pc = None
+            if res:
+                if res == EXEC_STOP:
+                    if delayslot:
+                        self.b_pend_pc = pend
+                    break
+                if res == EXEC_EXCEPTION:
+                    if not delayslot:
+                        pend = None
+                    if not self.deliverexception(pend):
+                        break
+            elif pend is None:
+                self.pc = (self.pc + 4) & 0xffffffff
+            else:
+                self.pc = pend
+            steps += 1
+            self.cycle += 1
+        return steps
+    def schedule(self, due, callback):
+        """
+        Call callback(cpustate) before the instruction executed at
+        the due cycle. Returns event handle for cancelevent().
+        """
+        event = [due, self.eventseq, callback]
+        self.eventseq += 1
+        heapq.heappush(self.events, event)
+        if due < self.nextdue:
+            self.nextdue = due
+        if not self.eventmode:
+            # leave the plain run loop after the current instruction
+            self.eventmode = True
+            self.stopreq = True
+        return event
+    def after(self, delay, callback):
+        return self.schedule(self.cycle + delay, callback)
+    def cancelevent(self, event):
+        event[2] = None
+    def fireevents(self):
+        events = self.events
+        while events and (events[0][0] <= self.cycle):
+            due, seq, callback = heapq.heappop(events)
+            if callback is not None:
+                callback(self)
+        if events:
+            self.nextdue = events[0][0]
+        else:
+            # nothing is pending, back to the plain run loop
+            self.nextdue = EVENT_NEVER
+            self.eventmode = False
+    def setirq(self, line, active = True):
+        """
+        Set or clear interrupt request line 0 to 7 (Cause IP bits),
+        the interrupt is taken before the next instruction
+        """
+        if active:
+            self.cp0[CP0_CAUSE] |= 1 << (8 + line)
+            self.irqcheck()
+        else:
+            self.cp0[CP0_CAUSE] &= ~(1 << (8 + line))
+    def irqcheck(self):
+        if self.cp0[CP0_CAUSE] & CAUSE_IP:
+            self.schedule(self.cycle, simcpustate.takeirq)
+    def takeirq(self):
+        cp0 = self.cp0
+        status = cp0[CP0_STATUS]
+        if (status & 1) and (status & cp0[CP0_CAUSE] & CAUSE_IP):
+            self.exception(EXC_INT)
+            pend = self.b_pend_pc
+            self.b_pend_pc = None
+            self.deliverexception(pend)
+    def rdcp0(self, reg):
+        if reg == CP0_COUNT:
+            return (self.cycle - self.countbase) & 0xffffffff
+        return self.cp0[reg]
+    def wrcp0(self, reg, val):
+        val &= 0xffffffff
+        if reg == CP0_COUNT:
+            self.countbase = self.cycle - val
+            self.schedcompare()
+        elif reg == CP0_COMPARE:
+            self.cp0[CP0_COMPARE] = val
+            self.setirq(IRQ_TIMER, False)
+            self.schedcompare()
+        elif reg == CP0_CAUSE:
+            # only software interrupt bits are writable
+            self.cp0[reg] = (self.cp0[reg] & ~0x300) | (val & 0x300)
+            self.irqcheck()
+        elif reg == CP0_STATUS:
+            self.cp0[reg] = val
+            self.irqcheck()
+        elif reg != CP0_BADVADDR:
+            self.cp0[reg] = val
+    def schedcompare(self):
+        if self.compareevent is not None:
+            self.cancelevent(self.compareevent)
+        delay = (self.cp0[CP0_COMPARE] - self.rdcp0(CP0_COUNT)) & 0xffffffff
+        if delay == 0:
+            delay = 1 << 32
+        self.compareevent = self.after(delay, simcpustate.comparematch)
+    def comparematch(self):
+        self.compareevent = None
+        self.setirq(IRQ_TIMER)
+        self.schedcompare()
+    def step(self):
+        return self.run(1) == 1
+    def setundolog(self, capacity):
+        """
+        Record old values of state changed by each executed instruction
+        into the ring buffer of given capacity, 0 disables recording.
+        """
+        if capacity:
+            self.undolog = collections.deque(maxlen = capacity)
+        else:
+            self.undolog = None
+        self.updateregaccess()
+        self.updatememaccess()
+    def settracking(self, enable):
+        """
+        Track registers and memory words changed since the last
+        changes() query. The first query reports full state change.
+        Memory words written by other cores of the system are
+        tracked as well.
+        """
+        self.tracking = enable
+        self.dirtyregs = 0
+        self.dirtywords = set()
+        self.dirtyfull = True
+        self.lasthilo = None
+        self.updateregaccess()
+        if self.system is not None:
+            self.system.updatetracking()
+            return
+        if enable:
+            self.trackers = [self]
+        else:
+            self.trackers = []
+        self.updatememaccess()
+    def updateregaccess(self):
+        # register write hooks are layered only when undo log
+        # or change tracking is active
+        wrgpreg = None
+        if self.undolog is not None:
+            wrgpreg = self.wrgpreg_log
+        if self.tracking:
+            if wrgpreg is None:
+                wrgpreg = self.wrgpreg_reg
+            self.wrgpreg_dirtynext = wrgpreg
+            wrgpreg = self.wrgpreg_dirty
+        if wrgpreg is not None:
+            self.wrgpreg = wrgpreg
+        elif 'wrgpreg' in self.__dict__:
+            del self.__dict__['wrgpreg']
+    def wrgpreg_dirty(self, regnum, val):
+        self.dirtyregs |= 1 << regnum
+        self.wrgpreg_dirtynext(regnum, val)
+    def wrmem_dirty(self, addr, size, val):
+        waddr = val_to_reg(addr) & ~3
+        for cpu in self.trackers:
+            cpu.dirtywords.add(waddr)
+        self.wrmem_dirtynext(addr, size, val)
+    def changes(self):
+        """
+        State changed since the previous call as statechanges with
+        lists of (register, value) and (word address, value) pairs,
+        hi and lo are None when not changed. HI/LO are compared
+        with the last reported values. When full is set, all
+        registers are reported and memory views have to be read
+        again (after enabling, restore() or program load).
+        """
+        full = self.dirtyfull
+        if full:
+            dirtyregs = 0xfffffffe
+        else:
+            dirtyregs = self.dirtyregs & 0xfffffffe
+        regs = [(r, self.gpreg[r]) for r in maskregs(dirtyregs)]
+        hi = None
+        lo = None
+        if self.hilo:
+            last = self.lasthilo
+            if full or (last is None) or (self.mhi != last[0]):
+                hi = self.mhi
+            if full or (last is None) or (self.mlo != last[1]):
+                lo = self.mlo
+            self.lasthilo = (self.mhi, self.mlo)
+        memory = self.memory
+        words = [(a, memory.get(a)) for a in sorted(self.dirtywords)]
+        self.dirtyregs = 0
+        self.dirtywords = set()
+        self.dirtyfull = False
+        return statechanges(self.pc, regs, hi, lo, words, full)
+    def runrecord(self, maxsteps):
+        """
+        Run loop variant used when the undo log is enabled. PC, pending
+        branch, HI/LO, LL bit, heap break and changed CP0 registers are
+        recorded for each instruction together with old values of the
+        written registers and memory. Instructions during which events
+        fire or are scheduled and device accesses cannot be undone,
+        the log is cleared after them so step_back() stops there.
+        Console output and consumed input are not restored.
+        """
+        instmem = self.instmem
+        delayslot = self.delayslot
+        undolog = self.undolog
+        cp0prev = list(self.cp0)
+        steps = 0
+        while (steps < maxsteps) and not self.stopreq:
+            changes = []
+            self.undochanges = changes
+            self.undoirreversible = False
+            eventseq = self.eventseq
+            if self.eventmode and (self.cycle >= self.nextdue):
+                self.undoirreversible = True
+                self.fireevents()
+                if self.stopreq:
+                    undolog.clear()
+                    break
+            pc = self.pc
+            rec = (pc, self.b_pend_pc, self.mhi, self.mlo, self.llbit,
+                   getattr(self.syscalls, 'brk', None))
+            try:
+                inst, op = instmem[pc]
+            except KeyError:
+                sys.stderr.write('no instruction at address 0x%08x\n'%(pc))
+                self.halt('fetch')
+                break
+            if delayslot:
+                pend = self.b_pend_pc
+                self.b_pend_pc = None
+                res = op.fnc(self, inst, op)
+            else:
+                res = op.fnc(self, inst, op)
+                pend = self.b_pend_pc
+                self.b_pend_pc = None
+            if res:
+                if res == EXEC_STOP:
+                    if delayslot:
+                        self.b_pend_pc = pend
+                    if self.undoirreversible:
+                        undolog.clear()
+                    break
+                if res == EXEC_EXCEPTION:
+                    if not delayslot:
+                        pend = None
+                    if not self.deliverexception(pend):
+                        # the faulting instruction has not been executed
+                        if self.undoirreversible:
+                            undolog.clear()
+                        break
+            elif pend is None:
+                self.pc = (self.pc + 4) & 0xffffffff
+            else:
+                self.pc = pend
+            steps += 1
+            self.cycle += 1
+            if self.cp0 != cp0prev:
+                cp0old = cp0prev
+                cp0prev = list(self.cp0)
+            else:
+                cp0old = None
+            if self.undoirreversible or (self.eventseq != eventseq):
+                undolog.clear()
+            else:
+                undolog.append(rec + (cp0old, changes))
+        self.undochanges = None
+        return steps
+    def wrgpreg_log(self, regnum, val):
+        if (regnum != 0) and (self.undochanges is not None):
+            self.undochanges.append((True, regnum, self.gpreg[regnum]))
+        simcpustate.wrgpreg(self, regnum, val)
+    def wrmem_log(self, addr, size, val):
+        if self.undochanges is not None:
+            waddr = val_to_reg(addr) & ~3
+            bus = self.bus
+            if ((bus is not None) and ((waddr >> bus.pageshift) in bus.pages) and
+                    (bus.lookup(waddr)[0] is not None)):
+                # device side effects cannot be undone
+                self.undoirreversible = True
+            else:
+                self.undochanges.append((False, waddr, self.memory.get(waddr)))
+        self.wrmem_next(addr, size, val)
+    def rdmem_log(self, addr, size, signed = False):
+        if self.undochanges is not None:
+            raddr = val_to_reg(addr)
+            bus = self.bus
+            if ((raddr >> bus.pageshift) in bus.pages) and (bus.lookup(raddr)[0] is not None):
+                # device reads can have side effects (consumed input)
+                self.undoirreversible = True
+        return self.rdmem_next(addr, size, signed)
+    def step_back(self, n = 1):
+        """
+        Undo up to n instructions recorded in the undo log, returns
+        the number of instructions stepped back. Stepping back stops
+        at the oldest record, see runrecord() for what cannot be undone.
+        """
+        steps = 0
+        undolog = self.undolog
+        while (steps < n) and undolog:
+            pc, b_pend_pc, mhi, mlo, llbit, brk, cp0old, changes = undolog.pop()
+            for isreg, idx, old in reversed(changes):
+                if isreg:
+                    if self.tracking:
+                        self.dirtyregs |= 1 << idx
+                else:
+                    for cpu in self.trackers:
+                        cpu.dirtywords.add(idx)
+                if isreg:
+                    self.gpreg[idx] = old
+                elif old is None:
+                    self.memory.pop(idx, None)
+                else:
+                    self.memory[idx] = old
+            if cp0old is not None:
+                self.cp0[:] = cp0old
+            if brk is not None:
+                self.syscalls.brk = brk
+            self.pc = pc
+            self.b_pend_pc = b_pend_pc
+            self.mhi = mhi
+            self.mlo = mlo
+            if llbit and not self.llbit:
+                self.reserve(self.lladdr)
+            elif self.llbit and not llbit:
+                self.unreserve()
+            steps += 1
+        if steps:
+            self.cycle -= steps
+            self.halted = False
+            self.stopreq = False
+            self.stopreason = None
+            self.exitcode = None
+        return steps
+    def snapshot(self):
+        """
+        Checkpoint of the whole architectural state including the heap
+        break of the syscall layer, console contents are not included.
+        """
+        return (list(self.gpreg), self.pc, self.b_pend_pc, self.mhi, self.mlo,
+                list(self.cp0), getattr(self.syscalls, 'brk', None), self.halted,
+                self.exitcode, dict(self.memory))
+    def restore(self, snapshot):
+        (gpreg, self.pc, self.b_pend_pc, self.mhi, self.mlo, cp0, brk,
+         self.halted, self.exitcode, memory) = snapshot
+        self.gpreg[:] = gpreg
+        self.cp0[:] = cp0
+        # memory is updated in place, it can be shared with other cores
+        self.memory.clear()
+        self.memory.update(memory)
+        self.dirtyfull = True
+        for cpu in self.trackers:
+            cpu.dirtyfull = True
+        if brk is not None:
+            self.syscalls.brk = brk
+        self.stopreq = self.halted
+        self.stopreason = None
+        if self.undolog is not None:
+            self.undolog.clear()
+    def installbreakpoint(self, pc):
+        entry = self.instmem.get(pc)
+        if entry is None:
+            return
+        inst, op = entry
+        if op.fnc is instop_bkpt:
+            op = op.operator
+        self.instmem[pc] = (inst, instopdes(instop_bkpt, op, self.breakpoints[pc], op.size))
+    def setbreakpoint(self, pc, condition = None):
+        """
+        Breakpoints replace the instruction memory entry so execution
+        pays nothing for addresses without breakpoint. The optional
+        condition is called with CPU state when the address is reached.
+        """
+        self.breakpoints[pc] = condition
+        self.installbreakpoint(pc)
+    def clearbreakpoint(self, pc):
+        if pc not in self.breakpoints:
+            return
+        del self.breakpoints[pc]
+        entry = self.instmem.get(pc)
+        if (entry is not None) and (entry[1].fnc is instop_bkpt):
+            self.instmem[pc] = (entry[0], entry[1].operator)
+    def setwatchpoint(self, addr, size = 4, kind = 'rw'):
+        addr = val_to_reg(addr)
+        wp = (addr, addr + size, kind)
+        self.watchpoints.append(wp)
+        for page in range(addr >> simbus.pageshift, ((addr + size - 1) >> simbus.pageshift) + 1):
+            self.watchpages.setdefault(page, []).append(wp)
+        self.updatememaccess()
+    def clearwatchpoint(self, addr):
+        addr = val_to_reg(addr)
+        self.watchpoints = [wp for wp in self.watchpoints if wp[0] != addr]
+        self.watchpages = {}
+        for wp in self.watchpoints:
+            for page in range(wp[0] >> simbus.pageshift, ((wp[1] - 1) >> simbus.pageshift) + 1):
+                self.watchpages.setdefault(page, []).append(wp)
+        self.updatememaccess()
+    def watchcheck(self, addr, size, kind):
+        for wp in self.watchpages[addr >> simbus.pageshift]:
+            if (addr < wp[1]) and (addr + (size >> 3) > wp[0]) and (kind in wp[2]):
+                self.watchhit = (addr, size, kind)
+                self.stopreq = True
+                self.stopreason = 'watchpoint'
     def rdgpreg(self, regnum):
         return self.gpreg[regnum]
     def wrgpreg(self, regnum, val):
         if regnum != 0:
             self.gpreg[regnum] = val_to_reg(val)
+    wrgpreg_reg = wrgpreg
     def rdreg(self, reg):
-        if reg in regname2regnum:
-            regnum = regname2regnum[reg]
+        if reg in self.regname2regnum:
+            regnum = self.regname2regnum[reg]
             return self.rdgpreg(regnum)
         return None
     def wrreg(self, reg, val):
-        if reg in regname2regnum:
-            regnum = regname2regnum[reg]
+        if reg in self.regname2regnum:
+            regnum = self.regname2regnum[reg]
             self.wrgpreg(regnum, val)
         return None
     def rdarg(self, arg):
@@ -1056,7 +2394,10 @@ class simcpustate(object):
             sys.stderr.write('attemp to read uninitialized memory at address 0x%08x\n'%(addr))
             val = 0
         if size < 32:
-            val >>= 32 - size - (addr - waddr) * 8
+            if self.bigendian:
+                val >>= 32 - size - (addr - waddr) * 8
+            else:
+                val >>= (addr - waddr) * 8
             val &= (1 << size) - 1
         if signed:
             if val & (1 << (size - 1)):
@@ -1072,26 +2413,408 @@ class simcpustate(object):
                 old = 0
             mask = (1 << size) - 1
             val &= mask
-            sh = 32 - size - (addr - waddr) * 8
+            if self.bigendian:
+                sh = 32 - size - (addr - waddr) * 8
+            else:
+                sh = (addr - waddr) * 8
             mask <<= sh
             val <<= sh
             val = (old & ~mask) | val
         self.memory[waddr] = val
+    rdmem_ram = rdmem
+    wrmem_ram = wrmem
+    def attachbus(self, bus):
+        self.bus = bus
+        self.updatememaccess()
+    def updatememaccess(self):
+        # memory accessors are replaced only when a bus or watchpoints
+        # are present so plain RAM accesses stay at the fast path otherwise
+        if self.watchpoints:
+            rdmem, wrmem = self.rdmem_watch, self.wrmem_watch
+        elif self.bus is not None:
+            rdmem, wrmem = self.rdmem_io, self.wrmem_io
+        else:
+            rdmem, wrmem = None, None
+        if self.llwatch:
+            if wrmem is None:
+                wrmem = self.wrmem_ram
+            self.wrmem_llnext = wrmem
+            wrmem = self.wrmem_ll
+        if self.undolog is not None:
+            if wrmem is None:
+                wrmem = self.wrmem_ram
+            self.wrmem_next = wrmem
+            wrmem = self.wrmem_log
+            if self.bus is not None:
+                self.rdmem_next = rdmem
+                rdmem = self.rdmem_log
+        if self.trackers:
+            if wrmem is None:
+                wrmem = self.wrmem_ram
+            self.wrmem_dirtynext = wrmem
+            wrmem = self.wrmem_dirty
+        for attr, fnc in (('rdmem', rdmem), ('wrmem', wrmem)):
+            if fnc is not None:
+                setattr(self, attr, fnc)
+            elif attr in self.__dict__:
+                del self.__dict__[attr]
+    def rdmem_watch(self, addr, size, signed = False):
+        addr = val_to_reg(addr)
+        if (addr >> simbus.pageshift) in self.watchpages:
+            self.watchcheck(addr, size, 'r')
+        if self.bus is not None:
+            return self.rdmem_io(addr, size, signed)
+        return self.rdmem_ram(addr, size, signed)
+    def wrmem_watch(self, addr, size, val):
+        addr = val_to_reg(addr)
+        if (addr >> simbus.pageshift) in self.watchpages:
+            self.watchcheck(addr, size, 'w')
+        if self.bus is not None:
+            return self.wrmem_io(addr, size, val)
+        return self.wrmem_ram(addr, size, val)
+    def reserve(self, addr):
+        self.llbit = True
+        self.lladdr = val_to_reg(addr)
+        if self.system is not None:
+            self.system.reserve(self, self.lladdr)
+    def unreserve(self):
+        self.llbit = False
+        if self.system is not None:
+            self.system.unreserve(self)
+    def wrmem_ll(self, addr, size, val):
+        self.system.storecheck(val_to_reg(addr) & ~3)
+        self.wrmem_llnext(addr, size, val)
+    def rdmem_io(self, addr, size, signed = False):
+        addr = val_to_reg(addr)
+        bus = self.bus
+        if (addr >> bus.pageshift) in bus.pages:
+            device, offset = bus.lookup(addr)
+            if device is not None:
+                val = device.rdmem(offset, size)
+                if signed and (val & (1 << (size - 1))):
+                    val -= 1 << size
+                return val
+        return self.rdmem_ram(addr, size, signed)
+    def wrmem_io(self, addr, size, val):
+        addr = val_to_reg(addr)
+        bus = self.bus
+        if (addr >> bus.pageshift) in bus.pages:
+            device, offset = bus.lookup(addr)
+            if device is not None:
+                device.wrmem(offset, size, val & ((1 << size) - 1))
+                return
+        self.wrmem_ram(addr, size, val)
+    def rdmemblock(self, addr, size):
+        return ''.join([chr(self.rdmem(addr + i, 8)) for i in range(0, size)])
+    def rdmemstr(self, addr, maxsize = 0x10000):
+        s = []
+        for i in range(0, maxsize):
+            c = self.rdmem(addr + i, 8)
+            if c == 0:
+                break
+            s.append(chr(c))
+        return ''.join(s)
+    def wrmemblock(self, addr, data):
+        for i in range(0, len(data)):
+            self.wrmem(addr + i, 8, ord(data[i]))
+    def regastext(self, i, regsymbolic = True):
+        rn = self.regprefix + str(i)
+        if regsymbolic and (i in self.regnum2regname):
+            rn = self.regnum2regname[i]
+        rn = rn.ljust(4)
+        return rn + ':' + '%08x'%(self.gpreg[i])
     def regsastext(self, regsymbolic = True):
         regstxt = []
         for i in range(0, len(self.gpreg)):
-            rn = '$'+str(i)
-            if regsymbolic and (i in regnum2regname):
-                rn = regnum2regname[i]
-            rn = rn.ljust(4)
-            regstxt.append(rn + ':' + '%08x'%(self.gpreg[i]))
-        regstxt.append('mhi :' + '%08x'%(self.mhi))
-        regstxt.append('mlo :' + '%08x'%(self.mlo))
+            regstxt.append(self.regastext(i, regsymbolic))
+        if self.hilo:
+            regstxt.append('mhi :' + '%08x'%(self.mhi))
+            regstxt.append('mlo :' + '%08x'%(self.mlo))
         return regstxt
 
+class simcpustate_rv(simcpustate):
+    instopdeslist = instopdeslist_rv
+    regname2regnum = regname2regnum_rv
+    regnum2regname = regnum2regname_rv
+    regprefix = 'x'
+    delayslot = False
+    bigendian = False
+    hilo = False
+    sysreg_nr = 17
+    sysreg_args = (10, 11, 12, 13, 14, 15)
+    sysreg_ret = 10
+    linkreg = 1
+
+class simsystem(object):
+    """
+    System of N cores sharing memory, instruction memory and
+    syscall services. Cores run in turn for quantum instructions,
+    which keeps the interleaving deterministic. Stores of all cores
+    are checked against ll reservations only while a reservation
+    exists.
+    """
+    def __init__(self, ncores = 2, cpuclass = simcpustate, quantum = 1000,
+                 syscalls = None):
+        self.memory = {}
+        self.instmem = {}
+        self.quantum = quantum
+        self.reservations = {}
+        self.cores = []
+        self.current = 0
+        self.stopcore = None
+        for i in range(0, ncores):
+            cpu = cpuclass()
+            cpu.memory = self.memory
+            cpu.instmem = self.instmem
+            cpu.syscalls = syscalls
+            cpu.system = self
+            cpu.coreid = i
+            cpu.cp0[CP0_PRID] = i
+            self.cores.append(cpu)
+    def loadinstlist(self, instlist, addr = 0):
+        for cpu in self.cores[1:]:
+            cpu.dirtyfull = True
+        return self.cores[0].loadinstlist(instlist, addr)
+    def updatetracking(self):
+        """
+        Memory is shared, stores of every core are reported
+        to all cores tracking changes
+        """
+        trackers = [cpu for cpu in self.cores if cpu.tracking]
+        for cpu in self.cores:
+            cpu.trackers = trackers
+            cpu.updatememaccess()
+    def start(self, entry = 0, stacktop = None, stacksize = 0x10000):
+        """
+        Start all cores at entry, the first argument register holds
+        the core number and each core gets own stack below stacktop
+        """
+        for cpu in self.cores:
+            cpu.pc = entry
+            cpu.b_pend_pc = None
+            cpu.halted = False
+            cpu.wrgpreg(cpu.sysreg_args[0], cpu.coreid)
+            if stacktop is not None:
+                if cpu.delayslot:
+                    sp = 29
+                else:
+                    sp = 2
+                cpu.wrgpreg(sp, stacktop - cpu.coreid * stacksize)
+    def run(self, maxsteps):
+        """
+        Run cores round-robin until maxsteps instructions are executed
+        in total, all cores halt or a core stops for other reason
+        (breakpoint, watchpoint, exception) which is then in stopcore.
+        """
+        steps = 0
+        self.stopcore = None
+        ncores = len(self.cores)
+        idle = 0
+        while (steps < maxsteps) and (idle < ncores):
+            cpu = self.cores[self.current]
+            self.current = (self.current + 1) % ncores
+            if cpu.halted:
+                idle += 1
+                continue
+            idle = 0
+            steps += cpu.run(min(self.quantum, maxsteps - steps))
+            if cpu.stopreq and not cpu.halted:
+                self.stopcore = cpu
+                break
+            if cpu.halted and (cpu.stopreason != 'exit'):
+                self.stopcore = cpu
+                break
+        return steps
+    @property
+    def halted(self):
+        for cpu in self.cores:
+            if not cpu.halted:
+                return False
+        return True
+    def reserve(self, cpu, addr):
+        if not self.reservations:
+            for c in self.cores:
+                c.llwatch = True
+                c.updatememaccess()
+        self.reservations[cpu] = addr & ~3
+    def unreserve(self, cpu):
+        """
+        Drop reservation of the core, stores are no longer
+        checked when no reservation is left
+        """
+        if cpu not in self.reservations:
+            return
+        del self.reservations[cpu]
+        if not self.reservations:
+            for c in self.cores:
+                c.llwatch = False
+                c.updatememaccess()
+    def storecheck(self, waddr):
+        for cpu, addr in self.reservations.items():
+            if addr == waddr:
+                cpu.llbit = False
+                self.unreserve(cpu)
+
+def runsystem(job):
+    """
+    Run independent system described by dictionary with keys
+    source (assembly lines), isa, ncores, quantum, maxsteps, entry,
+    input and coverage; returns picklable summary, with coverage
+    set the summary includes simcoverage of the run for merging
+    """
+    if job.get('isa', 'mips') == 'riscv':
+        cpuclass = simcpustate_rv
+    else:
+        cpuclass = simcpustate
+    console = simconsole(job.get('input', ''))
+    system = simsystem(job.get('ncores', 2), cpuclass, job.get('quantum', 1000),
+                       simsyscalls(console))
+    instlist = siminstlist()
+    if cpuclass is simcpustate_rv:
+        instlist.isa = 'rv'
+    entry = job.get('entry', 0)
+    instlist.base = entry
+    errors = instlist.appendlines(job['source'])
+    if errors:
+        return {'errors': errors}
+    system.loadinstlist(instlist, entry)
+    system.start(entry, job.get('stacktop'))
+    collector = None
+    if job.get('coverage'):
+        from simcov import simcovcollector
+        collector = simcovcollector(system.instmem)
+        collector.attach()
+    steps = system.run(job.get('maxsteps', 1000000))
+    res = {'steps': steps, 'console': console.getvalue(),
+           'cores': [{'pc': cpu.pc, 'gpr': list(cpu.gpreg), 'stopreason': cpu.stopreason,
+                      'exitcode': cpu.exitcode} for cpu in system.cores]}
+    if collector is not None:
+        res['coverage'] = collector.detach()
+    return res
+
+def runsystems(jobs, processes = None):
+    """
+    Run independent systems in parallel worker processes
+    """
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(runsystem, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+class simblock(object):
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.succs = []
+        self.preds = []
+        self.instate = None
+        self.outstate = None
+        self.cycles = 0
+
+# Pipeline state at block boundary, registers written one and two
+# cycles before and those of them written by loads
+PIPE_EMPTY = (0, 0, 0, 0)
+
+def pipestate_merge(a, b):
+    if a is None:
+        return b
+    return (a[0] | b[0], a[1] | b[1], a[2] | b[2], a[3] | b[3])
+
+def stall_forward(insta, prevs):
+    """
+    Load-use stalls and (rs, rt) forwarding of insta, prevs is sequence
+    of (instruction, stalls) of the preceding instructions starting
+    by the nearest one. The rules are shared by the list analysis,
+    pipeline diagrams and streaming timing.
+    """
+    latency = 3
+    distance = 1
+    stalls = 0
+    ff_rs = 0
+    ff_rt = 0
+    for instb, stallsb in prevs:
+        if distance >= latency:
+            break
+        if (instb.pinfo & LDD) and (distance == 1):
+            for argb in instb.args:
+                if not argb.wrdep:
+                    continue
+                for arga in insta.args:
+                    if (arga.regkind == argb.regkind) and (arga.reg == argb.reg):
+                        if arga.rddep:
+                            stalls += 2 - distance
+                            distance = 2
+        for argb in instb.args:
+            if not argb.wrdep:
+                continue
+            for arga in insta.args:
+                if (arga.regkind == argb.regkind) and (arga.reg == argb.reg):
+                    if arga.rddep:
+                        aspec = arga.argspec
+                        p = aspec.find('(')
+                        if p != -1:
+                            aspec = aspec[p+1:-1]
+                        loc = insta.argdesc(aspec).loc
+                        if (loc == "RS") and (ff_rs == 0):
+                            ff_rs = latency - distance
+                        if (loc == "RT") and (ff_rt == 0):
+                            ff_rt = latency - distance
+        distance += 1 + stallsb
+    return stalls, (ff_rs, ff_rt)
+
+def stripcomment(line):
+    """
+    Remove comment from source line, '#' in strings is kept
+    """
+    if '"' not in line:
+        return line.split('#', 1)[0]
+    instr = False
+    esc = False
+    for i, c in enumerate(line):
+        if esc:
+            esc = False
+        elif c == '\\':
+            esc = instr
+        elif c == '"':
+            instr = not instr
+        elif (c == '#') and not instr:
+            return line[0:i]
+    return line
+
+def retargettext(inst, addr, taddr, symbols = ()):
+    """
+    Source text of branch or jump inst at addr encoded for target
+    address taddr, label operand found in symbols is kept
+    """
+    args = inst.args
+    text = args[-1].text
+    if text not in symbols:
+        if inst.isa == 'rv':
+            text = str(taddr - addr)
+        elif argdesbycode[args[-1].argspec].kind == 'a':
+            text = str(taddr & 0x0fffffff)
+        else:
+            text = str(taddr - addr - 4)
+    return inst.operation + ' ' + ','.join([a.text for a in args[0:-1]] + [text])
+
 class siminstlist(object):
     def __init__(self):
         self.instlist = []
+        self.isa = 'mips'
+        # address of the first instruction, used to resolve labels
+        self.base = 0
+        self.labels = {}
+        # data sections as [address, bytearray] and their labels addresses
+        self.sections = []
+        self.datalabels = {}
+        self.datasection = None
+        self.indata = False
+        # data labels waiting for the alignment of the next data
+        self.datapending = []
+        self.cycles = None
     def append(self, inst):
         if isinstance(inst, basestring):
             inst = siminst.parse(inst)
@@ -1099,9 +2822,307 @@ class siminstlist(object):
         return inst
     def append_rv(self, inst):
         if isinstance(inst, basestring):
-            inst_code = siminst.parse_rv(inst)
-        self.instlist.append(inst_code)
-        return inst_code
+            inst = siminst.parse_rv(inst)
+        self.isa = 'rv'
+        self.instlist.append(inst)
+        return inst
+    def symbols(self):
+        """
+        Addresses of instruction and data labels
+        """
+        symbols = dict(self.datalabels)
+        for label, idx in self.labels.items():
+            symbols[label] = self.base + 4 * idx
+        return symbols
+    def parseinst(self, inst, i = None, symbols = None):
+        """
+        Parse instruction to be placed at index i (at the end by
+        default), branch and jump operands can name labels
+        """
+        if not isinstance(inst, basestring):
+            return inst
+        if i is None:
+            i = len(self.instlist)
+        if symbols is None:
+            symbols = self.symbols()
+        addr = self.base + 4 * i
+        if self.isa == 'rv':
+            return siminst.parse_rv(inst, symbols, addr)
+        return siminst.parse(inst, symbols, addr)
+    def appendlines(self, lines):
+        """
+        Append instructions from assembly source lines, empty
+        and comment only lines are skipped. Labels are recorded
+        in labels as index of the following instruction, labels
+        in data sections in datalabels as address. Instructions
+        are parsed after all labels are known, so branches can
+        refer forward. Returns list of (line number, line) pairs
+        which cannot be parsed, these are left out of the list.
+        """
+        errors = []
+        pending = []
+        for lineno, line in enumerate(lines, 1):
+            text = stripcomment(line)
+            m = labelre.match(text)
+            if m is not None:
+                if self.indata:
+                    self.datapending.append(m.group(1))
+                else:
+                    self.labels[m.group(1)] = len(self.instlist) + len(pending)
+                text = text[m.end():]
+            text = text.strip()
+            if len(text) == 0:
+                continue
+            if text[0] == '.':
+                if not self.directive(text):
+                    errors.append((lineno, line))
+                continue
+            if self.indata:
+                sys.stderr.write('instruction in data section "%s"\n'%(text))
+                errors.append((lineno, line))
+                continue
+            pending.append((lineno, line, text))
+        self.placelabels()
+        base = len(self.instlist)
+        while True:
+            symbols = self.symbols()
+            insts = [self.parseinst(text, base + j, symbols)
+                     for j, (lineno, line, text) in enumerate(pending)]
+            failed = [j for j, inst in enumerate(insts) if inst is None]
+            if not failed:
+                break
+            # lines which cannot be parsed take no index, labels and
+            # branches after them are resolved again
+            errors += [pending[j][0:2] for j in failed]
+            pending = [p for p, inst in zip(pending, insts) if inst is not None]
+            for label, idx in self.labels.items():
+                if idx > base:
+                    self.labels[label] = idx - len([j for j in failed if base + j < idx])
+        self.instlist += insts
+        errors.sort()
+        return errors
+    @property
+    def bigendian(self):
+        return self.isa != 'rv'
+    def directive(self, text):
+        """
+        Process assembler directive, data are appended to the current
+        data section bytearray. Returns False for invalid directive.
+        """
+        elem = text.split(None, 1)
+        name = elem[0]
+        if len(elem) > 1:
+            argtext = elem[1].strip()
+        else:
+            argtext = ''
+        try:
+            if name == '.text':
+                if argtext:
+                    sys.stderr.write('.text address is given at load time\n')
+                    return False
+                self.placelabels()
+                self.indata = False
+                return True
+            if name == '.data':
+                self.placelabels()
+                if argtext:
+                    self.datasection = [self.dataval(argtext), bytearray()]
+                    self.sections.append(self.datasection)
+                elif self.datasection is None:
+                    self.datasection = [DATA_BASE, bytearray()]
+                    self.sections.append(self.datasection)
+                self.indata = True
+                return True
+            if name in ('.globl', '.global', '.ent', '.end', '.set'):
+                return True
+            if not self.indata:
+                sys.stderr.write('directive "%s" outside data section\n'%(name))
+                return False
+            data = self.datasection[1]
+            # labels are placed after automatic alignment of .half
+            # and .word and after .align, as the MIPS assembler does
+            if name == '.half':
+                self.dataalign(2)
+            elif name == '.word':
+                self.dataalign(4)
+            elif name == '.align':
+                self.dataalign(1 << self.dataval(argtext))
+            self.placelabels()
+            if name in ('.ascii', '.asciiz'):
+                strs = stringre.findall(argtext)
+                if (not strs) or stringre.sub('', argtext).strip(' \t,'):
+                    sys.stderr.write('invalid string in "%s"\n'%(text))
+                    return False
+                for st in strs:
+                    data.extend(st.decode('string_escape'))
+                    if name == '.asciiz':
+                        data.append(0)
+                return True
+            if name == '.space':
+                data.extend(bytearray(self.dataval(argtext)))
+                return True
+            if name == '.align':
+                return True
+            if name not in ('.word', '.half', '.byte'):
+                sys.stderr.write('directive "%s" is not known\n'%(name))
+                return False
+            vals = []
+            for a in argtext.split(','):
+                a = a.strip()
+                p = a.find(':')
+                if p >= 0:
+                    vals += [self.dataval(a[0:p])] * self.dataval(a[p + 1:])
+                else:
+                    vals.append(self.dataval(a))
+            if name == '.byte':
+                data.extend([v & 0xff for v in vals])
+                return True
+            if name == '.half':
+                a = array.array('H', [v & 0xffff for v in vals])
+            else:
+                a = array.array(WORDTYPE, [v & 0xffffffff for v in vals])
+            if self.bigendian != (sys.byteorder == 'big'):
+                a.byteswap()
+            data.extend(a.tostring())
+        except ValueError as e:
+            sys.stderr.write('invalid directive "%s": %s\n'%(text, e))
+            return False
+        return True
+    def dataval(self, text):
+        text = text.strip()
+        if text in self.datalabels:
+            return self.datalabels[text]
+        return int(text, 0)
+    def placelabels(self):
+        """
+        Assign the pending data labels the current data address
+        """
+        sec = self.datasection
+        for label in self.datapending:
+            self.datalabels[label] = sec[0] + len(sec[1])
+        self.datapending = []
+    def dataalign(self, align):
+        addr, data = self.datasection
+        pad = -(addr + len(data)) & (align - 1)
+        if pad:
+            data.extend(bytearray(pad))
+    def replace(self, i, inst):
+        """
+        Replace instruction i, only the new line is parsed and
+        analysis results are updated within the affected window
+        when analyze_stall_forward() has been run before.
+        """
+        inst = self.parseinst(inst, i)
+        if inst is None:
+            return None
+        old = self.instlist[i]
+        self.instlist[i] = inst
+        if self.cycles is not None:
+            self.cycles -= old.stalls
+            inst.stalls = 0
+            self.reanalyze(i)
+        return inst
+    def insert(self, i, inst):
+        """
+        Insert instruction before index i, labels and static branch
+        and jump targets keep pointing to the same instructions
+        """
+        symbols = self.symbols()
+        for label, idx in self.labels.items():
+            if idx >= i:
+                symbols[label] += 4
+        inst = self.parseinst(inst, i, symbols)
+        if inst is None:
+            return None
+        self.instlist.insert(i, inst)
+        for label, idx in self.labels.items():
+            if idx >= i:
+                self.labels[label] = idx + 1
+        self.edittargets(i, 1, symbols)
+        if self.cycles is not None:
+            self.cycles += 1
+            inst.stalls = 0
+            self.reanalyze(i)
+        return inst
+    def delete(self, i):
+        """
+        Delete instruction i, references to it move to the following one
+        """
+        old = self.instlist.pop(i)
+        for label, idx in self.labels.items():
+            if idx > i:
+                self.labels[label] = idx - 1
+        self.edittargets(i, -1, self.symbols())
+        if self.cycles is not None:
+            self.cycles -= 1 + old.stalls
+            if i < len(self.instlist):
+                self.reanalyze(i)
+        return old
+    def edittargets(self, i, delta, symbols):
+        """
+        Encode again branches and jumps whose target moved after one
+        instruction was inserted (delta 1) or deleted (delta -1) at
+        index i. Label operands are resolved again, numeric offsets
+        are changed to reach the same instruction.
+        """
+        base = self.base
+        oldn = len(self.instlist) - delta
+        for k, inst in enumerate(self.instlist):
+            if not (inst.pinfo & (CBD | UBD)):
+                continue
+            if k < i:
+                oldk = k
+            elif delta > 0:
+                # the inserted instruction is parsed at its place
+                if k == i:
+                    continue
+                oldk = k - 1
+            else:
+                oldk = k + 1
+            t = inst.target(base + 4 * oldk)
+            if (t is None) or (t & 3):
+                continue
+            ti = (t - base) >> 2
+            if (ti < 0) or (ti > oldn):
+                continue
+            if (ti > i) or ((ti == i) and (delta > 0)):
+                ti += delta
+            taddr = base + 4 * ti
+            if inst.target(base + 4 * k) != taddr:
+                self.retarget(k, taddr, symbols)
+    def retarget(self, k, taddr, symbols):
+        """
+        Encode branch or jump k again for target address taddr
+        """
+        inst = self.instlist[k]
+        text = retargettext(inst, self.base + 4 * k, taddr, symbols)
+        newinst = self.parseinst(text, k, symbols)
+        if newinst is None:
+            sys.stderr.write('cannot encode "%s" at index %d for target 0x%08x\n'%
+                             (inst.astext(), k, taddr))
+            return None
+        newinst.stalls = inst.stalls
+        newinst.forward = inst.forward
+        self.instlist[k] = newinst
+        return newinst
+    def reanalyze(self, start):
+        """
+        Recompute stalls and forwarding from start until results
+        settle. Instruction depends only on two predecessors and
+        stalls of the previous one, so the work is bounded by pipeline
+        latency unless stall changes propagate.
+        """
+        j = start
+        iend = len(self.instlist)
+        while j < iend:
+            inst = self.instlist[j]
+            oldstalls = inst.stalls
+            self.analyze_inst(j)
+            self.cycles += inst.stalls - oldstalls
+            if (j >= start + 2) and (inst.stalls == oldstalls):
+                break
+            j += 1
+        return self.cycles
     def listastext(self, regsymbolic = True):
         l = []
         for inst in self.instlist:
@@ -1122,17 +3143,38 @@ class siminstlist(object):
                 if mutvector[j]:
                     self.instlist[i] = inst2
                     self.instlist[i + 1] = inst1
+                    self.cycles = None
                 j += 1
                 if j >= len(mutvector):
                     break
             if not mutpossible:
                 break
-    def analyze(self):
-        iend = len(self.instlist)
+    def timing(self, config = None):
+        """
+        Timing analysis for pipeline configuration (pipeconfig, the
+        forwarding pipeline by default) returned as simtiming. The
+        instructions are not modified, so one list can be analysed
+        for many configurations.
+        """
+        if config is None:
+            config = pipeconfig()
+        res = simtiming(config, len(self.instlist))
+        if config.model == 'nofwd':
+            self.timing_nofwd(res)
+        elif config.model == 'cfg':
+            self.timing_cfg(res, config.base)
+        else:
+            self.timing_stall_forward(res, config.muldiv)
+        return res
+
+    def timing_nofwd(self, res):
+        insts = self.instlist
+        iend = len(insts)
+        stalls = res.stalls
         cycles = 4
         for i in range(0, iend):
-            cycles += 1 + self.instlist[i].stalls
-            for a in self.instlist[i].args:
+            cycles += 1 + stalls[i]
+            for a in insts[i].args:
                if a.wrdep:
                    regkind = a.regkind
                    reg = a.reg
@@ -1141,66 +3183,305 @@ class siminstlist(object):
                    j = i
                    while True:
                        j += 1
-                       if j >= len(self.instlist):
+                       if j >= iend:
                            break
-                       instb = self.instlist[j]
-                       distance += 1 + instb.stalls
+                       instb = insts[j]
+                       distance += 1 + stalls[j]
                        if distance >= latency:
                            break
                        for argb in instb.args:
                            if argb.rddep:
                                if (argb.regkind == regkind) and (argb.reg == reg):
-                                   # sys.stdout.write('i %d j %d latency %d distance %d\n'%(i, j, latency, distance))
-                                   stalls = latency - distance
-                                   instb.stalls += stalls
-                                   distance += stalls
-        return cycles
+                                   st = latency - distance
+                                   stalls[j] += st
+                                   distance += st
+        res.cycles = cycles
 
-    def analyze_stall_forward(self):
-        iend = len(self.instlist)
+    def timing_stall_forward(self, res, muldiv = None):
+        stalls = res.stalls
+        forward_rs = res.forward_rs
+        forward_rt = res.forward_rt
         cycles = 4
-        for i in range(0, iend):
-            distance = 0
-            j = i
+        if muldiv is not None:
+            hilo_ready = 0
+            mdbusy = 0
+            mdoverlap = 0
+            mdstalls = 0
+        prevstalls = 0
+        for i in range(0, len(self.instlist)):
             insta = self.instlist[i]
-            insta.stalls = 0;
-            latency = 3
-            ff_rs = 0
-            ff_rt = 0
-            while j > 0:
-                distance += 1 + self.instlist[j].stalls
-                if distance >= latency:
-                    break
-                j -= 1
-                instb = self.instlist[j]
-                if (instb.pinfo & LDD) and (distance == 1):
-                    for argb in instb.args:
-                        if not argb.wrdep:
-                            continue
-                        for arga in insta.args:
-                            if (arga.regkind == argb.regkind) and (arga.reg == argb.reg):
-                                if arga.rddep:
-                                    insta.stalls += 2 - distance
-                                    distance = 2
-                for argb in instb.args:
-                    if not argb.wrdep:
-                        continue
-                    for arga in insta.args:
-                        if (arga.regkind == argb.regkind) and (arga.reg == argb.reg):
-                            if arga.rddep:
-                                aspec = arga.argspec
-                                p = aspec.find('(')
-                                if p != -1:
-                                    aspec = aspec[p+1:-1]
-                                if (argdesbycode[aspec].loc == "RS") and (ff_rs == 0):
-                                    ff_rs = latency - distance
-                                if (argdesbycode[aspec].loc == "RT") and (ff_rt == 0):
-                                    ff_rt = latency - distance
-
-            insta.forward = (ff_rs, ff_rt)
-            cycles += 1 + self.instlist[i].stalls
-        return cycles
+            st, ff = self.stall_forward(i, prevstalls)
+            forward_rs[i], forward_rt[i] = ff
+            if muldiv is not None:
+                issue = cycles + st
+                if (insta.rdmask | insta.wrmask) & REG_HILO_MASK:
+                    if issue < hilo_ready:
+                        st += hilo_ready - issue
+                        mdstalls += hilo_ready - issue
+                        issue = hilo_ready
+                    latency = muldiv.latency(insta)
+                    if latency:
+                        hilo_ready = issue + latency
+                        mdbusy += latency
+                elif issue < hilo_ready:
+                    mdoverlap += 1
+            stalls[i] = st
+            prevstalls = st
+            cycles += 1 + st
+        if muldiv is not None:
+            res.muldivstats = muldivstats(mdbusy, mdoverlap, mdstalls)
+        res.cycles = cycles
+
+    def analyze(self):
+        """
+        Stalls without forwarding stored into the instructions
+        """
+        res = self.timing(pipeconfig('nofwd'))
+        res.apply(self)
+        return res.cycles
+
+    def analyze_stall_forward(self, muldiv = None):
+        """
+        Load-use stalls and forwarding paths stored into the
+        instructions. When muldiv unit description is given,
+        multiply/divide results are ready only after the unit latency
+        and instructions accessing HI/LO are interlocked until then,
+        the unit statistics are stored in muldivstats.
+        """
+        res = self.timing(pipeconfig('forward', muldiv))
+        res.apply(self)
+        if muldiv is not None:
+            self.muldivstats = res.muldivstats
+            # HI/LO interlocks are not local, no incremental updates
+            self.cycles = None
+        else:
+            self.cycles = res.cycles
+        return res.cycles
+
+    def stall_forward(self, i, prevstalls):
+        """
+        Load-use stalls and (rs, rt) forwarding of instruction i,
+        depends only on the two previous instructions and stalls
+        of the previous one
+        """
+        insts = self.instlist
+        if i > 1:
+            prevs = ((insts[i - 1], prevstalls), (insts[i - 2], 0))
+        elif i == 1:
+            prevs = ((insts[0], prevstalls),)
+        else:
+            prevs = ()
+        return stall_forward(insts[i], prevs)
+
+    def analyze_inst(self, i):
+        """
+        Load-use stalls and forwarding of instruction i stored
+        into the instruction, used for incremental updates
+        """
+        if i > 0:
+            prevstalls = self.instlist[i - 1].stalls
+        else:
+            prevstalls = 0
+        insta = self.instlist[i]
+        insta.stalls, insta.forward = self.stall_forward(i, prevstalls)
+
+    def analyze_superscalar(self, width = 2, maxmem = 1, maxbranch = 1,
+                            branchslot0 = True, loadlatency = 2):
+        """
+        In-order issue of up to width instructions per cycle. Group
+        is closed when the slots are used up, an operand is not ready
+        (results are forwarded to the next cycle, loads after
+        loadlatency cycles), when the instruction writes register
+        written in the group or when pairing rules limiting memory
+        operations and branches per cycle do not allow it.
+        """
+        ready = [0] * 34
+        groups = []
+        group = []
+        cycle = 0
+        nmem = 0
+        nbranch = 0
+        grpwr = 0
+        for i in range(0, len(self.instlist)):
+            inst = self.instlist[i]
+            earliest = cycle
+            for r in inst.rdregs:
+                if ready[r] > earliest:
+                    earliest = ready[r]
+            ismem = inst.pinfo & (LDD | SM)
+            isbranch = inst.pinfo & (CBD | UBD)
+            if group and ((earliest > cycle) or (len(group) >= width) or
+                          (ismem and (nmem >= maxmem)) or
+                          (isbranch and ((nbranch >= maxbranch) or branchslot0)) or
+                          (inst.wrmask & grpwr)):
+                groups.append((cycle, group))
+                group = []
+                nmem = 0
+                nbranch = 0
+                grpwr = 0
+                cycle = max(cycle + 1, earliest)
+            elif earliest > cycle:
+                cycle = earliest
+            group.append(i)
+            if ismem:
+                nmem += 1
+            if isbranch:
+                nbranch += 1
+            grpwr |= inst.wrmask
+            if inst.pinfo & LDD:
+                latency = loadlatency
+            else:
+                latency = 1
+            for r in inst.wrregs:
+                ready[r] = cycle + latency
+        if group:
+            groups.append((cycle, group))
+            cycle += 1
+        cycles = cycle + 4
+        ipc = float(len(self.instlist)) / cycles
+        return ssresult(cycles, ipc, groups)
+
+    def buildcfg(self, base = 0):
+        """
+        Split the list into basic blocks, base is the address
+        of the first instruction used to resolve branch targets.
+        """
+        n = len(self.instlist)
+        leaders = set([0])
+        targets = {}
+        for i in range(0, n):
+            inst = self.instlist[i]
+            if not (inst.pinfo & (CBD | UBD)):
+                continue
+            t = inst.target(base + 4 * i)
+            if (t is not None) and not (t & 3):
+                ti = (t - base) >> 2
+                if (ti >= 0) and (ti < n):
+                    leaders.add(ti)
+                    targets[i] = ti
+            if inst.isa == 'rv':
+                leaders.add(i + 1)
+            else:
+                leaders.add(i + 2)
+        leaders = sorted([l for l in leaders if l < n])
+        blocks = []
+        blockat = {}
+        for k in range(0, len(leaders)):
+            if k + 1 < len(leaders):
+                end = leaders[k + 1]
+            else:
+                end = n
+            b = simblock(leaders[k], end)
+            blockat[b.start] = b
+            blocks.append(b)
+        for k in range(0, len(blocks)):
+            b = blocks[k]
+            fallthrough = True
+            for i in range(b.start, b.end):
+                inst = self.instlist[i]
+                if not (inst.pinfo & (CBD | UBD)):
+                    continue
+                if i in targets:
+                    b.succs.append(blockat[targets[i]])
+                if (inst.pinfo & UBD) and not (inst.wrmask & ~inst.rdmask):
+                    fallthrough = False
+            if fallthrough and (k + 1 < len(blocks)):
+                if blocks[k + 1] not in b.succs:
+                    b.succs.append(blocks[k + 1])
+            for sb in b.succs:
+                sb.preds.append(b)
+        return blocks
+
+    def analyze_block(self, start, end, instate, cache = None):
+        """
+        Stalls and forwarding inside one block entered with given
+        pipeline state, results are kept in cache dictionary by
+        block and state when it is given.
+        """
+        key = (start, end, instate)
+        if cache is not None:
+            res = cache.get(key)
+            if res is not None:
+                return res
+        wr1, ld1, wr2, ld2 = instate
+        stalls = []
+        forward = []
+        for i in range(start, end):
+            inst = self.instlist[i]
+            st = 0
+            if ld1 & inst.rdmask:
+                st = 1
+                wr2, ld2 = wr1, ld1
+                wr1, ld1 = 0, 0
+            ff = [0, 0]
+            for k in range(0, 2):
+                r = inst.srcregs[k]
+                if r is None:
+                    continue
+                if wr1 & (1 << r):
+                    ff[k] = 2
+                elif wr2 & (1 << r):
+                    ff[k] = 1
+            stalls.append(st)
+            forward.append((ff[0], ff[1]))
+            wr2, ld2 = wr1, ld1
+            wr1 = inst.wrmask
+            if inst.pinfo & LDD:
+                ld1 = inst.wrmask
+            else:
+                ld1 = 0
+        res = (stalls, forward, (wr1, ld1, wr2, ld2))
+        if cache is not None:
+            cache[key] = res
+        return res
+
+    def timing_cfg(self, res, base = 0):
+        """
+        Stall and forwarding analysis over control flow graph, block
+        boundary states are propagated along edges (merged at joins)
+        until they settle, so loop back-edges are taken into account.
+        Blocks and their results are local to the call.
+        """
+        blocks = self.buildcfg(base)
+        if not blocks:
+            return
+        cache = {}
+        # propagation starts at the first block, blocks left without
+        # state are entered only from unreachable code or from
+        # themselves and start with empty pipeline
+        for eb in blocks:
+            if eb.instate is not None:
+                continue
+            eb.instate = PIPE_EMPTY
+            work = [eb]
+            while work:
+                b = work.pop()
+                b.outstate = self.analyze_block(b.start, b.end, b.instate, cache)[2]
+                for sb in b.succs:
+                    instate = pipestate_merge(sb.instate, b.outstate)
+                    if instate != sb.instate:
+                        sb.instate = instate
+                        if sb not in work:
+                            work.append(sb)
+        cycles = 4
+        for b in blocks:
+            stalls, forward, outstate = self.analyze_block(b.start, b.end, b.instate, cache)
+            b.cycles = b.end - b.start
+            for i in range(b.start, b.end):
+                st = stalls[i - b.start]
+                res.stalls[i] = st
+                res.forward_rs[i], res.forward_rt[i] = forward[i - b.start]
+                b.cycles += st
+            cycles += b.cycles
+        res.cycles = cycles
 
+    def analyze_cfg(self, base = 0):
+        """
+        Control flow graph analysis stored into the instructions
+        """
+        res = self.timing(pipeconfig('cfg', None, base))
+        res.apply(self)
+        return res.cycles
 
 if __name__ == '__main__':
 
@@ -1259,6 +3540,8 @@ if __name__ == '__main__':
     instlist.append(siminst.parse('mthi k1'))
 
 
+    # only the registers changed by the instruction are printed
+    cpu.settracking(True)
     for i in range(0, len(instlist.instlist)):
         c = 0
         sys.stdout.write(instlist.instlist[i].astext() + '\n')
@@ -1266,7 +3549,13 @@ if __name__ == '__main__':
         sys.stdout.write('stalls ' + str(instlist.instlist[i].stalls))
         sys.stdout.write(' ff_rs ' + str(instlist.instlist[i].forward[0]))
         sys.stdout.write(' ff_rt ' + str(instlist.instlist[i].forward[1]) + '\n')
-        for rstr in cpu.regsastext():
+        changes = cpu.changes()
+        regstxt = [cpu.regastext(r) for r, val in changes.regs]
+        if changes.hi is not None:
+            regstxt.append('mhi :' + '%08x'%(changes.hi))
+        if changes.lo is not None:
+            regstxt.append('mlo :' + '%08x'%(changes.lo))
+        for rstr in regstxt:
              sys.stdout.write(' ' + rstr)
              c += 1
              if c % 6 == 0:
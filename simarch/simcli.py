@@ -0,0 +1,408 @@
+#!/usr/bin/python2
+
+"""
+Command line front-end of the simarch simulator for batch use
+
+Subcommands assemble, disassemble, run and analyze write their
+results as JSON lines or CSV records. Records are collected in
+a buffer and written in bulk, the per-step trace of the run
+is produced only at higher verbosity levels.
+
+Assembled program can be stored as raw, Intel HEX, SREC or ELF
+image, the other subcommands accept these images in place of
+the assembly source.
+"""
+
+import sys
+import os
+import json
+import csv
+import argparse
+import collections
+import StringIO
+
+from simarch import siminst, siminstlist, simcpustate, simcpustate_rv
+from simarch import simconsole, simsyscalls
+from simarch import pipeconfig
+from simobj import simimage, imageformat, readimage, writeimage, unpackwords
+from simprof import simprofiler, stallmap
+from simcov import simcoverage, simcovcollector, covstats
+from simopt import simpeephole
+
+__author__ = "Pavel Pisa"
+__copyright__ = "Copyright 2017-2019, Czech Technical University"
+__license__ = "GPLv2+"
+
+VERB_QUIET = 0
+VERB_NORMAL = 1
+VERB_TRACE = 2
+VERB_TRACEREGS = 3
+
+class simrecordwriter(object):
+    """
+    Buffered writer of records, each record is sequence of field
+    names and sequence of values. CSV header is written each time
+    the set of fields changes.
+    """
+    def __init__(self, stream, fmt = 'jsonl', bufsize = 4096):
+        self.stream = stream
+        self.fmt = fmt
+        self.bufsize = bufsize
+        self.names = []
+        self.values = []
+        self.csvheader = None
+    def emit(self, names, values):
+        self.names.append(names)
+        self.values.append(values)
+        if len(self.values) >= self.bufsize:
+            self.flush()
+    def flush(self):
+        if not self.values:
+            return
+        if self.fmt == 'csv':
+            buf = StringIO.StringIO()
+            writer = csv.writer(buf, lineterminator = '\n')
+            for names, values in zip(self.names, self.values):
+                if names != self.csvheader:
+                    writer.writerow(names)
+                    self.csvheader = names
+                writer.writerow(values)
+            text = buf.getvalue()
+        else:
+            text = '\n'.join([json.dumps(collections.OrderedDict(zip(names, values)))
+                              for names, values in zip(self.names, self.values)]) + '\n'
+        self.stream.write(text)
+        self.names = []
+        self.values = []
+
+def readsource(fname):
+    if fname == '-':
+        return sys.stdin.read().split('\n')
+    with open(fname) as f:
+        return f.read().split('\n')
+
+def assemblesource(fname, isa, base = 0):
+    instlist = siminstlist()
+    if isa == 'riscv':
+        instlist.isa = 'rv'
+    instlist.base = base
+    errors = instlist.appendlines(readsource(fname))
+    for lineno, line in errors:
+        sys.stderr.write('%s:%d: cannot parse "%s"\n'%(fname, lineno, line.strip()))
+    if errors:
+        return None
+    return instlist
+
+def parseint(s):
+    return int(s, 0) & 0xffffffff
+
+def regnames(cpu):
+    return [cpu.regnum2regname.get(i, cpu.regprefix + str(i)) for i in range(0, 32)]
+
+ASM_FIELDS = ('kind', 'addr', 'encoding', 'text')
+
+def loadprogram(opts):
+    """
+    Instruction list of the program given by the assembly source
+    or previously written image, the image is returned as well
+    to be loaded instead of the list
+    """
+    if imageformat(opts.source) is not None:
+        image = readimage(opts.source, None, opts.base, None, opts.isa)
+        if image is None:
+            return None, None
+        if image.isa != opts.isa:
+            sys.stderr.write('image "%s" is for %s isa\n'%(opts.source, image.isa))
+            return None, None
+        opts.base = image.entry
+        return image.instlist(), image
+    return assemblesource(opts.source, opts.isa, opts.base), None
+
+def cmd_assemble(opts, out):
+    instlist = assemblesource(opts.source, opts.isa, opts.base)
+    if instlist is None:
+        return 1
+    if opts.object is not None:
+        image = simimage.frominstlist(instlist, opts.base)
+        if not writeimage(opts.object, image, opts.objformat):
+            return 1
+    addr = opts.base
+    for inst in instlist.instlist:
+        out.emit(ASM_FIELDS, ('inst', addr, '%08x'%(inst.encoding), inst.astext()))
+        addr += 4
+    return 0
+
+def cmd_disassemble(opts, out):
+    symbols = {}
+    if opts.raw or (imageformat(opts.source) is not None):
+        if opts.raw:
+            fmt = 'raw'
+        else:
+            fmt = None
+        if opts.endian is None:
+            bigendian = None
+        else:
+            bigendian = opts.endian == 'big'
+        image = readimage(opts.source, fmt, opts.base, bigendian, opts.isa)
+        if image is None:
+            return 1
+        if image.isa != opts.isa:
+            sys.stderr.write('image "%s" is for %s isa\n'%(opts.source, image.isa))
+            return 1
+        chunks = [(addr, unpackwords(data, image.bigendian)) for addr, data in image.segments]
+        for name, addr in image.symbols.items():
+            symbols[addr] = name
+    else:
+        words = [int(w, 16) for w in ' '.join(readsource(opts.source)).split()]
+        chunks = [(opts.base, words)]
+    if opts.isa == 'riscv':
+        decode = siminst.decode_rv
+    else:
+        decode = siminst.decode
+    for addr, words in chunks:
+        for w in words:
+            if addr in symbols:
+                out.emit(ASM_FIELDS, ('label', addr, '', symbols[addr]))
+            inst = decode(w)
+            if inst is not None:
+                text = inst.astext()
+            else:
+                text = '.word 0x%08x'%(w)
+            out.emit(ASM_FIELDS, ('inst', addr, '%08x'%(w), text))
+            addr += 4
+    return 0
+
+def cmd_run(opts, out):
+    instlist, image = loadprogram(opts)
+    if instlist is None:
+        return 1
+    if opts.isa == 'riscv':
+        cpu = simcpustate_rv()
+    else:
+        cpu = simcpustate()
+    if opts.input is not None:
+        with open(opts.input) as f:
+            console = simconsole(f.read())
+    else:
+        console = simconsole()
+    cpu.syscalls = simsyscalls(console)
+    if image is not None:
+        image.load(cpu)
+    else:
+        cpu.loadinstlist(instlist, opts.base)
+        cpu.pc = opts.base
+    for init in opts.reg:
+        name, val = init.split('=', 1)
+        if name not in cpu.regname2regnum:
+            sys.stderr.write('unknown register "%s"\n'%(name))
+            return 1
+        cpu.wrreg(name, parseint(val))
+    for init in opts.mem:
+        addr, vals = init.split('=', 1)
+        addr = parseint(addr)
+        for val in vals.split(','):
+            cpu.wrmem(addr, 32, parseint(val))
+            addr += 4
+    prof = None
+    if opts.profile is not None:
+        if image is not None:
+            symbols = image.symbols
+        else:
+            symbols = instlist.symbols()
+        prof = simprofiler(cpu, symbols, stallmap(instlist))
+        prof.attach()
+    collector = None
+    if opts.coverage is not None:
+        collector = simcovcollector(cpu.instmem)
+        collector.attach()
+
+    verbosity = opts.verbosity
+    if verbosity >= VERB_TRACE:
+        names = regnames(cpu) + ['hi', 'lo']
+        fields = ('kind', 'step', 'pc', 'text')
+        if verbosity >= VERB_TRACEREGS:
+            fields = fields + ('written',)
+        steps = 0
+        while steps < opts.steps:
+            pc = cpu.pc
+            if cpu.run(1) != 1:
+                break
+            steps += 1
+            inst = cpu.instmem[pc][0]
+            if verbosity >= VERB_TRACEREGS:
+                vals = cpu.gpreg + [cpu.mhi, cpu.mlo]
+                written = ' '.join(['%s=%08x'%(names[r], vals[r]) for r in inst.wrregs])
+                out.emit(fields, ('step', steps, pc, inst.astext(), written))
+            else:
+                out.emit(fields, ('step', steps, pc, inst.astext()))
+    else:
+        steps = cpu.run(opts.steps)
+    if prof is not None:
+        with open(opts.profile, 'w') as f:
+            prof.write_folded(f, opts.profile_metric)
+    if collector is not None:
+        cov = collector.detach()
+        # coverage of previous runs of the program is accumulated
+        if os.path.exists(opts.coverage):
+            old = simcoverage.load(opts.coverage)
+            if (old is None) or not cov.merge(old):
+                return 1
+        cov.save(opts.coverage)
+        out.emit(('kind',) + covstats._fields, ('coverage',) + cov.stats(cpu.instmem))
+
+    if verbosity >= VERB_NORMAL:
+        text = console.drain()
+        if text:
+            out.emit(('kind', 'text'), ('console', text))
+        fields = ['kind', 'pc'] + regnames(cpu)
+        values = ['regs', cpu.pc] + cpu.gpreg
+        if cpu.hilo:
+            fields += ['hi', 'lo']
+            values += [cpu.mhi, cpu.mlo]
+        out.emit(tuple(fields), tuple(values))
+        for dump in opts.dump:
+            addr, count = dump.split(':', 1)
+            addr = parseint(addr)
+            for i in range(0, int(count, 0)):
+                out.emit(('kind', 'addr', 'value'), ('mem', addr, cpu.rdmem(addr, 32)))
+                addr += 4
+    if cpu.stopreason is None and steps >= opts.steps:
+        stopreason = 'steps'
+    else:
+        stopreason = cpu.stopreason
+    out.emit(('kind', 'steps', 'stopreason', 'exitcode'),
+             ('result', steps, stopreason, cpu.exitcode))
+    return 0
+
+def cmd_analyze(opts, out):
+    instlist, image = loadprogram(opts)
+    if instlist is None:
+        return 1
+    if opts.model == 'superscalar':
+        # issue groups have no per-instruction stalls, the issue
+        # cycle of each instruction is reported instead
+        res = instlist.analyze_superscalar(opts.width)
+        cycles = res.cycles
+        if opts.verbosity >= VERB_NORMAL:
+            fields = ('kind', 'addr', 'text', 'cycle', 'slot')
+            for cycle, group in res.groups:
+                for slot, i in enumerate(group):
+                    out.emit(fields, ('issue', opts.base + 4 * i,
+                                      instlist.instlist[i].astext(), cycle, slot))
+    else:
+        timing = instlist.timing(pipeconfig(opts.model, None, opts.base))
+        cycles = timing.cycles
+        if opts.verbosity >= VERB_NORMAL:
+            fields = ('kind', 'addr', 'text', 'stalls', 'forward_rs', 'forward_rt')
+            addr = opts.base
+            for i, inst in enumerate(instlist.instlist):
+                out.emit(fields, ('inst', addr, inst.astext(), timing.stalls[i],
+                                  timing.forward_rs[i], timing.forward_rt[i]))
+                addr += 4
+    out.emit(('kind', 'model', 'insts', 'cycles'),
+             ('result', opts.model, len(instlist.instlist), cycles))
+    return 0
+
+def cmd_optimize(opts, out):
+    instlist, image = loadprogram(opts)
+    if instlist is None:
+        return 1
+    before = instlist.analyze_stall_forward()
+    opt = simpeephole(instlist, opts.base)
+    optlist = opt.optimize()
+    after = optlist.analyze_stall_forward()
+    if opts.object is not None:
+        if not writeimage(opts.object, simimage.frominstlist(optlist, opts.base), opts.objformat):
+            return 1
+    if opts.verbosity >= VERB_TRACE:
+        for kind, i, text in opt.log:
+            out.emit(('kind', 'rewrite', 'index', 'text'), ('rewrite', kind, i, text))
+    if opts.verbosity >= VERB_NORMAL:
+        addr = opts.base
+        for inst in optlist.instlist:
+            out.emit(ASM_FIELDS, ('inst', addr, '%08x'%(inst.encoding), inst.astext()))
+            addr += 4
+    out.emit(('kind', 'insts', 'cycles_before', 'cycles_after'),
+             ('result', len(optlist.instlist), before, after))
+    return 0
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'simarch command line simulator')
+    common = argparse.ArgumentParser(add_help = False)
+    common.add_argument('--isa', choices = ('mips', 'riscv'), default = 'mips')
+    common.add_argument('--format', choices = ('jsonl', 'csv'), default = 'jsonl')
+    common.add_argument('--base', type = parseint, default = 0,
+                        help = 'address of the first instruction')
+    common.add_argument('--output', '-o', default = '-', help = 'output file')
+    common.add_argument('--bufsize', type = int, default = 4096,
+                        help = 'records collected before write')
+    common.add_argument('-v', '--verbose', dest = 'verbosity', action = 'count',
+                        default = VERB_NORMAL, help = 'more output, per-step trace')
+    common.add_argument('-q', '--quiet', dest = 'verbosity', action = 'store_const',
+                        const = VERB_QUIET, help = 'only the final result')
+    common.add_argument('source', help = 'input file, - for stdin')
+    sub = parser.add_subparsers(dest = 'command')
+
+    p = sub.add_parser('assemble', parents = [common], help = 'encode assembly source')
+    p.add_argument('--object', default = None,
+                   help = 'write image file (.bin, .hex, .srec or .elf)')
+    p.add_argument('--objformat', choices = ('raw', 'ihex', 'srec', 'elf'), default = None,
+                   help = 'image format when not given by the file extension')
+
+    p = sub.add_parser('disassemble', parents = [common],
+                       help = 'decode hexadecimal words or program image')
+    p.add_argument('--raw', action = 'store_true', help = 'input is raw binary image')
+    p.add_argument('--endian', choices = ('big', 'little'), default = None,
+                   help = 'raw image byte order, default by ISA')
+
+    p = sub.add_parser('run', parents = [common], help = 'execute program')
+    p.add_argument('--steps', type = int, default = 1000000,
+                   help = 'maximal number of executed instructions')
+    p.add_argument('--reg', action = 'append', default = [],
+                   metavar = 'NAME=VALUE', help = 'initial register value')
+    p.add_argument('--mem', action = 'append', default = [],
+                   metavar = 'ADDR=VALUE[,VALUE...]', help = 'initial memory words')
+    p.add_argument('--dump', action = 'append', default = [],
+                   metavar = 'ADDR:COUNT', help = 'memory words dumped after run')
+    p.add_argument('--input', default = None, help = 'console input file')
+    p.add_argument('--profile', default = None,
+                   help = 'write call-graph profile as folded stacks to file')
+    p.add_argument('--profile-metric', choices = ('cycles', 'insts', 'stalls'),
+                   default = 'cycles')
+    p.add_argument('--coverage', default = None,
+                   help = 'accumulate instruction and branch coverage in file')
+
+    p = sub.add_parser('analyze', parents = [common], help = 'pipeline timing analysis')
+    p.add_argument('--model', choices = ('forward', 'nofwd', 'cfg', 'superscalar'),
+                   default = 'forward')
+    p.add_argument('--width', type = int, default = 2, help = 'superscalar issue width')
+
+    p = sub.add_parser('optimize', parents = [common],
+                       help = 'peephole optimization by the pipeline model')
+    p.add_argument('--object', default = None, help = 'write optimized image file')
+    p.add_argument('--objformat', choices = ('raw', 'ihex', 'srec', 'elf'), default = None)
+
+    opts = parser.parse_args(argv)
+
+    if opts.output == '-':
+        stream = sys.stdout
+    else:
+        stream = open(opts.output, 'w')
+    out = simrecordwriter(stream, opts.format, opts.bufsize)
+    commands = {
+        'assemble': cmd_assemble,
+        'disassemble': cmd_disassemble,
+        'run': cmd_run,
+        'analyze': cmd_analyze,
+        'optimize': cmd_optimize,
+    }
+    try:
+        res = commands[opts.command](opts, out)
+    finally:
+        out.flush()
+        if stream is not sys.stdout:
+            stream.close()
+    return res
+
+if __name__ == '__main__':
+    sys.exit(main())
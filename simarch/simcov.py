@@ -0,0 +1,298 @@
+#!/usr/bin/python2
+
+"""
+Instruction and branch coverage of simarch program runs
+
+Coverage of an address range is kept in two bitmaps held in
+bytearrays, one bit per instruction word for executed instructions
+and two bits per word (taken and not taken) for conditional branches.
+The bitmaps of runs of the same program are merged by bitwise OR,
+so results of runs in different processes can be combined, and they
+are stored to disk in a simple binary format.
+
+Collection replaces the instruction memory entries by trampolines
+in the same way as breakpoints and the profiler. The entry of an
+instruction is restored after its first execution and the entry
+of a branch after both directions are seen, so the run slows down
+only until the coverage saturates.
+"""
+
+import sys
+import struct
+import operator
+import collections
+from itertools import imap
+
+from simarch import instopdes, instop_b, instop_rv_b
+
+__author__ = "Pavel Pisa"
+__copyright__ = "Copyright 2017-2019, Czech Technical University"
+__license__ = "GPLv2+"
+
+COV_MAGIC = 'SIMCOV1\n'
+COV_HEADER = struct.Struct('>II')
+
+# number of set bits of each byte value
+bitcount = [bin(i).count('1') for i in range(0, 256)]
+
+covstats = collections.namedtuple('covstats', ['insts', 'executed',
+               'branches', 'taken', 'nottaken', 'both'])
+
+def orbytes(a, b):
+    return bytearray(imap(operator.or_, a, b))
+
+def isbranch(op):
+    """
+    Conditional branch operation, breakpoints and other trampolines
+    are looked through
+    """
+    while op.fnc not in (instop_b, instop_rv_b):
+        if not isinstance(op.operator, instopdes):
+            return False
+        op = op.operator
+    return op.operator is not None
+
+class simcoverage(object):
+    """
+    Coverage bitmaps of words addresses base to base + 4 * words - 1,
+    bit 2 * i of branches is set when the branch at word i has been
+    taken and bit 2 * i + 1 when it has not been taken
+    """
+    def __init__(self, base = 0, words = 0):
+        self.base = base
+        self.words = words
+        self.insts = bytearray((words + 7) >> 3)
+        self.branches = bytearray((2 * words + 7) >> 3)
+
+    @staticmethod
+    def frominstmem(instmem):
+        """
+        Empty coverage of range spanning the instruction memory
+        """
+        if not instmem:
+            return simcoverage()
+        base = min(instmem)
+        return simcoverage(base, ((max(instmem) - base) >> 2) + 1)
+
+    def index(self, pc):
+        i = (pc - self.base) >> 2
+        if (pc & 3) or (i < 0) or (i >= self.words):
+            return None
+        return i
+
+    def mark(self, pc):
+        i = self.index(pc)
+        if i is not None:
+            self.insts[i >> 3] |= 1 << (i & 7)
+
+    def markbranch(self, pc, taken):
+        i = self.index(pc)
+        if i is None:
+            return
+        b = 2 * i
+        if not taken:
+            b += 1
+        self.branches[b >> 3] |= 1 << (b & 7)
+
+    def executed(self, pc):
+        i = self.index(pc)
+        if i is None:
+            return False
+        return bool(self.insts[i >> 3] & (1 << (i & 7)))
+
+    def branch(self, pc):
+        """
+        Pair (taken, not taken) of branch at pc
+        """
+        i = self.index(pc)
+        if i is None:
+            return (False, False)
+        b = self.branches[i >> 2] >> (2 * (i & 3))
+        return (bool(b & 1), bool(b & 2))
+
+    def compatible(self, other):
+        return (self.base == other.base) and (self.words == other.words)
+
+    def merge(self, other):
+        """
+        Add coverage of other run of the same address range,
+        returns False when the ranges differ
+        """
+        if not self.compatible(other):
+            sys.stderr.write('coverage of 0x%08x/%d words cannot be merged with 0x%08x/%d words\n'%
+                             (other.base, other.words, self.base, self.words))
+            return False
+        self.insts = orbytes(self.insts, other.insts)
+        self.branches = orbytes(self.branches, other.branches)
+        return True
+
+    def stats(self, instmem):
+        """
+        Counts of instructions and conditional branches of
+        instruction memory and of their covered parts
+        """
+        insts = executed = branches = taken = nottaken = both = 0
+        for pc, (inst, op) in instmem.items():
+            if self.index(pc) is None:
+                continue
+            insts += 1
+            if self.executed(pc):
+                executed += 1
+            if isbranch(op):
+                branches += 1
+                t, n = self.branch(pc)
+                taken += t
+                nottaken += n
+                both += t and n
+        return covstats(insts, executed, branches, taken, nottaken, both)
+
+    def count(self):
+        """
+        Number of executed instructions and covered branch directions
+        """
+        return (sum([bitcount[b] for b in self.insts]),
+                sum([bitcount[b] for b in self.branches]))
+
+    def uncovered(self, instmem):
+        """
+        Sorted addresses of instructions which have not been executed
+        """
+        return sorted([pc for pc in instmem if (self.index(pc) is not None) and
+                       not self.executed(pc)])
+
+    def partial(self, instmem):
+        """
+        Sorted (address, taken, not taken) of conditional branches
+        with a direction which has not been seen
+        """
+        res = []
+        for pc in sorted(instmem):
+            if (self.index(pc) is None) or not isbranch(instmem[pc][1]):
+                continue
+            t, n = self.branch(pc)
+            if not (t and n):
+                res.append((pc, t, n))
+        return res
+
+    def tostring(self):
+        return COV_MAGIC + COV_HEADER.pack(self.base, self.words) + \
+               str(self.insts) + str(self.branches)
+
+    @staticmethod
+    def fromstring(data):
+        hdr = len(COV_MAGIC) + COV_HEADER.size
+        if data[0:len(COV_MAGIC)] != COV_MAGIC or len(data) < hdr:
+            sys.stderr.write('data are not coverage bitmaps\n')
+            return None
+        base, words = COV_HEADER.unpack(data[len(COV_MAGIC):hdr])
+        cov = simcoverage(base, words)
+        ilen = len(cov.insts)
+        if len(data) != hdr + ilen + len(cov.branches):
+            sys.stderr.write('coverage bitmaps size does not match %d words\n'%(words))
+            return None
+        cov.insts = bytearray(data[hdr:hdr + ilen])
+        cov.branches = bytearray(data[hdr + ilen:])
+        return cov
+
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(self.tostring())
+
+    @staticmethod
+    def load(filename):
+        with open(filename, 'rb') as f:
+            return simcoverage.fromstring(f.read())
+
+def instop_covinst(cpustate, inst, op):
+    op.info.hit(cpustate.pc, op)
+    return op.operator.fnc(cpustate, inst, op.operator)
+def instop_covbranch(cpustate, inst, op):
+    res = op.operator.fnc(cpustate, inst, op.operator)
+    if not res:
+        op.info.branch(cpustate.pc, cpustate.b_pend_pc is not None, op)
+    return res
+def instop_covtaken(cpustate, inst, op):
+    res = op.operator.fnc(cpustate, inst, op.operator)
+    if (not res) and (cpustate.b_pend_pc is not None):
+        op.info.branch(cpustate.pc, True, op)
+    return res
+def instop_covnottaken(cpustate, inst, op):
+    res = op.operator.fnc(cpustate, inst, op.operator)
+    if (not res) and (cpustate.b_pend_pc is None):
+        op.info.branch(cpustate.pc, False, op)
+    return res
+
+class simcovcollector(object):
+    """
+    Coverage collection over instruction memory, which can be shared
+    by more cores. Instructions loaded after attach() are not hooked.
+    """
+    def __init__(self, instmem, coverage = None):
+        self.instmem = instmem
+        if coverage is None:
+            coverage = simcoverage.frominstmem(instmem)
+        self.coverage = coverage
+        self.hooked = set()
+
+    def attach(self):
+        cov = self.coverage
+        instmem = self.instmem
+        for pc, (inst, op) in instmem.items():
+            if cov.index(pc) is None:
+                continue
+            if isbranch(op):
+                fnc = self.branchfnc(pc)
+                if fnc is None:
+                    continue
+            elif cov.executed(pc):
+                continue
+            else:
+                fnc = instop_covinst
+            instmem[pc] = (inst, instopdes(fnc, op, self, op.size))
+            self.hooked.add(pc)
+
+    def branchfnc(self, pc):
+        """
+        Trampoline waiting for the directions of branch at pc
+        which have not been seen yet
+        """
+        taken, nottaken = self.coverage.branch(pc)
+        if taken and nottaken:
+            return None
+        if taken:
+            return instop_covnottaken
+        if nottaken:
+            return instop_covtaken
+        return instop_covbranch
+
+    def release(self, pc, op):
+        entry = self.instmem.get(pc)
+        # entry wrapped later by breakpoint stays hooked
+        if (entry is not None) and (entry[1] is op):
+            self.instmem[pc] = (entry[0], op.operator)
+            self.hooked.discard(pc)
+
+    def hit(self, pc, op):
+        self.coverage.mark(pc)
+        self.release(pc, op)
+
+    def branch(self, pc, taken, op):
+        cov = self.coverage
+        cov.mark(pc)
+        cov.markbranch(pc, taken)
+        fnc = self.branchfnc(pc)
+        entry = self.instmem.get(pc)
+        if (fnc is None) or (entry is None) or (entry[1] is not op):
+            self.release(pc, op)
+        else:
+            # only the missing direction is checked from now
+            self.instmem[pc] = (entry[0], instopdes(fnc, op.operator, self, op.size))
+
+    def detach(self):
+        instmem = self.instmem
+        for pc in self.hooked:
+            inst, op = instmem[pc]
+            if op.info is self:
+                instmem[pc] = (inst, op.operator)
+        self.hooked = set()
+        return self.coverage
@@ -0,0 +1,325 @@
+#!/usr/bin/python2
+
+"""
+Register dataflow analysis over instruction lists and their CFG
+
+Live registers and reaching definitions are solved by a worklist
+over the basic blocks of siminstlist.buildcfg() with bitsets held
+in Python integers. Register sets use the rdmask/wrmask layout of
+siminst (general purpose registers in bits 0-31, HI/LO in bits
+REG_HI and REG_LO). Definition sets have one bit per defining
+instruction and one pseudo definition per register standing for
+the value present at program entry. The edge from a linking branch
+to its return point carries definitions of the registers the callee
+may set (results, arguments, temporaries, HI/LO and ra), so values
+returned by functions are not taken for the entry ones. Block
+results are expanded to per-instruction sets, which give dead
+writes, reads of possibly uninitialized registers and register
+pressure.
+"""
+
+from simarch import simcpustate, simcpustate_rv, REG_HI, REG_LO, CBD, UBD
+
+__author__ = "Pavel Pisa"
+__copyright__ = "Copyright 2017-2019, Czech Technical University"
+__license__ = "GPLv2+"
+
+NREGS = REG_LO + 1
+
+def regset(regs):
+    mask = 0
+    for r in regs:
+        mask |= 1 << r
+    return mask
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+# Registers expected to hold values on return by the calling convention
+# (results, callee saved, gp, sp, fp, ra) and defined on entry
+EXITLIVE = regset([2, 3] + range(16, 24) + [28, 29, 30, 31])
+EXITLIVE_RV = regset([1, 2, 3, 4, 8, 9, 10, 11] + range(18, 28))
+ENTRYDEFINED = regset([0, 28, 29, 31])
+ENTRYDEFINED_RV = regset([0, 1, 2, 3, 4])
+# Registers which may be set by the called function (caller saved)
+CALLDEFINED = regset(range(1, 16) + [24, 25, 31, REG_HI, REG_LO])
+CALLDEFINED_RV = regset([1, 5, 6, 7] + range(10, 18) + range(28, 32))
+
+class simdataflow(object):
+    """
+    Liveness and reaching definitions of instruction list, base is
+    the address of the first instruction. exitlive is register mask
+    live at the blocks without successors, entrydefined registers
+    are not reported as uninitialized.
+    """
+    def __init__(self, instlist, base = 0, exitlive = None, entrydefined = None):
+        self.instlist = instlist
+        if instlist.isa == 'rv':
+            cpuclass = simcpustate_rv
+            syscalls = ('ecall',)
+            if exitlive is None:
+                exitlive = EXITLIVE_RV
+            if entrydefined is None:
+                entrydefined = ENTRYDEFINED_RV
+            calldefined = CALLDEFINED_RV
+            retoffs = 1
+        else:
+            cpuclass = simcpustate
+            syscalls = ('syscall',)
+            if exitlive is None:
+                exitlive = EXITLIVE
+            if entrydefined is None:
+                entrydefined = ENTRYDEFINED
+            calldefined = CALLDEFINED
+            retoffs = 2
+        self.exitlive = exitlive
+        self.entrydefined = entrydefined
+        self.calldefined = calldefined & ~1
+        sysargs = regset(cpuclass.sysreg_args)
+        sysrd = (1 << cpuclass.sysreg_nr) | sysargs
+        syswr = 1 << cpuclass.sysreg_ret
+        # register zero is never a dependency, arguments of syscall
+        # are kept live but not required to be set
+        self.rd = []
+        self.wr = []
+        self.rdinit = []
+        self.calls = []
+        for i, inst in enumerate(instlist.instlist):
+            rd = inst.rdmask
+            wr = inst.wrmask
+            if inst.operation in syscalls:
+                rd |= sysrd
+                wr |= syswr
+                self.rdinit.append(rd & ~sysargs & ~1)
+            else:
+                self.rdinit.append(rd & ~1)
+            self.rd.append(rd & ~1)
+            self.wr.append(wr & ~1)
+            if (inst.pinfo & (CBD | UBD)) and (inst.wrmask & ~inst.rdmask & ~1):
+                self.calls.append((i, i + retoffs))
+        self.blocks = instlist.buildcfg(base)
+        self.livein = None
+        self.liveout = None
+        self.reachin = None
+
+    def liveness(self):
+        """
+        Backward live register analysis, fills per-instruction
+        livein and liveout register masks
+        """
+        rd = self.rd
+        wr = self.wr
+        blocks = self.blocks
+        use = {}
+        kill = {}
+        for b in blocks:
+            u = 0
+            k = 0
+            for i in range(b.end - 1, b.start - 1, -1):
+                u = (u & ~wr[i]) | rd[i]
+                k |= wr[i]
+            use[b] = u
+            kill[b] = k
+        livein = dict([(b, 0) for b in blocks])
+        work = list(blocks)
+        inwork = set(blocks)
+        while work:
+            b = work.pop()
+            inwork.discard(b)
+            if b.succs:
+                out = 0
+                for sb in b.succs:
+                    out |= livein[sb]
+            else:
+                out = self.exitlive
+            new = use[b] | (out & ~kill[b])
+            if new != livein[b]:
+                livein[b] = new
+                for pb in b.preds:
+                    if pb not in inwork:
+                        work.append(pb)
+                        inwork.add(pb)
+        n = len(rd)
+        self.livein = [0] * n
+        self.liveout = [0] * n
+        for b in blocks:
+            if b.succs:
+                live = 0
+                for sb in b.succs:
+                    live |= livein[sb]
+            else:
+                live = self.exitlive
+            for i in range(b.end - 1, b.start - 1, -1):
+                self.liveout[i] = live
+                live = (live & ~wr[i]) | rd[i]
+                self.livein[i] = live
+        return self.livein
+
+    def reaching(self):
+        """
+        Forward reaching definitions, definition NREGS + i is made
+        by instruction i, definitions 0 to NREGS - 1 are the entry
+        values of the registers and NREGS + n + k * NREGS + r is the
+        register r set by the function called by k-th linking branch.
+        Fills per-instruction reachin sets.
+        """
+        wr = self.wr
+        blocks = self.blocks
+        n = len(wr)
+        regdefs = [1 << r for r in range(0, NREGS)]
+        for i in range(0, n):
+            m = wr[i]
+            r = 0
+            while m:
+                if m & 1:
+                    regdefs[r] |= 1 << (NREGS + i)
+                m >>= 1
+                r += 1
+        callgen = []
+        for k in range(0, len(self.calls)):
+            g = 0
+            for r in range(0, NREGS):
+                if self.calldefined & (1 << r):
+                    d = 1 << (NREGS + n + k * NREGS + r)
+                    regdefs[r] |= d
+                    g |= d
+            callgen.append(g)
+        callkill = 0
+        for r in range(0, NREGS):
+            if self.calldefined & (1 << r):
+                callkill |= regdefs[r]
+        self.regdefs = regdefs
+        killmask = [0] * n
+        for i in range(0, n):
+            m = wr[i]
+            k = 0
+            r = 0
+            while m:
+                if m & 1:
+                    k |= regdefs[r]
+                m >>= 1
+                r += 1
+            killmask[i] = k
+        gen = {}
+        kill = {}
+        for b in blocks:
+            g = 0
+            k = 0
+            for i in range(b.start, b.end):
+                if wr[i]:
+                    g = (g & ~killmask[i]) | (1 << (NREGS + i))
+                    k |= killmask[i]
+            gen[b] = g
+            kill[b] = k
+        # (caller block, return point block) -> definitions by callee
+        retgen = {}
+        blockat = dict([(b.start, b) for b in blocks])
+        for k, (i, ret) in enumerate(self.calls):
+            rb = blockat.get(ret)
+            if rb is None:
+                continue
+            for pb in rb.preds:
+                if pb.start <= i < pb.end:
+                    retgen[(pb, rb)] = callgen[k]
+        entry = (1 << NREGS) - 1
+        outs = dict([(b, 0) for b in blocks])
+        ins = {}
+        work = list(reversed(blocks))
+        inwork = set(blocks)
+        while work:
+            b = work.pop()
+            inwork.discard(b)
+            if (b is blocks[0]) or not b.preds:
+                inset = entry
+            else:
+                inset = 0
+            for pb in b.preds:
+                g = retgen.get((pb, b))
+                if g is None:
+                    inset |= outs[pb]
+                else:
+                    inset |= (outs[pb] & ~callkill) | g
+            ins[b] = inset
+            new = gen[b] | (inset & ~kill[b])
+            if new != outs[b]:
+                outs[b] = new
+                for sb in b.succs:
+                    if sb not in inwork:
+                        work.append(sb)
+                        inwork.add(sb)
+        self.reachin = [0] * n
+        for b in blocks:
+            reach = ins.get(b, 0)
+            for i in range(b.start, b.end):
+                self.reachin[i] = reach
+                if wr[i]:
+                    reach = (reach & ~killmask[i]) | (1 << (NREGS + i))
+        return self.reachin
+
+    def solve(self):
+        self.liveness()
+        self.reaching()
+
+    def deadwrites(self):
+        """
+        List of (instruction index, register mask) of written
+        registers which are not live after the instruction
+        """
+        if self.liveout is None:
+            self.liveness()
+        res = []
+        for i in range(0, len(self.wr)):
+            dead = self.wr[i] & ~self.liveout[i]
+            if dead:
+                res.append((i, dead))
+        return res
+
+    def defsreaching(self, i, reg):
+        """
+        Indexes of instructions whose definition of reg reaches
+        instruction i, -1 stands for the entry value, the value
+        set by called function is reported at its linking branch
+        """
+        if self.reachin is None:
+            self.reaching()
+        m = self.reachin[i] & self.regdefs[reg]
+        res = []
+        if m & (1 << reg):
+            res.append(-1)
+        m >>= NREGS
+        n = len(self.wr)
+        j = 0
+        while m:
+            if m & 1:
+                if j < n:
+                    res.append(j)
+                else:
+                    res.append(self.calls[(j - n) // NREGS][0])
+            m >>= 1
+            j += 1
+        return sorted(set(res))
+
+    def uninitreads(self):
+        """
+        List of (instruction index, register mask) of registers read
+        when the entry value can reach the instruction, unset syscall
+        arguments are not reported
+        """
+        if self.reachin is None:
+            self.reaching()
+        res = []
+        # entry definitions have the bit positions of their registers
+        entry = (1 << NREGS) - 1
+        for i in range(0, len(self.rd)):
+            m = self.rdinit[i] & self.reachin[i] & entry & ~self.entrydefined
+            if m:
+                res.append((i, m))
+        return res
+
+    def pressure(self):
+        """
+        Number of live registers before each instruction
+        """
+        if self.livein is None:
+            self.liveness()
+        return [popcount(m) for m in self.livein]
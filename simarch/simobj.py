@@ -0,0 +1,496 @@
+#!/usr/bin/python2
+
+"""
+Program image writers and readers for the simarch simulator
+
+Assembled instruction list is packed to memory image which can be
+written as raw binary, Intel HEX, Motorola SREC or minimal ELF32
+executable with symbols from the assembler labels. The images are
+loaded back by decoding the words of the executable segments (data
+segments are only copied to memory), the assembly source does not
+need to be parsed again. Raw binary holds the executable segments
+only, Intel HEX and SREC segments other than the one with the entry
+point are read as data.
+"""
+
+import sys
+import struct
+import array
+
+from simarch import siminst, siminstlist, WORDTYPE
+
+__author__ = "Pavel Pisa"
+__copyright__ = "Copyright 2017-2019, Czech Technical University"
+__license__ = "GPLv2+"
+
+EM_MIPS = 8
+EM_RISCV = 243
+
+ET_EXEC = 2
+PT_LOAD = 1
+PF_X = 1
+PF_W = 2
+PF_R = 4
+SHT_PROGBITS = 1
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHF_WRITE = 1
+SHF_ALLOC = 2
+SHF_EXECINSTR = 4
+STB_GLOBAL = 1
+STT_NOTYPE = 0
+
+RECORD_BYTES = 16
+
+def packwords(words, bigendian = True):
+    """
+    Pack sequence of 32-bit words to bytes in the given byte order
+    """
+    a = array.array(WORDTYPE, words)
+    if bigendian != (sys.byteorder == 'big'):
+        a.byteswap()
+    return a.tostring()
+
+def unpackwords(data, bigendian = True):
+    a = array.array(WORDTYPE)
+    a.fromstring(data[0 : len(data) & ~3])
+    if bigendian != (sys.byteorder == 'big'):
+        a.byteswap()
+    return a
+
+def mergesegs(segments):
+    """
+    Sort (address, bytes) segments and join the adjacent ones
+    """
+    segs = []
+    for addr, data in sorted(segments):
+        if segs and (segs[-1][0] + len(segs[-1][1]) == addr):
+            segs[-1] = (segs[-1][0], segs[-1][1] + data)
+        else:
+            segs.append((addr, data))
+    return segs
+
+class simimage(object):
+    """
+    Memory image, list of (address, bytes) executable segments and
+    list of data segments, entry point and symbols dictionary
+    name -> address. Formats without segment flags take the segment
+    containing the entry point as executable one.
+    """
+    def __init__(self, segments = None, entry = 0, symbols = None,
+                 bigendian = True, isa = 'mips', datasegs = None):
+        if segments is None:
+            segments = []
+        if symbols is None:
+            symbols = {}
+        if datasegs is None:
+            datasegs = []
+        self.segments = segments
+        self.datasegs = datasegs
+        self.entry = entry
+        self.symbols = symbols
+        self.bigendian = bigendian
+        self.isa = isa
+
+    @staticmethod
+    def frominstlist(instlist, base = 0, bigendian = None):
+        if instlist.isa == 'rv':
+            isa = 'riscv'
+        else:
+            isa = 'mips'
+        if bigendian is None:
+            bigendian = isa == 'mips'
+        data = packwords([inst.encoding for inst in instlist.instlist], bigendian)
+        symbols = dict(instlist.datalabels)
+        for label, idx in instlist.labels.items():
+            symbols[label] = base + 4 * idx
+        datasegs = []
+        for addr, sdata in instlist.sections:
+            if len(sdata) != 0:
+                datasegs.append((addr, bytes(sdata)))
+        return simimage([(base, data)], base, symbols, bigendian, isa, datasegs)
+
+    def merge(self):
+        """
+        Sort executable and data segments and join the adjacent ones
+        of the same kind, returns the executable segments
+        """
+        self.segments = mergesegs(self.segments)
+        self.datasegs = mergesegs(self.datasegs)
+        return self.segments
+
+    def splitdata(self):
+        """
+        Move segments which do not contain the entry point to the data
+        segments, used for formats without segment flags
+        """
+        self.merge()
+        self.datasegs = mergesegs(self.datasegs + [(addr, data) for addr, data in self.segments
+                                                   if not addr <= self.entry < addr + len(data)])
+        self.segments = [(addr, data) for addr, data in self.segments
+                         if addr <= self.entry < addr + len(data)]
+        return self.segments
+
+    def memory(self):
+        """
+        All segments merged regardless of their kind
+        """
+        return mergesegs(self.segments + self.datasegs)
+
+    def decode(self):
+        """
+        Decode segments to list of (address, instruction) pairs,
+        words which are not valid instructions are skipped
+        """
+        if self.isa == 'riscv':
+            decode = siminst.decode_rv
+        else:
+            decode = siminst.decode
+        insts = []
+        for addr, data in self.segments:
+            skip = -addr & 3
+            words = unpackwords(data[skip:], self.bigendian)
+            addr += skip
+            for w in words:
+                inst = decode(w)
+                if inst is not None:
+                    insts.append((addr, inst))
+                addr += 4
+        return insts
+
+    def instlist(self):
+        """
+        Instruction list of the segment containing the entry point
+        for the timing analysis
+        """
+        il = siminstlist()
+        if self.isa == 'riscv':
+            il.isa = 'rv'
+        for addr, data in self.segments:
+            if addr <= self.entry < addr + len(data):
+                break
+        else:
+            return il
+        il.base = addr
+        seg = simimage([(addr, data)], self.entry, None, self.bigendian, self.isa)
+        for a, inst in seg.decode():
+            il.instlist.append(inst)
+        for name, val in self.symbols.items():
+            if (val - addr) % 4 == 0 and addr <= val <= addr + len(data):
+                il.labels[name] = (val - addr) >> 2
+            elif [1 for daddr, ddata in self.datasegs if daddr <= val <= daddr + len(ddata)]:
+                il.datalabels[name] = val
+        il.sections = [[daddr, bytearray(ddata)] for daddr, ddata in self.datasegs]
+        return il
+
+    def load(self, cpustate):
+        """
+        Load image to the CPU memory and install decoded instructions
+        """
+        instopdeslist = cpustate.instopdeslist
+        for addr, data in self.segments + self.datasegs:
+            cpustate.loadsection(addr, data)
+        # only the executable segments are decoded
+        for addr, inst in self.decode():
+            cpustate.instmem[addr] = (inst, instopdeslist[inst.operation])
+            if addr in cpustate.breakpoints:
+                cpustate.installbreakpoint(addr)
+        cpustate.pc = self.entry
+        cpustate.b_pend_pc = None
+        return self.entry
+
+def write_raw(f, image):
+    """
+    Write executable segments as raw binary, gaps between them are zero
+    filled, data segments are not written
+    """
+    segs = image.merge()
+    if image.datasegs:
+        sys.stderr.write('raw binary holds executable segments only, data segments are not written\n')
+    if not segs:
+        return
+    pos = segs[0][0]
+    for addr, data in segs:
+        f.write('\0' * (addr - pos))
+        f.write(data)
+        pos = addr + len(data)
+
+def read_raw(f, base = 0, bigendian = True, isa = 'mips'):
+    return simimage([(base, f.read())], base, None, bigendian, isa)
+
+def ihexrecord(rtype, addr, data):
+    rec = bytearray([len(data), (addr >> 8) & 0xff, addr & 0xff, rtype]) + bytearray(data)
+    return ':%s%02X\n'%(str(rec).encode('hex').upper(), -sum(rec) & 0xff)
+
+def write_ihex(f, image):
+    lines = []
+    upper = None
+    for addr, data in image.memory():
+        i = 0
+        while i < len(data):
+            a = addr + i
+            n = min(RECORD_BYTES, 0x10000 - (a & 0xffff))
+            if a >> 16 != upper:
+                upper = a >> 16
+                lines.append(ihexrecord(4, 0, struct.pack('>H', upper)))
+            lines.append(ihexrecord(0, a & 0xffff, data[i : i + n]))
+            i += n
+    lines.append(ihexrecord(5, 0, struct.pack('>I', image.entry)))
+    lines.append(ihexrecord(1, 0, ''))
+    f.write(''.join(lines))
+
+def read_ihex(f, bigendian = True, isa = 'mips'):
+    image = simimage(None, 0, None, bigendian, isa)
+    offset = 0
+    for lineno, line in enumerate(f, 1):
+        line = line.strip()
+        if len(line) == 0:
+            continue
+        if line[0] != ':':
+            sys.stderr.write('Intel HEX line %d does not start by colon\n'%(lineno))
+            return None
+        rec = bytearray(line[1:].decode('hex'))
+        if (len(rec) < 5) or (len(rec) != rec[0] + 5) or (sum(rec) & 0xff):
+            sys.stderr.write('Intel HEX line %d is corrupted\n'%(lineno))
+            return None
+        rtype = rec[3]
+        data = str(rec[4:-1])
+        if rtype == 0:
+            image.segments.append((offset + (rec[1] << 8) + rec[2], data))
+        elif rtype == 1:
+            break
+        elif rtype == 2:
+            offset = struct.unpack('>H', data)[0] << 4
+        elif rtype == 4:
+            offset = struct.unpack('>H', data)[0] << 16
+        elif rtype == 5:
+            image.entry = struct.unpack('>I', data)[0]
+    image.splitdata()
+    return image
+
+def srecord(rtype, addr, data, addrlen = 4):
+    rec = bytearray([addrlen + len(data) + 1]) + bytearray(struct.pack('>I', addr)[4 - addrlen:])
+    rec += bytearray(data)
+    return 'S%d%s%02X\n'%(rtype, str(rec).encode('hex').upper(), ~sum(rec) & 0xff)
+
+def write_srec(f, image):
+    lines = [srecord(0, 0, 'simarch', 2)]
+    count = 0
+    for addr, data in image.memory():
+        for i in range(0, len(data), RECORD_BYTES):
+            lines.append(srecord(3, addr + i, data[i : i + RECORD_BYTES]))
+            count += 1
+    if count < 0x10000:
+        lines.append(srecord(5, count, '', 2))
+    lines.append(srecord(7, image.entry, ''))
+    f.write(''.join(lines))
+
+def read_srec(f, bigendian = True, isa = 'mips'):
+    image = simimage(None, 0, None, bigendian, isa)
+    for lineno, line in enumerate(f, 1):
+        line = line.strip()
+        if len(line) == 0:
+            continue
+        if (line[0] != 'S') or not line[1].isdigit():
+            sys.stderr.write('SREC line %d is not S-record\n'%(lineno))
+            return None
+        rtype = int(line[1])
+        rec = bytearray(line[2:].decode('hex'))
+        if (len(rec) < 3) or (len(rec) != rec[0] + 1) or ((sum(rec) & 0xff) != 0xff):
+            sys.stderr.write('SREC line %d is corrupted\n'%(lineno))
+            return None
+        addrlen = {1: 2, 2: 3, 3: 4, 7: 4, 8: 3, 9: 2}.get(rtype)
+        if addrlen is None:
+            continue
+        addr = 0
+        for c in rec[1 : 1 + addrlen]:
+            addr = (addr << 8) | c
+        if rtype <= 3:
+            image.segments.append((addr, str(rec[1 + addrlen : -1])))
+        else:
+            image.entry = addr
+    image.splitdata()
+    return image
+
+def write_elf(f, image):
+    """
+    Write ELF32 executable with loadable segment and .text or .data
+    section per image segment and symbol table with the image symbols
+    """
+    if image.bigendian:
+        e = '>'
+    else:
+        e = '<'
+    if image.isa == 'riscv':
+        machine = EM_RISCV
+    else:
+        machine = EM_MIPS
+    image.merge()
+    # (address, data, segment flags, section name, section flags)
+    segs = [(addr, data, PF_R | PF_X, 1, SHF_ALLOC | SHF_EXECINSTR)
+            for addr, data in image.segments]
+    segs += [(addr, data, PF_R | PF_W, 7, SHF_ALLOC | SHF_WRITE)
+             for addr, data in image.datasegs]
+    phoff = 52
+    off = phoff + 32 * len(segs)
+    phdrs = []
+    texts = []
+    for addr, data, pflags, shname, sflags in segs:
+        off = (off + 3) & ~3
+        texts.append((off, data))
+        phdrs.append(struct.pack(e + 'IIIIIIII', PT_LOAD, off, addr, addr,
+                                 len(data), len(data), pflags, 4))
+        off += len(data)
+
+    shstrtab = '\0.text\0.data\0.symtab\0.strtab\0.shstrtab\0'
+    strtab = '\0'
+    syms = [struct.pack(e + 'IIIBBH', 0, 0, 0, 0, 0, 0)]
+    for name, val in sorted(image.symbols.items(), key = lambda s: (s[1], s[0])):
+        shndx = 0xfff1
+        for i, seg in enumerate(segs):
+            addr, data = seg[0:2]
+            if addr <= val <= addr + len(data):
+                shndx = 1 + i
+                break
+        syms.append(struct.pack(e + 'IIIBBH', len(strtab), val, 0,
+                                (STB_GLOBAL << 4) | STT_NOTYPE, 0, shndx))
+        strtab += name + '\0'
+    symtab = ''.join(syms)
+
+    off = (off + 3) & ~3
+    symoff = off
+    stroff = symoff + len(symtab)
+    shstroff = stroff + len(strtab)
+    shoff = (shstroff + len(shstrtab) + 3) & ~3
+    nsec = len(segs) + 4
+
+    shdrs = [struct.pack(e + 'IIIIIIIIII', 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)]
+    for (addr, data, pflags, shname, sflags), (toff, d) in zip(segs, texts):
+        shdrs.append(struct.pack(e + 'IIIIIIIIII', shname, SHT_PROGBITS,
+                                 sflags, addr, toff, len(data), 0, 0, 4, 0))
+    strndx = len(segs) + 2
+    shdrs.append(struct.pack(e + 'IIIIIIIIII', 13, SHT_SYMTAB, 0, 0, symoff,
+                             len(symtab), strndx, 1, 4, 16))
+    shdrs.append(struct.pack(e + 'IIIIIIIIII', 21, SHT_STRTAB, 0, 0, stroff,
+                             len(strtab), 0, 0, 1, 0))
+    shdrs.append(struct.pack(e + 'IIIIIIIIII', 29, SHT_STRTAB, 0, 0, shstroff,
+                             len(shstrtab), 0, 0, 1, 0))
+
+    ident = '\x7fELF' + chr(1) + chr(2 if image.bigendian else 1) + chr(1)
+    ident = ident.ljust(16, '\0')
+    ehdr = ident + struct.pack(e + 'HHIIIIIHHHHHH', ET_EXEC, machine, 1, image.entry,
+                               phoff, shoff, 0, 52, 32, len(segs), 40, nsec, nsec - 1)
+    out = bytearray(shoff + 40 * nsec)
+    out[0:52] = ehdr
+    out[phoff : phoff + 32 * len(segs)] = ''.join(phdrs)
+    for toff, data in texts:
+        out[toff : toff + len(data)] = data
+    out[symoff : symoff + len(symtab)] = symtab
+    out[stroff : stroff + len(strtab)] = strtab
+    out[shstroff : shstroff + len(shstrtab)] = shstrtab
+    out[shoff:] = ''.join(shdrs)
+    f.write(str(out))
+
+def read_elf(f):
+    data = f.read()
+    if (len(data) < 52) or (data[0:4] != '\x7fELF') or (data[4] != chr(1)):
+        sys.stderr.write('file is not ELF32 image\n')
+        return None
+    bigendian = data[5] == chr(2)
+    if bigendian:
+        e = '>'
+    else:
+        e = '<'
+    (etype, machine, version, entry, phoff, shoff, flags, ehsize, phentsize,
+     phnum, shentsize, shnum, shstrndx) = struct.unpack(e + 'HHIIIIIHHHHHH', data[16:52])
+    if machine == EM_RISCV:
+        isa = 'riscv'
+    elif machine == EM_MIPS:
+        isa = 'mips'
+    else:
+        sys.stderr.write('unsupported ELF machine %d\n'%(machine))
+        return None
+    image = simimage(None, entry, None, bigendian, isa)
+    for i in range(0, phnum):
+        p = phoff + i * phentsize
+        ptype, poff, vaddr, paddr, filesz, memsz, pflags = struct.unpack(e + 'IIIIIII', data[p : p + 28])
+        if (ptype != PT_LOAD) or (filesz == 0):
+            continue
+        if pflags & PF_X:
+            image.segments.append((vaddr, data[poff : poff + filesz]))
+        else:
+            image.datasegs.append((vaddr, data[poff : poff + filesz]))
+    for i in range(0, shnum):
+        s = shoff + i * shentsize
+        stype, = struct.unpack(e + 'I', data[s + 4 : s + 8])
+        if stype != SHT_SYMTAB:
+            continue
+        soff, ssize, link, info, align, entsize = struct.unpack(e + 'IIIIII', data[s + 16 : s + 40])
+        l = shoff + link * shentsize
+        stroff, = struct.unpack(e + 'I', data[l + 16 : l + 20])
+        for j in range(soff + entsize, soff + ssize, entsize):
+            name, value, size, info, other, shndx = struct.unpack(e + 'IIIBBH', data[j : j + 16])
+            if name == 0:
+                continue
+            n = stroff + name
+            image.symbols[data[n : data.index('\0', n)]] = value
+    image.merge()
+    return image
+
+imagewriters = {
+    'raw': write_raw,
+    'ihex': write_ihex,
+    'srec': write_srec,
+    'elf': write_elf,
+}
+
+imageformatbyext = {
+    '.bin': 'raw',
+    '.hex': 'ihex',
+    '.ihex': 'ihex',
+    '.srec': 'srec',
+    '.s19': 'srec',
+    '.s28': 'srec',
+    '.s37': 'srec',
+    '.elf': 'elf',
+}
+
+def imageformat(fname):
+    p = fname.rfind('.')
+    if p < 0:
+        return None
+    return imageformatbyext.get(fname[p:].lower())
+
+def writeimage(fname, image, fmt = None):
+    if fmt is None:
+        fmt = imageformat(fname)
+    if fmt not in imagewriters:
+        sys.stderr.write('unknown image format for "%s"\n'%(fname))
+        return False
+    with open(fname, 'wb') as f:
+        imagewriters[fmt](f, image)
+    return True
+
+def readimage(fname, fmt = None, base = 0, bigendian = None, isa = 'mips'):
+    """
+    Read image file, the byte order is given by ELF header, for other
+    formats it follows the ISA when not specified
+    """
+    if fmt is None:
+        fmt = imageformat(fname)
+    if bigendian is None:
+        bigendian = isa == 'mips'
+    if fmt == 'elf':
+        with open(fname, 'rb') as f:
+            return read_elf(f)
+    elif fmt == 'raw':
+        with open(fname, 'rb') as f:
+            return read_raw(f, base, bigendian, isa)
+    elif fmt == 'ihex':
+        with open(fname) as f:
+            return read_ihex(f, bigendian, isa)
+    elif fmt == 'srec':
+        with open(fname) as f:
+            return read_srec(f, bigendian, isa)
+    sys.stderr.write('unknown image format for "%s"\n'%(fname))
+    return None
@@ -0,0 +1,371 @@
+#!/usr/bin/python2
+
+"""
+Peephole optimizer of instruction lists driven by the pipeline model
+
+The pass rewrites the program to reduce cycles reported by the stall
+and forwarding analysis. Branch delay slots are filled by independent
+earlier instructions, nop padding outside delay slots is removed, move
+chains are folded and loads are hoisted away from their uses. Every
+rewrite is checked against the dependency rules (depanalyze and the
+register masks) and kept only when the modelled cycles do not grow.
+Instruction removal never adds more than one stall, moves are
+evaluated by the streaming timing model.
+
+Branch and jump targets and labels are tracked as references to the
+instructions and the offsets are encoded again when the result is
+built. Code addresses computed in registers are not tracked.
+"""
+
+import sys
+
+from simarch import siminst, siminstlist, retargettext
+from simarch import regnum2regname, regnum2regname_rv
+from simarch import CBD, UBD, LDD, SM, TRAP, LCD, COD
+from simarch import DEP_RAW, DEP_WAW, DEP_MEM_POSSIBLE
+from simpipeview import simstreamtiming
+
+__author__ = "Pavel Pisa"
+__copyright__ = "Copyright 2017-2019, Czech Technical University"
+__license__ = "GPLv2+"
+
+# instructions which are never moved
+BARRIER = TRAP | LCD | COD
+
+class optnode(object):
+    __slots__ = ('inst', 'target', 'taddr')
+    def __init__(self, inst):
+        self.inst = inst
+        # target instruction node or address outside of the list
+        self.target = None
+        self.taddr = None
+
+def independent(insta, instb):
+    """
+    Instructions can be swapped, no register dependency in either
+    direction (including implicit link and HI/LO registers) and no
+    store involved in possibly aliasing memory accesses
+    """
+    if (insta.pinfo | instb.pinfo) & BARRIER:
+        return False
+    deps = insta.depanalyze(instb, bidir = True) | instb.depanalyze(insta, bidir = True)
+    if deps & (DEP_RAW | DEP_WAW):
+        return False
+    if (deps & DEP_MEM_POSSIBLE) and ((insta.pinfo | instb.pinfo) & SM):
+        return False
+    if insta.wrmask & (instb.rdmask | instb.wrmask):
+        return False
+    if instb.wrmask & insta.rdmask:
+        return False
+    return True
+
+class simpeephole(object):
+    """
+    Optimizer working on a copy of the instruction list, base is
+    the address of the first instruction. The applied rewrites are
+    recorded in log as (kind, index, text) tuples.
+    """
+    def __init__(self, instlist, base = 0):
+        self.source = instlist
+        self.base = base
+        self.isa = instlist.isa
+        self.delayslot = instlist.isa != 'rv'
+        self.nodes = [optnode(inst) for inst in instlist.instlist]
+        n = len(self.nodes)
+        for i, node in enumerate(self.nodes):
+            inst = node.inst
+            if not (inst.pinfo & (CBD | UBD)):
+                continue
+            t = inst.target(base + 4 * i)
+            if t is None:
+                continue
+            ti = (t - base) >> 2
+            if (t & 3) or (ti < 0) or (ti >= n):
+                node.taddr = t
+            else:
+                node.target = self.nodes[ti]
+        self.labels = {}
+        for label, idx in instlist.labels.items():
+            if idx < n:
+                self.labels[label] = self.nodes[idx]
+        self.log = []
+
+    def cycles(self):
+        timing = simstreamtiming()
+        return timing.consume(iter([node.inst for node in self.nodes])).cycles
+
+    def parse(self, text):
+        if self.isa == 'rv':
+            return siminst.parse_rv(text)
+        return siminst.parse(text)
+
+    def isbranch(self, i):
+        return (i >= 0) and (self.nodes[i].inst.pinfo & (CBD | UBD))
+
+    def inslot(self, i):
+        return self.delayslot and self.isbranch(i - 1)
+
+    def targeted(self):
+        """
+        Set of ids of nodes which are branch targets or labeled
+        """
+        res = set([id(node.target) for node in self.nodes if node.target is not None])
+        for node in self.labels.values():
+            res.add(id(node))
+        return res
+
+    def blockstart(self, i, targeted):
+        """
+        First index of the basic block containing instruction i
+        """
+        while i > 0:
+            if id(self.nodes[i]) in targeted:
+                break
+            # the delay slot belongs to the block of its branch
+            if self.delayslot:
+                if self.isbranch(i - 2):
+                    break
+            elif self.isbranch(i - 1):
+                break
+            i -= 1
+        return i
+
+    def remove(self, i):
+        """
+        Remove node i, references are moved to the following node
+        """
+        node = self.nodes.pop(i)
+        if i < len(self.nodes):
+            succ = self.nodes[i]
+        else:
+            succ = None
+        for n in self.nodes:
+            if n.target is node:
+                n.target = succ
+                if succ is None:
+                    n.taddr = self.base + 4 * i
+        for label, n in self.labels.items():
+            if n is node:
+                if succ is None:
+                    del self.labels[label]
+                else:
+                    self.labels[label] = succ
+        return node
+
+    def record(self, kind, i, text):
+        self.log.append((kind, i, text))
+
+    def movesrc(self, inst):
+        """
+        Destination and source register of register copy, None
+        for other instructions
+        """
+        args = inst.args
+        op = inst.operation
+        if op in ('move', 'mv'):
+            return (args[0].reg, args[1].reg)
+        if (op in ('addu', 'or', 'add')) and (len(args) == 3) and (args[0].regkind == 'g'):
+            if args[2].regkind == 'g' and args[2].reg == 0:
+                return (args[0].reg, args[1].reg)
+            if args[1].regkind == 'g' and args[1].reg == 0:
+                return (args[0].reg, args[2].reg)
+        if (op in ('addiu', 'addi', 'ori')) and (len(args) == 3) and (args[2].regkind is None):
+            if (args[2].value == 0) and (args[1].regkind == 'g'):
+                return (args[0].reg, args[1].reg)
+        return None
+
+    def makemove(self, dst, src):
+        if self.isa == 'rv':
+            names = regnum2regname_rv
+            return self.parse('mv %s,%s'%(names[dst], names[src]))
+        names = regnum2regname
+        return self.parse('move %s,%s'%(names[dst], names[src]))
+
+    def fold_moves(self):
+        """
+        Remove self copies outside delay slots and fold copy chains
+        move b,a ... move c,b to move c,a when a and b are not written
+        in between
+        """
+        changed = False
+        i = 0
+        while i < len(self.nodes):
+            mv = self.movesrc(self.nodes[i].inst)
+            if mv is None:
+                i += 1
+                continue
+            dst, src = mv
+            if ((dst == src) or (dst == 0)) and not self.inslot(i) and \
+               (i + 1 < len(self.nodes)):
+                node = self.remove(i)
+                self.record('copy', i, node.inst.astext())
+                changed = True
+                continue
+            if (dst == src) or (dst == 0):
+                i += 1
+                continue
+            targeted = self.targeted()
+            mask = (1 << dst) | (1 << src)
+            k = i + 1
+            while k < len(self.nodes):
+                node = self.nodes[k]
+                if id(node) in targeted:
+                    break
+                mv2 = self.movesrc(node.inst)
+                if (mv2 is not None) and (mv2[1] == dst) and (mv2[0] != src):
+                    newinst = self.makemove(mv2[0], src)
+                    if newinst is not None:
+                        cycles = self.cycles()
+                        oldinst = node.inst
+                        node.inst = newinst
+                        if self.cycles() <= cycles:
+                            self.record('fold', k, '%s -> %s'%(oldinst.astext(), newinst.astext()))
+                            changed = True
+                        else:
+                            node.inst = oldinst
+                if node.inst.wrmask & mask:
+                    break
+                if node.inst.pinfo & (CBD | UBD):
+                    break
+                k += 1
+            i += 1
+        return changed
+
+    def remove_nops(self):
+        """
+        Remove nop padding outside delay slots, the pipeline
+        interlocks load-use hazards so the padding does not
+        change results. Removed instruction adds at most one
+        stall, so the cycles never grow.
+        """
+        changed = False
+        i = 0
+        while i < len(self.nodes):
+            inst = self.nodes[i].inst
+            if (inst.operation not in ('nop', 'ssnop')) or self.inslot(i) or \
+               (i + 1 >= len(self.nodes)):
+                i += 1
+                continue
+            self.remove(i)
+            self.record('nop', i, inst.astext())
+            changed = True
+        return changed
+
+    def fill_delay_slots(self):
+        """
+        Replace nop in branch delay slot by an earlier instruction
+        of the same block independent of the instructions it passes
+        """
+        if not self.delayslot:
+            return False
+        changed = False
+        i = 0
+        while i + 1 < len(self.nodes):
+            if not self.isbranch(i) or \
+               (self.nodes[i + 1].inst.operation not in ('nop', 'ssnop')):
+                i += 1
+                continue
+            targeted = self.targeted()
+            if id(self.nodes[i + 1]) in targeted:
+                i += 1
+                continue
+            start = self.blockstart(i, targeted)
+            cycles = self.cycles()
+            for j in range(i - 1, start - 1, -1):
+                cand = self.nodes[j]
+                if (id(cand) in targeted) or self.isbranch(j) or self.inslot(j):
+                    break
+                if not all([independent(cand.inst, self.nodes[k].inst)
+                            for k in range(j + 1, i + 1)]):
+                    continue
+                saved = list(self.nodes)
+                self.nodes[i + 1] = cand
+                del self.nodes[j]
+                if self.cycles() < cycles:
+                    self.record('slot', i, cand.inst.astext())
+                    changed = True
+                    break
+                self.nodes = saved
+            i += 1
+        return changed
+
+    def hoist_loads(self):
+        """
+        Move load followed by its use up over independent
+        instructions of the same block
+        """
+        changed = False
+        for i in range(1, len(self.nodes) - 1):
+            inst = self.nodes[i].inst
+            if not (inst.pinfo & LDD) or self.inslot(i):
+                continue
+            if not (inst.wrmask & self.nodes[i + 1].inst.rdmask):
+                continue
+            targeted = self.targeted()
+            if id(self.nodes[i]) in targeted:
+                continue
+            start = self.blockstart(i, targeted)
+            cycles = self.cycles()
+            for p in range(i - 1, start - 1, -1):
+                other = self.nodes[p]
+                if (id(other) in targeted) or self.isbranch(p) or self.inslot(p):
+                    break
+                if not independent(inst, other.inst):
+                    break
+                saved = list(self.nodes)
+                node = self.nodes.pop(i)
+                self.nodes.insert(p, node)
+                if self.cycles() < cycles:
+                    self.record('hoist', p, inst.astext())
+                    changed = True
+                    break
+                self.nodes = saved
+        return changed
+
+    def optimize(self, maxpasses = 8):
+        """
+        Apply the rewrites until nothing changes, returns
+        the optimized instruction list
+        """
+        for p in range(0, maxpasses):
+            changed = self.fold_moves()
+            changed |= self.remove_nops()
+            changed |= self.fill_delay_slots()
+            changed |= self.hoist_loads()
+            if not changed:
+                break
+        return self.result()
+
+    def retarget(self, inst, addr, taddr):
+        """
+        Encode the branch or jump at addr again for target address
+        """
+        if inst.target(addr) == taddr:
+            return inst
+        newinst = self.parse(retargettext(inst, addr, taddr))
+        if newinst is None:
+            sys.stderr.write('cannot encode "%s" at 0x%08x for target 0x%08x\n'%
+                             (inst.astext(), addr, taddr))
+            return inst
+        return newinst
+
+    def result(self):
+        il = siminstlist()
+        il.isa = self.isa
+        il.base = self.base
+        il.sections = list(self.source.sections)
+        il.datalabels = dict(self.source.datalabels)
+        index = {}
+        for i, node in enumerate(self.nodes):
+            index[id(node)] = i
+        for i, node in enumerate(self.nodes):
+            inst = node.inst
+            addr = self.base + 4 * i
+            if node.target is not None:
+                inst = self.retarget(inst, addr, self.base + 4 * index[id(node.target)])
+            elif node.taddr is not None:
+                inst = self.retarget(inst, addr, node.taddr)
+            il.instlist.append(inst)
+        for label, node in self.labels.items():
+            il.labels[label] = index[id(node)]
+        return il
@@ -0,0 +1,229 @@
+#!/usr/bin/python2
+
+"""
+Memory mapped peripherals of the MZ_APO education board
+for the simarch simulator
+
+The addresses follow QtMips emulation of the board
+"""
+
+import sys
+
+from simarch import simdevice, simbus, simconsole
+
+__author__ = "Pavel Pisa"
+__copyright__ = "Copyright 2017-2019, Czech Technical University"
+__license__ = "GPLv2+"
+
+SERIAL_PORT_BASE = 0xffffc000
+SPILED_REG_BASE  = 0xffffc100
+LCD_FB_START     = 0xffe00000
+
+LCD_WIDTH  = 480
+LCD_HEIGHT = 320
+
+SERP_RX_ST_REG     = 0x00
+SERP_RX_DATA_REG   = 0x04
+SERP_TX_ST_REG     = 0x08
+SERP_TX_DATA_REG   = 0x0c
+
+SPILED_REG_LED_LINE           = 0x004
+SPILED_REG_LED_RGB1           = 0x010
+SPILED_REG_LED_RGB2           = 0x014
+SPILED_REG_LED_KBDWR_DIRECT   = 0x018
+SPILED_REG_KBDRD_KNOBS_DIRECT = 0x020
+SPILED_REG_KNOBS_8BIT         = 0x024
+
+TIMER_CTRL_REG     = 0x00
+TIMER_PERIOD_REG   = 0x04
+TIMER_STATUS_REG   = 0x08
+TIMER_COUNT_REG    = 0x0c
+
+TIMER_CTRL_ENABLE   = 1
+TIMER_CTRL_IRQ      = 2
+TIMER_CTRL_PERIODIC = 4
+
+class simserial(simdevice):
+    """
+    Serial port, transmitted characters go to the console output
+    buffer, received ones are taken from the console input.
+    """
+    size = 0x10
+
+    def __init__(self, console = None):
+        if console is None:
+            console = simconsole()
+        self.console = console
+        self.rxchar = None
+    def rxfill(self):
+        if self.rxchar is None:
+            c = self.console.read(1)
+            if len(c) != 0:
+                self.rxchar = ord(c)
+        return self.rxchar
+    def rdreg(self, offset):
+        if offset == SERP_RX_ST_REG:
+            if self.rxfill() is not None:
+                return 1
+            return 0
+        elif offset == SERP_RX_DATA_REG:
+            c = self.rxfill()
+            self.rxchar = None
+            if c is None:
+                return 0
+            return c
+        elif offset == SERP_TX_ST_REG:
+            return 1
+        return 0
+    def wrreg(self, offset, val):
+        if offset == SERP_TX_DATA_REG:
+            self.console.write(chr(val & 0xff))
+
+class simspiled(simdevice):
+    """
+    LED line, two RGB LEDs and three rotary knobs with buttons.
+    The knobs value is set by the test harness.
+    """
+    size = 0x100
+
+    def __init__(self):
+        self.regs = {}
+        self.knobs = 0
+    def rdreg(self, offset):
+        if (offset == SPILED_REG_KBDRD_KNOBS_DIRECT) or (offset == SPILED_REG_KNOBS_8BIT):
+            return self.knobs
+        return self.regs.get(offset, 0)
+    def wrreg(self, offset, val):
+        self.regs[offset] = val
+    @property
+    def led_line(self):
+        return self.regs.get(SPILED_REG_LED_LINE, 0)
+    @property
+    def led_rgb1(self):
+        return self.regs.get(SPILED_REG_LED_RGB1, 0)
+    @property
+    def led_rgb2(self):
+        return self.regs.get(SPILED_REG_LED_RGB2, 0)
+
+class simlcd(simdevice):
+    """
+    LCD display with RGB565 framebuffer kept in bytearray in the
+    CPU memory byte order, it can be dumped after the run.
+    """
+    def __init__(self, width = LCD_WIDTH, height = LCD_HEIGHT, bigendian = True):
+        self.width = width
+        self.height = height
+        self.size = width * height * 2
+        self.bigendian = bigendian
+        self.fb = bytearray(self.size)
+    def rdmem(self, offset, size):
+        nbytes = size >> 3
+        b = self.fb[offset:offset + nbytes]
+        if not self.bigendian:
+            b.reverse()
+        val = 0
+        for c in b:
+            val = (val << 8) | c
+        return val
+    def wrmem(self, offset, size, val):
+        nbytes = size >> 3
+        b = bytearray(nbytes)
+        for i in range(nbytes - 1, -1, -1):
+            b[i] = val & 0xff
+            val >>= 8
+        if not self.bigendian:
+            b.reverse()
+        self.fb[offset:offset + nbytes] = b
+    def pixel(self, x, y):
+        return self.rdmem((y * self.width + x) * 2, 16)
+    def dump_raw(self, f):
+        f.write(str(self.fb))
+    def dump_ppm(self, f):
+        f.write('P6\n%d %d\n255\n'%(self.width, self.height))
+        rgb = bytearray(self.width * self.height * 3)
+        j = 0
+        for i in range(0, self.size, 2):
+            if self.bigendian:
+                p = (self.fb[i] << 8) | self.fb[i + 1]
+            else:
+                p = (self.fb[i + 1] << 8) | self.fb[i]
+            rgb[j] = (p >> 8) & 0xf8
+            rgb[j + 1] = (p >> 3) & 0xfc
+            rgb[j + 2] = (p << 3) & 0xf8
+            j += 3
+        f.write(str(rgb))
+
+class simtimer(simdevice):
+    """
+    Interval timer counting CPU cycles, expiration is scheduled as
+    CPU event so the timer costs nothing between expirations. The
+    interrupt is signalled on Cause IP line irq until the status
+    is cleared by writing 1.
+    """
+    size = 0x10
+
+    def __init__(self, cpustate, irq = 2):
+        self.cpustate = cpustate
+        self.irq = irq
+        self.ctrl = 0
+        self.period = 0
+        self.status = 0
+        self.start = 0
+        self.event = None
+    def rdreg(self, offset):
+        if offset == TIMER_CTRL_REG:
+            return self.ctrl
+        elif offset == TIMER_PERIOD_REG:
+            return self.period
+        elif offset == TIMER_STATUS_REG:
+            return self.status
+        elif offset == TIMER_COUNT_REG:
+            if self.event is None:
+                return 0
+            return self.cpustate.cycle - self.start
+        return 0
+    def wrreg(self, offset, val):
+        if offset == TIMER_CTRL_REG:
+            self.ctrl = val
+            self.restart()
+        elif offset == TIMER_PERIOD_REG:
+            self.period = val
+            self.restart()
+        elif offset == TIMER_STATUS_REG:
+            self.status &= ~val
+            if not self.status:
+                self.cpustate.setirq(self.irq, False)
+    def restart(self):
+        if self.event is not None:
+            self.cpustate.cancelevent(self.event)
+            self.event = None
+        if (self.ctrl & TIMER_CTRL_ENABLE) and self.period:
+            self.start = self.cpustate.cycle
+            self.event = self.cpustate.after(self.period, self.expired)
+    def expired(self, cpustate):
+        self.event = None
+        self.status |= 1
+        if self.ctrl & TIMER_CTRL_IRQ:
+            cpustate.setirq(self.irq)
+        if self.ctrl & TIMER_CTRL_PERIODIC:
+            self.restart()
+        else:
+            self.ctrl &= ~TIMER_CTRL_ENABLE
+
+class mzapo(object):
+    """
+    Set of MZ_APO board peripherals registered on one bus
+    """
+    def __init__(self, console = None, bigendian = True):
+        self.bus = simbus()
+        self.serial = simserial(console)
+        self.spiled = simspiled()
+        self.lcd = simlcd(bigendian = bigendian)
+        for dev in (self.serial, self.spiled):
+            dev.bigendian = bigendian
+        self.bus.register(self.serial, SERIAL_PORT_BASE, simserial.size)
+        self.bus.register(self.spiled, SPILED_REG_BASE, simspiled.size)
+        self.bus.register(self.lcd, LCD_FB_START, self.lcd.size)
+    def attach(self, cpustate):
+        cpustate.attachbus(self.bus)
+        return self.bus
@@ -0,0 +1,337 @@
+#!/usr/bin/python2
+
+"""
+Windowed pipeline diagram data for the simarch simulator
+
+Rows of the five stage (IF/ID/EX/MEM/WB) pipeline diagram are
+computed on demand for an instruction or cycle window of a program
+or an execution trace. The sequence is scanned only up to the
+requested window and the fetch cycle with the scoreboard state is
+checkpointed every K instructions, rows are computed per block of
+K instructions and the blocks are kept in an LRU cache.
+
+The stalls and forwarding are computed by simarch.stall_forward()
+shared with siminstlist.analyze_stall_forward(), the instruction
+objects are not modified so one instruction can appear many times
+in an execution trace.
+
+Streaming timing analysis of executed instructions is provided
+by simstreamtiming, it keeps only the latency window and the
+statistics so the trace length is not limited by memory. Running
+program is analysed inside a single run() call of the CPU.
+"""
+
+import collections
+import bisect
+
+from simarch import LDD, EXEC_STOP, EXEC_EXCEPTION, instopdes, stall_forward
+
+__author__ = "Pavel Pisa"
+__copyright__ = "Copyright 2017-2019, Czech Technical University"
+__license__ = "GPLv2+"
+
+STAGES = ('IF', 'ID', 'EX', 'MEM', 'WB')
+
+class piperow(collections.namedtuple('piperow', ['index', 'inst', 'fetch', 'stalls', 'forward'])):
+    """
+    Diagram row, the instruction is fetched in cycle fetch and
+    stays in ID for stalls additional cycles
+    """
+    __slots__ = ()
+    def stages(self):
+        """
+        List of (cycle, stage) pairs, stall cycles are reported
+        as repeated 'ID' stage
+        """
+        f = self.fetch
+        res = [(f, 'IF')]
+        for c in range(0, self.stalls + 1):
+            res.append((f + 1 + c, 'ID'))
+        f += self.stalls
+        res += [(f + 2, 'EX'), (f + 3, 'MEM'), (f + 4, 'WB')]
+        return res
+    @property
+    def end(self):
+        return self.fetch + self.stalls + 5
+
+streamstats = collections.namedtuple('streamstats', ['insts', 'cycles',
+                   'stalls', 'stalled', 'forward_rs', 'forward_rt'])
+
+class simstreamtiming(object):
+    """
+    Timing analysis over iterator of executed instructions. Only the
+    two previous instructions with their stalls are kept. Results
+    are memoized by encodings of the instruction and its predecessors,
+    so instructions decoded again for each trace record share entries
+    and the memo size is limited by the static program, not by the
+    trace length. The memo is cleared when it reaches memosize.
+    """
+    def __init__(self, memosize = 0x10000):
+        self.insts = 0
+        self.stalls = 0
+        self.stalled = 0
+        # forwarding counts indexed by the forwarding distance
+        self.forward_rs = [0, 0, 0]
+        self.forward_rt = [0, 0, 0]
+        self.prev1 = None
+        self.prev1stalls = 0
+        self.prev2 = None
+        self.memo = {}
+        self.memosize = memosize
+
+    def feed(self, inst):
+        """
+        Account one executed instruction, returns its stalls
+        and forwarding
+        """
+        prev1 = self.prev1
+        prev2 = self.prev2
+        if prev1 is None:
+            key = (inst.encoding, None, 0, None)
+        elif prev2 is None:
+            key = (inst.encoding, prev1.encoding, self.prev1stalls, None)
+        else:
+            key = (inst.encoding, prev1.encoding, self.prev1stalls, prev2.encoding)
+        res = self.memo.get(key)
+        if res is None:
+            if prev1 is None:
+                prevs = ()
+            elif prev2 is None:
+                prevs = ((prev1, self.prev1stalls),)
+            else:
+                prevs = ((prev1, self.prev1stalls), (prev2, 0))
+            res = stall_forward(inst, prevs)
+            if len(self.memo) >= self.memosize:
+                self.memo.clear()
+            self.memo[key] = res
+        stalls, forward = res
+        self.insts += 1
+        if stalls:
+            self.stalls += stalls
+            self.stalled += 1
+        self.forward_rs[forward[0]] += 1
+        self.forward_rt[forward[1]] += 1
+        self.prev2 = self.prev1
+        self.prev1 = inst
+        self.prev1stalls = stalls
+        return res
+
+    def consume(self, insts, report = None, every = 100000):
+        """
+        Feed all instructions from iterator, report function is called
+        with streamstats every given number of instructions
+        """
+        feed = self.feed
+        n = 0
+        for inst in insts:
+            feed(inst)
+            n += 1
+            if (report is not None) and (n >= every):
+                report(self.stats())
+                n = 0
+        return self.stats()
+
+    def stats(self):
+        return streamstats(self.insts, 4 + self.insts + self.stalls, self.stalls,
+                           self.stalled, tuple(self.forward_rs), tuple(self.forward_rt))
+
+    def run(self, cpustate, maxsteps):
+        """
+        Execute up to maxsteps instructions by single run() call,
+        trampolines installed into the instruction memory for the
+        run feed each executed instruction. Returns streamstats.
+        """
+        instmem = cpustate.instmem
+        hooked = []
+        for pc, (inst, op) in instmem.items():
+            instmem[pc] = (inst, instopdes(instop_streamfeed, op, self, op.size))
+            hooked.append(pc)
+        try:
+            cpustate.run(maxsteps)
+        finally:
+            for pc in hooked:
+                inst, op = instmem[pc]
+                if op.info is self:
+                    instmem[pc] = (inst, op.operator)
+        return self.stats()
+
+def instop_streamfeed(cpustate, inst, op):
+    res = op.operator.fnc(cpustate, inst, op.operator)
+    # stopped instruction is executed again later, faulting one
+    # has not completed
+    if (res != EXEC_STOP) and (res != EXEC_EXCEPTION):
+        op.info.feed(inst)
+    return res
+
+class simtrace(object):
+    """
+    Execution trace as sequence of instructions, stored as array
+    of PC values resolved through the instruction memory
+    """
+    def __init__(self, pcs, instmem):
+        self.pcs = pcs
+        self.instmem = instmem
+    def __len__(self):
+        return len(self.pcs)
+    def __getitem__(self, i):
+        return self.instmem[self.pcs[i]][0]
+
+class simpipeview(object):
+    """
+    On demand pipeline diagram of sequence of instructions, which can
+    be siminstlist.instlist or simtrace of executed instructions
+    """
+    def __init__(self, insts, checkpoint = 1024, cachesize = 64):
+        self.insts = insts
+        self.checkpoint = checkpoint
+        self.cachesize = cachesize
+        self.masks = {}
+        self.kinds = {}
+        # fetch cycle and stalls of the previous instruction
+        # at each checkpoint
+        self.fetch = [0]
+        self.prevstalls = [0]
+        self.cache = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.insts)
+
+    def instmasks(self, inst):
+        ldwr = 0
+        rd = 0
+        for a in inst.args:
+            if a.regkind is None:
+                continue
+            # register kinds use separate 32 bit ranges
+            kind = self.kinds.setdefault(a.regkind, len(self.kinds))
+            bit = 1 << (a.reg + 32 * kind)
+            if a.wrdep and (inst.pinfo & LDD):
+                ldwr |= bit
+            if a.rddep:
+                rd |= bit
+        m = (ldwr, rd)
+        self.masks[inst] = m
+        return m
+
+    def scan(self, kmax):
+        """
+        Extend checkpoints up to block kmax, only load-use stalls
+        are evaluated which needs two register masks per instruction
+        """
+        K = self.checkpoint
+        insts = self.insts
+        n = len(insts)
+        k = len(self.fetch) - 1
+        i = k * K
+        if (k >= kmax) or (i >= n):
+            return
+        f = self.fetch[k]
+        masks = self.masks
+        if i > 0:
+            prevld = masks.get(insts[i - 1]) or self.instmasks(insts[i - 1])
+            prevld = prevld[0]
+        else:
+            prevld = 0
+        while (k < kmax) and (i < n):
+            end = min(i + K, n)
+            s = 0
+            for idx in xrange(i, end):
+                inst = insts[idx]
+                m = masks.get(inst)
+                if m is None:
+                    m = self.instmasks(inst)
+                if prevld & m[1]:
+                    s = 1
+                else:
+                    s = 0
+                f += 1 + s
+                prevld = m[0]
+            i = end
+            k += 1
+            self.fetch.append(f)
+            self.prevstalls.append(s)
+
+    def block(self, k):
+        cache = self.cache
+        rows = cache.pop(k, None)
+        if rows is None:
+            self.scan(k)
+            K = self.checkpoint
+            insts = self.insts
+            i = k * K
+            end = min(i + K, len(insts))
+            f = self.fetch[k]
+            s = self.prevstalls[k]
+            if i > 0:
+                b1 = (insts[i - 1], s)
+            else:
+                b1 = None
+            b2 = None
+            if i > 1:
+                b2 = (insts[i - 2], 0)
+            rows = []
+            for idx in xrange(i, end):
+                inst = insts[idx]
+                if b1 is None:
+                    prevs = ()
+                elif b2 is None:
+                    prevs = (b1,)
+                else:
+                    prevs = (b1, b2)
+                s, forward = stall_forward(inst, prevs)
+                rows.append(piperow(idx, inst, f, s, forward))
+                f += 1 + s
+                b2 = b1
+                b1 = (inst, s)
+            if len(cache) >= self.cachesize:
+                cache.popitem(last = False)
+        cache[k] = rows
+        return rows
+
+    def rows(self, start, end):
+        """
+        Diagram rows of instructions start to end - 1
+        """
+        end = min(end, len(self.insts))
+        K = self.checkpoint
+        res = []
+        k = start // K
+        while k * K < end:
+            for row in self.block(k):
+                if start <= row.index < end:
+                    res.append(row)
+            k += 1
+        return res
+
+    def rowsbycycle(self, first, last):
+        """
+        Diagram rows of instructions in the pipeline at some cycle
+        from first to last - 1
+        """
+        K = self.checkpoint
+        n = len(self.insts)
+        # extend checkpoints until they pass the window end
+        while (self.fetch[-1] < last) and ((len(self.fetch) - 1) * K < n):
+            self.scan(len(self.fetch))
+        k = max(bisect.bisect_right(self.fetch, first - len(STAGES) - 1) - 1, 0)
+        res = []
+        while k * K < n:
+            if self.fetch[k] >= last:
+                break
+            for row in self.block(k):
+                if row.fetch >= last:
+                    break
+                if row.end > first:
+                    res.append(row)
+            k += 1
+        return res
+
+    def cycles(self):
+        """
+        Total cycles of the sequence, scans whole sequence
+        """
+        n = len(self.insts)
+        if n == 0:
+            return 4
+        self.scan((n + self.checkpoint - 1) // self.checkpoint)
+        return self.fetch[-1] + 4
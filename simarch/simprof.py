@@ -0,0 +1,198 @@
+#!/usr/bin/python2
+
+"""
+Call-graph profiler for the simarch simulator
+
+Shadow call stack is maintained from the linking branches and jumps
+(jal, jalr, bal, bgezal, bltzal) and popped by jumps through the link
+register (jr ra, ret). Executed instructions and pipeline stalls are
+accumulated per call path, the paths are interned as stack IDs so
+the memory use does not grow with the run length. Only calls,
+returns and instructions with stalls are hooked, the counts of the
+other instructions are obtained from the CPU cycle counter.
+"""
+
+import sys
+
+from simarch import instopdes, UBD, CBD
+
+__author__ = "Pavel Pisa"
+__copyright__ = "Copyright 2017-2019, Czech Technical University"
+__license__ = "GPLv2+"
+
+def instop_profcall(cpustate, inst, op):
+    prof = op.info
+    prof.account(cpustate, inst)
+    res = op.operator.fnc(cpustate, inst, op.operator)
+    target = cpustate.b_pend_pc
+    if (not res) and (target is not None):
+        prof.call(target, cpustate.gpreg[cpustate.linkreg])
+    return res
+def instop_profret(cpustate, inst, op):
+    prof = op.info
+    prof.account(cpustate, inst)
+    res = op.operator.fnc(cpustate, inst, op.operator)
+    target = cpustate.b_pend_pc
+    if (not res) and (target is not None):
+        prof.ret(target)
+    return res
+def instop_profstall(cpustate, inst, op):
+    prof = op.info
+    stalls = prof.stalls
+    stalls[prof.current] = stalls.get(prof.current, 0) + prof.stallmap[cpustate.pc]
+    return op.operator.fnc(cpustate, inst, op.operator)
+
+def stallmap(instlist, timing = None):
+    """
+    Map of instruction addresses to stall counts for the profiler,
+    timing of the forwarding pipeline is computed when not given
+    """
+    if timing is None:
+        timing = instlist.timing()
+    base = instlist.base
+    return dict([(base + 4 * i, st) for i, st in enumerate(timing.stalls) if st])
+
+class simprofiler(object):
+    """
+    Profiler attached to the instruction memory of one CPU. Stall
+    counts are taken from stalls mapping instruction addresses to
+    stalls (see stallmap()), only instructions are counted without
+    it. Symbols map names to addresses and are used for the folded
+    stack output.
+    """
+    def __init__(self, cpustate, symbols = None, stalls = None):
+        self.cpustate = cpustate
+        if stalls is None:
+            stalls = {}
+        self.stallmap = stalls
+        self.names = {}
+        if symbols is not None:
+            for name, addr in symbols.items():
+                self.names[addr] = name
+        self.stackids = {}
+        self.frames = []
+        self.insts = {}
+        self.stalls = {}
+        self.calls = {}
+        self.stack = []
+        self.current = None
+        self.lastcycle = 0
+        self.hooked = []
+
+    def intern(self, parent, func):
+        key = (parent, func)
+        sid = self.stackids.get(key)
+        if sid is None:
+            sid = len(self.frames)
+            self.stackids[key] = sid
+            self.frames.append(key)
+        return sid
+
+    def attach(self, entry = None):
+        cpu = self.cpustate
+        if entry is None:
+            entry = cpu.pc
+        self.current = self.intern(None, entry)
+        self.stack = []
+        self.lastcycle = cpu.cycle
+        linkmask = 1 << cpu.linkreg
+        for pc, (inst, op) in cpu.instmem.items():
+            if (inst.pinfo & (UBD | CBD)) and (inst.wrmask & linkmask):
+                fnc = instop_profcall
+            elif (inst.pinfo & UBD) and (inst.rdmask & linkmask):
+                fnc = instop_profret
+            elif pc in self.stallmap:
+                fnc = instop_profstall
+            else:
+                continue
+            cpu.instmem[pc] = (inst, instopdes(fnc, op, self, op.size))
+            self.hooked.append(pc)
+
+    def detach(self):
+        self.finish()
+        instmem = self.cpustate.instmem
+        for pc in self.hooked:
+            inst, op = instmem[pc]
+            if op.info is self:
+                instmem[pc] = (inst, op.operator)
+        self.hooked = []
+
+    def account(self, cpustate, inst):
+        cycle = cpustate.cycle + 1
+        insts = self.insts
+        insts[self.current] = insts.get(self.current, 0) + cycle - self.lastcycle
+        self.lastcycle = cycle
+        st = self.stallmap.get(cpustate.pc)
+        if st:
+            self.stalls[self.current] = self.stalls.get(self.current, 0) + st
+
+    def finish(self):
+        """
+        Attribute instructions executed since the last call or return
+        """
+        cycle = self.cpustate.cycle
+        if cycle > self.lastcycle:
+            self.insts[self.current] = self.insts.get(self.current, 0) + cycle - self.lastcycle
+        self.lastcycle = cycle
+
+    def call(self, target, retaddr):
+        self.stack.append((self.current, retaddr))
+        self.current = self.intern(self.current, target)
+        self.calls[self.current] = self.calls.get(self.current, 0) + 1
+
+    def ret(self, target):
+        # unwind to the frame returning to target, stray returns are ignored
+        stack = self.stack
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i][1] == target:
+                self.current = stack[i][0]
+                del stack[i:]
+                return
+
+    def funcname(self, addr):
+        if addr in self.names:
+            return self.names[addr]
+        return '0x%08x'%(addr)
+
+    def path(self, sid):
+        names = []
+        while sid is not None:
+            parent, func = self.frames[sid]
+            names.append(self.funcname(func))
+            sid = parent
+        names.reverse()
+        return names
+
+    def results(self):
+        """
+        List of (call path, instructions, stalls, calls) tuples
+        """
+        self.finish()
+        res = []
+        for sid in range(0, len(self.frames)):
+            insts = self.insts.get(sid, 0)
+            stalls = self.stalls.get(sid, 0)
+            if insts or stalls:
+                res.append((self.path(sid), insts, stalls, self.calls.get(sid, 0)))
+        return res
+
+    def folded(self, metric = 'cycles'):
+        """
+        Folded stacks lines for flamegraph tools, metric is 'insts',
+        'stalls' or 'cycles' (instructions plus stalls)
+        """
+        lines = []
+        for path, insts, stalls, calls in self.results():
+            if metric == 'insts':
+                val = insts
+            elif metric == 'stalls':
+                val = stalls
+            else:
+                val = insts + stalls
+            if val:
+                lines.append('%s %d\n'%(';'.join(path), val))
+        lines.sort()
+        return lines
+
+    def write_folded(self, f, metric = 'cycles'):
+        f.write(''.join(self.folded(metric)))
@@ -0,0 +1,385 @@
+#!/usr/bin/python2
+
+"""
+JSON-RPC simulation server hosting many simulator sessions
+
+Requests and responses are JSON-RPC 2.0 objects, one per line,
+over TCP or Unix domain socket. Each session owns its CPU state
+and instruction list. Long runs are executed in bounded slices
+interleaved with other sessions and network traffic, so a busy
+session does not stall the others. Idle sessions are evicted.
+Session ids are random tokens, a session is reachable only by
+clients which created it or were given its id.
+
+The service uses asyncore/asynchat event loop, the simulator
+is Python 2 code where asyncio is not available.
+"""
+
+import sys
+import os
+import binascii
+import socket
+import asyncore
+import asynchat
+import json
+import time
+import argparse
+
+from simarch import siminstlist, simcpustate, simcpustate_rv
+from simarch import simconsole, simsyscalls
+
+__author__ = "Pavel Pisa"
+__copyright__ = "Copyright 2017-2019, Czech Technical University"
+__license__ = "GPLv2+"
+
+RPC_PARSE_ERROR = -32700
+RPC_INVALID_REQUEST = -32600
+RPC_METHOD_NOT_FOUND = -32601
+RPC_INVALID_PARAMS = -32602
+RPC_INTERNAL_ERROR = -32603
+RPC_SESSION_ERROR = -32000
+RPC_SIMULATION_ERROR = -32001
+
+# memory words read by one request, bounds time spent in the event loop
+READMEM_MAX = 0x4000
+
+class simrpcerror(Exception):
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+        self.message = message
+
+class simsession(object):
+    def __init__(self, sid, isa = 'mips', input = ''):
+        self.sid = sid
+        self.isa = isa
+        if isa == 'mips':
+            self.cpu = simcpustate()
+        elif isa == 'riscv':
+            self.cpu = simcpustate_rv()
+        else:
+            raise simrpcerror(RPC_INVALID_PARAMS, 'unknown isa "%s"'%(isa))
+        self.console = simconsole(input)
+        self.cpu.syscalls = simsyscalls(self.console)
+        self.instlist = siminstlist()
+        self.lastuse = time.time()
+        self.job = None
+
+    def assemble(self, source):
+        self.instlist = siminstlist()
+        if self.isa == 'riscv':
+            self.instlist.isa = 'rv'
+        errors = [{'line': lineno, 'text': line} for lineno, line in
+                  self.instlist.appendlines(source.split('\n'))]
+        return {'count': len(self.instlist.instlist), 'errors': errors,
+                'encodings': [inst.encoding for inst in self.instlist.instlist]}
+
+    def load(self, addr = 0, entry = None):
+        end = self.cpu.loadinstlist(self.instlist, addr)
+        if entry is None:
+            entry = addr
+        self.cpu.pc = entry
+        self.cpu.b_pend_pc = None
+        self.cpu.halted = False
+        return {'start': addr, 'end': end, 'pc': entry}
+
+    def regs(self):
+        res = {'pc': self.cpu.pc, 'gpr': list(self.cpu.gpreg)}
+        if self.cpu.hilo:
+            res['hi'] = self.cpu.mhi
+            res['lo'] = self.cpu.mlo
+        return res
+
+    def changes(self):
+        """
+        Registers and memory words changed since the previous call,
+        the first call enables tracking and reports all registers
+        """
+        if not self.cpu.tracking:
+            self.cpu.settracking(True)
+        ch = self.cpu.changes()
+        res = {'pc': ch.pc, 'full': ch.full, 'gpr': [list(r) for r in ch.regs],
+               'mem': [list(m) for m in ch.memory]}
+        if ch.hi is not None:
+            res['hi'] = ch.hi
+        if ch.lo is not None:
+            res['lo'] = ch.lo
+        return res
+
+    def readmem(self, addr, count = 1):
+        return [self.cpu.rdmem(addr + 4 * i, 32) for i in range(0, count)]
+
+    def writemem(self, addr, values):
+        for i, val in enumerate(values):
+            self.cpu.wrmem(addr + 4 * i, 32, val)
+        return len(values)
+
+    def analyze(self):
+        timing = self.instlist.timing()
+        return {'cycles': timing.cycles,
+                'insts': [{'text': inst.astext(), 'stalls': timing.stalls[i],
+                           'forward': list(timing.forward(i))}
+                          for i, inst in enumerate(self.instlist.instlist)]}
+
+    def state(self):
+        return {'pc': self.cpu.pc, 'halted': self.cpu.halted,
+                'stopreason': self.cpu.stopreason, 'exitcode': self.cpu.exitcode,
+                'console': self.console.drain()}
+
+class simrunjob(object):
+    def __init__(self, session, channel, reqid, steps):
+        self.session = session
+        self.channel = channel
+        self.reqid = reqid
+        self.notify = False
+        self.remaining = steps
+        self.executed = 0
+    def reply(self, obj):
+        # notifications are executed but never answered
+        if not self.notify:
+            self.channel.reply(obj)
+
+class simrpcchannel(asynchat.async_chat):
+    def __init__(self, server, sock):
+        asynchat.async_chat.__init__(self, sock)
+        self.server = server
+        self.ibuffer = []
+        self.set_terminator('\n')
+    def collect_incoming_data(self, data):
+        self.ibuffer.append(data)
+    def found_terminator(self):
+        line = ''.join(self.ibuffer)
+        self.ibuffer = []
+        if len(line.strip()) != 0:
+            self.server.request(self, line)
+    def reply(self, obj):
+        if self.connected:
+            self.push(json.dumps(obj) + '\n')
+    def handle_close(self):
+        self.server.dropchannel(self)
+        self.close()
+
+class simserver(asyncore.dispatcher):
+    """
+    Listening socket, session table and run slice scheduler.
+    Address is (host, port) tuple for TCP or path for Unix socket.
+    """
+    def __init__(self, address, slicesteps = 20000, idletimeout = 600.0):
+        asyncore.dispatcher.__init__(self)
+        if isinstance(address, basestring):
+            self.create_socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.set_reuse_addr()
+        self.bind(address)
+        self.listen(16)
+        self.slicesteps = slicesteps
+        self.idletimeout = idletimeout
+        self.sessions = {}
+        self.jobs = []
+        self.lastevict = time.time()
+        self.methods = {
+            'create': self.rpc_create,
+            'close': self.rpc_close,
+            'assemble': self.rpc_assemble,
+            'load': self.rpc_load,
+            'step': self.rpc_run,
+            'run': self.rpc_run,
+            'regs': self.rpc_regs,
+            'changes': self.rpc_changes,
+            'readmem': self.rpc_readmem,
+            'writemem': self.rpc_writemem,
+            'analyze': self.rpc_analyze,
+            'state': self.rpc_state,
+        }
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            simrpcchannel(self, pair[0])
+
+    def dropchannel(self, channel):
+        pending = []
+        for job in self.jobs:
+            if job.channel is channel:
+                # nobody waits for the result, session is idle again
+                job.session.job = None
+            else:
+                pending.append(job)
+        self.jobs = pending
+
+    def session(self, params):
+        sid = params.get('session')
+        if sid not in self.sessions:
+            raise simrpcerror(RPC_SESSION_ERROR, 'unknown session %r'%(sid))
+        session = self.sessions[sid]
+        if session.job is not None:
+            raise simrpcerror(RPC_SESSION_ERROR, 'session %r is running'%(sid))
+        session.lastuse = time.time()
+        return session
+
+    def request(self, channel, line):
+        """
+        Process one request line, requests without id are notifications
+        which are executed but never replied, not even with an error.
+        """
+        reqid = None
+        notify = False
+        try:
+            try:
+                req = json.loads(line)
+            except ValueError:
+                raise simrpcerror(RPC_PARSE_ERROR, 'parse error')
+            if not isinstance(req, dict) or 'method' not in req:
+                raise simrpcerror(RPC_INVALID_REQUEST, 'invalid request')
+            notify = 'id' not in req
+            reqid = req.get('id')
+            params = req.get('params', {})
+            if not isinstance(params, dict):
+                raise simrpcerror(RPC_INVALID_PARAMS, 'params has to be object')
+            if req['method'] not in self.methods:
+                raise simrpcerror(RPC_METHOD_NOT_FOUND, 'method not found')
+            res = self.methods[req['method']](channel, reqid, params)
+        except simrpcerror as e:
+            if not notify:
+                channel.reply({'jsonrpc': '2.0', 'id': reqid,
+                               'error': {'code': e.code, 'message': e.message}})
+            return
+        except (TypeError, KeyError, ValueError, AttributeError, OverflowError) as e:
+            if not notify:
+                channel.reply({'jsonrpc': '2.0', 'id': reqid,
+                               'error': {'code': RPC_INVALID_PARAMS, 'message': str(e)}})
+            return
+        except Exception as e:
+            # failure is reported to the request only, the channel
+            # and jobs of other requests are kept
+            if not notify:
+                channel.reply({'jsonrpc': '2.0', 'id': reqid,
+                               'error': {'code': RPC_INTERNAL_ERROR,
+                                         'message': '%s: %s'%(type(e).__name__, e)}})
+            return
+        if isinstance(res, simrunjob):
+            res.notify = notify
+            self.jobs.append(res)
+            return
+        if not notify:
+            channel.reply({'jsonrpc': '2.0', 'id': reqid, 'result': res})
+
+    def newsid(self):
+        while True:
+            sid = binascii.hexlify(os.urandom(16))
+            if sid not in self.sessions:
+                return sid
+
+    def rpc_create(self, channel, reqid, params):
+        sid = self.newsid()
+        self.sessions[sid] = simsession(sid, params.get('isa', 'mips'),
+                                        params.get('input', ''))
+        return {'session': sid}
+
+    def rpc_close(self, channel, reqid, params):
+        session = self.session(params)
+        del self.sessions[session.sid]
+        return True
+
+    def rpc_assemble(self, channel, reqid, params):
+        return self.session(params).assemble(params['source'])
+
+    def rpc_load(self, channel, reqid, params):
+        return self.session(params).load(params.get('addr', 0), params.get('entry'))
+
+    def rpc_run(self, channel, reqid, params):
+        session = self.session(params)
+        session.job = simrunjob(session, channel, reqid, int(params.get('steps', 1)))
+        return session.job
+
+    def rpc_regs(self, channel, reqid, params):
+        return self.session(params).regs()
+
+    def rpc_changes(self, channel, reqid, params):
+        return self.session(params).changes()
+
+    def rpc_readmem(self, channel, reqid, params):
+        count = int(params.get('count', 1))
+        if (count < 0) or (count > READMEM_MAX):
+            raise simrpcerror(RPC_INVALID_PARAMS, 'count has to be 0 to %d'%(READMEM_MAX))
+        return self.session(params).readmem(params['addr'], count)
+
+    def rpc_writemem(self, channel, reqid, params):
+        return self.session(params).writemem(params['addr'], params['values'])
+
+    def rpc_analyze(self, channel, reqid, params):
+        return self.session(params).analyze()
+
+    def rpc_state(self, channel, reqid, params):
+        return self.session(params).state()
+
+    def runslices(self):
+        """
+        Run one slice of every pending job, finished ones are replied
+        """
+        pending = []
+        for job in self.jobs:
+            session = job.session
+            steps = min(job.remaining, self.slicesteps)
+            try:
+                done = session.cpu.run(steps)
+            except Exception as e:
+                # failure is reported to this job only, others continue
+                session.job = None
+                job.reply({'jsonrpc': '2.0', 'id': job.reqid,
+                           'error': {'code': RPC_SIMULATION_ERROR,
+                                     'message': '%s: %s'%(type(e).__name__, e)}})
+                continue
+            job.executed += done
+            job.remaining -= done
+            session.lastuse = time.time()
+            if (done < steps) or (job.remaining <= 0):
+                session.job = None
+                res = session.state()
+                res['steps'] = job.executed
+                job.reply({'jsonrpc': '2.0', 'id': job.reqid, 'result': res})
+            else:
+                pending.append(job)
+        self.jobs = pending
+
+    def evict(self):
+        now = time.time()
+        if now - self.lastevict < 1.0:
+            return
+        self.lastevict = now
+        for sid, session in self.sessions.items():
+            if (session.job is None) and (now - session.lastuse > self.idletimeout):
+                del self.sessions[sid]
+
+    def serve_forever(self):
+        while True:
+            if self.jobs:
+                timeout = 0
+            else:
+                timeout = 1.0
+            asyncore.loop(timeout = timeout, count = 1)
+            if self.jobs:
+                self.runslices()
+            self.evict()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'simarch JSON-RPC simulation server')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 7450)
+    parser.add_argument('--unix', default = None, help = 'listen on Unix socket path')
+    parser.add_argument('--slice', type = int, default = 20000,
+                        help = 'instructions executed per session slice')
+    parser.add_argument('--idle', type = float, default = 600.0,
+                        help = 'idle session eviction timeout in seconds')
+    opts = parser.parse_args()
+
+    if opts.unix is not None:
+        address = opts.unix
+    else:
+        address = (opts.host, opts.port)
+    server = simserver(address, slicesteps = opts.slice, idletimeout = opts.idle)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
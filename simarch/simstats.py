@@ -0,0 +1,233 @@
+#!/usr/bin/python2
+
+"""
+Static instruction mix and encoding statistics of program images
+
+Whole text segment is processed as NumPy uint32 array. Words are
+classified by the match/mask values of the instruction descriptors
+(first matching descriptor in the table order wins), the loop runs
+over the descriptors and never over the words. Opcode/funct
+histograms, mnemonic counts, register field usage, immediate bit
+width and branch offset distributions are computed from the array.
+
+NumPy is optional dependency of the simulator, it is needed only
+by this module.
+"""
+
+import sys
+import collections
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from simarch import instdeslist, instdeslist_rv, argdesbycode, argdesbycode_rv
+from simarch import locdesbycode, locdesbycode_rv, immdesbycode_rv
+
+__author__ = "Pavel Pisa"
+__copyright__ = "Copyright 2017-2019, Czech Technical University"
+__license__ = "GPLv2+"
+
+instmix = collections.namedtuple('instmix', ['count', 'unknown', 'opcode',
+               'funct', 'mnemonic', 'rs', 'rt', 'rd', 'immbits', 'branch'])
+
+class isastats(object):
+    """
+    Descriptor tables of one ISA prepared for the vectorised
+    classification
+    """
+    def __init__(self, isa):
+        if isa == 'riscv':
+            self.deslist = instdeslist_rv
+            self.argdesbycode = argdesbycode_rv
+            self.locdesbycode = locdesbycode_rv
+            self.opcodebits = (0, 7)
+            self.functbits = (12, 3)
+        else:
+            self.deslist = instdeslist
+            self.argdesbycode = argdesbycode
+            self.locdesbycode = locdesbycode
+            self.opcodebits = (26, 6)
+            self.functbits = (0, 6)
+        self.isa = isa
+        self.match = numpy.array([des.match for des in self.deslist], dtype = numpy.uint32)
+        self.mask = numpy.array([des.mask for des in self.deslist], dtype = numpy.uint32)
+        # row for each descriptor plus the last one for unknown words
+        self.regs = numpy.zeros((len(self.deslist) + 1, 3), dtype = bool)
+        self.imm = {}
+        self.branch = {}
+        regidx = {'RS': 0, 'RT': 1, 'RD': 2}
+        for i, des in enumerate(self.deslist):
+            for argspec in des.args:
+                p = argspec.find('(')
+                if p != -1:
+                    aspcs = [argspec[0 : p], argspec[p + 1: -1]]
+                else:
+                    aspcs = [argspec]
+                for aspc in aspcs:
+                    argdes = self.argdesbycode.get(aspc)
+                    if argdes is None:
+                        continue
+                    if argdes.kind == 'g':
+                        if argdes.loc in regidx:
+                            self.regs[i, regidx[argdes.loc]] = True
+                    elif argdes.kind == 'p':
+                        # RISC-V offset fields start at value bit 1 already
+                        if isa == 'riscv':
+                            shift = 0
+                        else:
+                            shift = argdes.shift
+                        self.branch.setdefault((argdes.loc, shift), []).append(i)
+                    elif argdes.kind in ('n', 'o'):
+                        if self.field(argdes.loc) is not None:
+                            self.imm.setdefault((argdes.loc, argdes.min < 0), []).append(i)
+
+    def field(self, loc):
+        """
+        Field decoding as list of (value bit, bits, word bit)
+        and total width, None for not extracted fields
+        """
+        if self.isa == 'riscv':
+            immdes = immdesbycode_rv.get(loc)
+            if (immdes is None) or (loc == 'SHAMT'):
+                return None
+            return immdes.fields, immdes.bits
+        if loc in ('IMMEDIATE', 'DELTA'):
+            locdes = self.locdesbycode[loc]
+            return [(0, locdes.bits, locdes.startbit)], locdes.bits
+        return None
+
+    def extract(self, words, loc, signed):
+        fields, bits = self.field(loc)
+        val = numpy.zeros(len(words), dtype = numpy.int64)
+        for vbit, fbits, ibit in fields:
+            val |= ((words >> ibit) & ((1 << fbits) - 1)).astype(numpy.int64) << vbit
+        if signed:
+            val -= ((val >> (bits - 1)) & 1) << bits
+        return val
+
+    def classify(self, words):
+        """
+        Index of the first matching descriptor for each word,
+        -1 for the words which are not instructions
+        """
+        idx = numpy.empty(len(words), dtype = numpy.int32)
+        idx.fill(-1)
+        for i in range(0, len(self.deslist)):
+            sel = (words & self.mask[i]) == self.match[i]
+            sel &= idx < 0
+            idx[sel] = i
+        return idx
+
+isastatscache = {}
+
+def getisastats(isa):
+    stats = isastatscache.get(isa)
+    if stats is None:
+        stats = isastats(isa)
+        isastatscache[isa] = stats
+    return stats
+
+def imagewords(image):
+    """
+    Words of all image segments concatenated to one uint32 array
+    """
+    if numpy is None:
+        sys.stderr.write('numpy is required for instruction statistics\n')
+        return None
+    if image.bigendian:
+        dtype = '>u4'
+    else:
+        dtype = '<u4'
+    parts = []
+    for addr, data in image.segments:
+        skip = -addr & 3
+        data = data[skip:]
+        data = data[:len(data) & ~3]
+        parts.append(numpy.frombuffer(bytes(data), dtype = dtype))
+    if not parts:
+        return numpy.zeros(0, dtype = numpy.uint32)
+    return numpy.concatenate(parts).astype(numpy.uint32)
+
+def bitwidth(val, signed):
+    """
+    Number of bits needed to represent the values
+    """
+    if signed:
+        val = numpy.where(val < 0, ~val, val)
+    width = numpy.frexp(val.astype(numpy.float64))[1]
+    if signed:
+        width += 1
+    return width
+
+def analyze_mix(words, isa = 'mips'):
+    """
+    Instruction mix statistics of array of instruction words, isa
+    is 'mips' or 'riscv'. Returns instmix tuple with numpy arrays
+    for opcode, funct and register field histograms, dictionaries
+    name -> count, bit width -> count and byte offset -> count
+    for mnemonics, immediates and branch offsets.
+    """
+    if numpy is None:
+        sys.stderr.write('numpy is required for instruction statistics\n')
+        return None
+    words = numpy.asarray(words, dtype = numpy.uint32)
+    stats = getisastats(isa)
+    idx = stats.classify(words)
+    known = idx >= 0
+
+    start, bits = stats.opcodebits
+    opcodes = (words >> start) & ((1 << bits) - 1)
+    opcode = numpy.bincount(opcodes, minlength = 1 << bits)
+    start, bits = stats.functbits
+    if isa == 'riscv':
+        sel = known
+    else:
+        sel = known & (opcodes == 0)
+    funct = numpy.bincount((words[sel] >> start) & ((1 << bits) - 1), minlength = 1 << bits)
+
+    descnt = numpy.bincount(idx[known], minlength = len(stats.deslist))
+    mnemonic = {}
+    for i in numpy.nonzero(descnt)[0]:
+        name = stats.deslist[i].name
+        mnemonic[name] = mnemonic.get(name, 0) + int(descnt[i])
+
+    uses = stats.regs[idx]
+    regcnt = []
+    for r, loc in enumerate(('RS', 'RT', 'RD')):
+        locdes = stats.locdesbycode[loc]
+        sel = uses[:, r]
+        regcnt.append(numpy.bincount((words[sel] >> locdes.startbit) & 0x1f, minlength = 32))
+
+    immbits = {}
+    for (loc, signed), ids in stats.imm.items():
+        sel = numpy.in1d(idx, ids)
+        if not sel.any():
+            continue
+        width = bitwidth(stats.extract(words[sel], loc, signed), signed)
+        cnt = numpy.bincount(width)
+        for w in numpy.nonzero(cnt)[0]:
+            immbits[int(w)] = immbits.get(int(w), 0) + int(cnt[w])
+
+    branch = {}
+    for (loc, shift), ids in stats.branch.items():
+        sel = numpy.in1d(idx, ids)
+        if not sel.any():
+            continue
+        offs = stats.extract(words[sel], loc, True) << shift
+        vals, cnt = numpy.unique(offs, return_counts = True)
+        for off, c in zip(vals, cnt):
+            branch[int(off)] = branch.get(int(off), 0) + int(c)
+
+    return instmix(len(words), int(len(words) - known.sum()), opcode, funct,
+                   mnemonic, regcnt[0], regcnt[1], regcnt[2], immbits, branch)
+
+def analyze_image_mix(image):
+    """
+    Instruction mix of all segments of simimage
+    """
+    words = imagewords(image)
+    if words is None:
+        return None
+    return analyze_mix(words, image.isa)
@@ -0,0 +1,67 @@
+import unittest
+
+from simarch import siminstlist, simcpustate
+
+LOOP = ['addi t0,zero,5', 'addi t1,zero,0', 'add  t1,t1,t0',
+        'addi t0,t0,-1', 'bne  t0,zero,-12', 'nop',
+        'sw   t1,0x100(zero)', 'lw   t2,0x100(zero)', 'addi t3,zero,1']
+
+def loopcpu():
+    instlist = siminstlist()
+    for line in LOOP:
+        instlist.append(line)
+    cpu = simcpustate()
+    cpu.loadinstlist(instlist, 0)
+    return cpu
+
+class breakpointtest(unittest.TestCase):
+    def test_breakpoint_stops_and_resumes(self):
+        cpu = loopcpu()
+        cpu.setbreakpoint(8)
+        self.assertEqual(cpu.run(100), 2)
+        self.assertEqual(cpu.stopreason, 'breakpoint')
+        self.assertEqual(cpu.pc, 8)
+        self.assertEqual(cpu.gpreg[9], 0)
+        # resuming executes the instruction under the breakpoint
+        cpu.run(100)
+        self.assertEqual(cpu.pc, 8)
+        self.assertEqual(cpu.gpreg[9], 5)
+        cpu.clearbreakpoint(8)
+        cpu.run(100)
+        self.assertEqual(cpu.gpreg[9], 15)
+        self.assertEqual(cpu.gpreg[10], 15)
+
+    def test_conditional_breakpoint(self):
+        cpu = loopcpu()
+        cpu.setbreakpoint(12, lambda cpu: cpu.gpreg[8] == 1)
+        cpu.run(100)
+        self.assertEqual(cpu.stopreason, 'breakpoint')
+        self.assertEqual(cpu.pc, 12)
+        self.assertEqual(cpu.gpreg[9], 15)
+
+    def test_breakpoint_before_load(self):
+        cpu = simcpustate()
+        cpu.setbreakpoint(4)
+        instlist = siminstlist()
+        for line in LOOP:
+            instlist.append(line)
+        cpu.loadinstlist(instlist, 0)
+        self.assertEqual(cpu.run(100), 1)
+        self.assertEqual(cpu.pc, 4)
+
+    def test_watchpoint(self):
+        cpu = loopcpu()
+        cpu.setwatchpoint(0x100, 4, 'w')
+        cpu.run(100)
+        self.assertEqual(cpu.stopreason, 'watchpoint')
+        self.assertEqual(cpu.watchhit, (0x100, 32, 'w'))
+        self.assertEqual(cpu.pc, 7 * 4)
+        self.assertEqual(cpu.memory[0x100], 15)
+        cpu.clearwatchpoint(0x100)
+        self.assertNotIn('wrmem', cpu.__dict__)
+        cpu.run(100)
+        self.assertEqual(cpu.gpreg[10], 15)
+        self.assertEqual(cpu.gpreg[11], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from simarch import siminst, siminstlist
+
+def makelist(lines):
+    instlist = siminstlist()
+    for line in lines:
+        instlist.append(line)
+    return instlist
+
+STRAIGHT = ['addi t0,zero,1', 'lw   t1,0(t0)', 'add  t2,t1,t0',
+            'sub  t3,t2,t1', 'sw   t3,4(t0)', 'lw   t4,4(t0)', 'nop',
+            'add  t5,t4,t4']
+
+# load in the delay slot feeds the first instruction of the loop
+LOOP = ['addi t1,zero,0', 'add  t2,t1,t0', 'addi t1,t1,1',
+        'bne  t1,t3,-12', 'lw   t0,0(sp)', 'nop']
+
+class cfgtest(unittest.TestCase):
+    def test_blocks(self):
+        blocks = makelist(LOOP).buildcfg()
+        self.assertEqual([(b.start, b.end) for b in blocks],
+                         [(0, 1), (1, 5), (5, 6)])
+        self.assertEqual([b.start for b in blocks[1].succs], [1, 5])
+
+    def test_straight_line_matches_pipeline(self):
+        instlist = makelist(STRAIGHT)
+        cycles = instlist.analyze_stall_forward()
+        expected = [(inst.stalls, inst.forward) for inst in instlist.instlist]
+        self.assertEqual(instlist.analyze_cfg(), cycles)
+        self.assertEqual([(inst.stalls, inst.forward) for inst in instlist.instlist],
+                         expected)
+
+    def test_back_edge_hazard(self):
+        instlist = makelist(LOOP)
+        instlist.analyze_stall_forward()
+        self.assertEqual(instlist.instlist[1].stalls, 0)
+        instlist.analyze_cfg()
+        self.assertEqual(instlist.instlist[1].stalls, 1)
+        self.assertEqual(instlist.instlist[1].forward[1], 1)
+
+    def test_block_reached_only_from_itself(self):
+        instlist = makelist(['j    0x18', 'nop', 'addi t0,t0,1',
+                             'beq  zero,zero,-8', 'nop', 'nop'])
+        self.assertEqual(instlist.analyze_cfg(), 6 + 4)
+        self.assertEqual(instlist.instlist[2].forward, (0, 0))
+
+    def test_riscv_forwarding_operands(self):
+        self.assertEqual(siminst.parse_rv('sub   a0,a1,a2').srcregs, (11, 12))
+        self.assertEqual(siminst.parse_rv('sw    a0,-4(sp)').srcregs, (2, 10))
+        self.assertEqual(siminst.parse_rv('addi  a0,a1,1').srcregs, (11, None))
+
+if __name__ == '__main__':
+    unittest.main()
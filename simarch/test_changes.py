@@ -0,0 +1,108 @@
+import unittest
+
+from simarch import siminstlist, simcpustate, simsystem
+from simserver import simsession
+
+PROGRAM = ['addi t0,zero,6',
+           'addi t1,zero,7',
+           'mult t0,t1',
+           'mflo t2',
+           'sw   t2,0x100(zero)',
+           'sb   t0,0x105(zero)',
+           'nop']
+
+def programcpu():
+    instlist = siminstlist()
+    instlist.appendlines(PROGRAM)
+    cpu = simcpustate()
+    cpu.loadinstlist(instlist, 0)
+    return cpu
+
+class changestest(unittest.TestCase):
+    def test_first_query_is_full(self):
+        cpu = programcpu()
+        cpu.settracking(True)
+        ch = cpu.changes()
+        self.assertTrue(ch.full)
+        self.assertEqual([r for r, val in ch.regs], range(1, 32))
+        self.assertEqual((ch.hi, ch.lo), (0, 0))
+        ch = cpu.changes()
+        self.assertFalse(ch.full)
+        self.assertEqual((ch.regs, ch.memory, ch.hi, ch.lo), ([], [], None, None))
+
+    def test_registers_hilo_and_words(self):
+        cpu = programcpu()
+        cpu.settracking(True)
+        cpu.changes()
+        cpu.run(2)
+        self.assertEqual(cpu.changes().regs, [(8, 6), (9, 7)])
+        cpu.run(1)
+        ch = cpu.changes()
+        self.assertEqual((ch.regs, ch.hi, ch.lo), ([], None, 42))
+        cpu.run(3)
+        ch = cpu.changes()
+        self.assertEqual(ch.regs, [(10, 42)])
+        self.assertEqual([a for a, val in ch.memory], [0x100, 0x104])
+        self.assertEqual(ch.pc, 6 * 4)
+
+    def test_step_back_and_restore(self):
+        cpu = programcpu()
+        cpu.setundolog(10)
+        cpu.settracking(True)
+        snap = cpu.snapshot()
+        cpu.run(5)
+        cpu.changes()
+        cpu.step_back(2)
+        ch = cpu.changes()
+        self.assertEqual(ch.regs, [(10, 0)])
+        self.assertEqual(ch.memory, [(0x100, None)])
+        cpu.run(1)
+        cpu.restore(snap)
+        self.assertTrue(cpu.changes().full)
+
+    def test_program_load_is_full_change(self):
+        cpu = simcpustate()
+        cpu.settracking(True)
+        cpu.changes()
+        instlist = siminstlist()
+        instlist.appendlines(PROGRAM)
+        cpu.loadinstlist(instlist, 0)
+        self.assertTrue(cpu.changes().full)
+
+    def test_store_by_other_core(self):
+        system = simsystem(2)
+        instlist = siminstlist()
+        instlist.appendlines(['addi t0,zero,7', 'sw   t0,0x100(zero)', 'nop'])
+        system.loadinstlist(instlist)
+        system.start()
+        cpu0, cpu1 = system.cores
+        cpu0.settracking(True)
+        cpu0.changes()
+        cpu1.run(2)
+        ch = cpu0.changes()
+        self.assertEqual((ch.memory, ch.regs, ch.full), ([(0x100, 7)], [], False))
+        self.assertEqual(cpu1.changes().memory, [])
+        cpu0.settracking(False)
+        self.assertNotIn('wrmem', cpu1.__dict__)
+
+    def test_disable_removes_hooks(self):
+        cpu = programcpu()
+        cpu.settracking(True)
+        cpu.settracking(False)
+        self.assertNotIn('wrgpreg', cpu.__dict__)
+        self.assertNotIn('wrmem', cpu.__dict__)
+
+    def test_session_changes(self):
+        session = simsession(1)
+        session.assemble('\n'.join(PROGRAM))
+        session.load()
+        self.assertTrue(session.changes()['full'])
+        session.cpu.run(2)
+        res = session.changes()
+        self.assertEqual(res['gpr'], [[8, 6], [9, 7]])
+        self.assertNotIn('lo', res)
+        session.load()
+        self.assertTrue(session.changes()['full'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import simcli
+from simarch import siminstlist
+
+SOURCE = """
+# count down t0
+        addi t0,zero,3
+loop:   addi t0,t0,-1
+        bne  t0,zero,loop
+        nop
+"""
+
+class clitest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmpdir, 'prog.S')
+        with open(self.source, 'w') as f:
+            f.write(SOURCE)
+        self.output = os.path.join(self.tmpdir, 'out.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def records(self, args):
+        res = simcli.main(args + ['-o', self.output, self.source])
+        self.assertEqual(res, 0)
+        with open(self.output) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def test_assemble_resolves_labels(self):
+        recs = self.records(['assemble'])
+        self.assertEqual([r['addr'] for r in recs], [0, 4, 8, 12])
+        # loop is two instructions back from the delay slot
+        self.assertEqual(int(recs[2]['encoding'], 16) & 0xffff, 0xfffe)
+
+    def test_assemble_disassemble_round_trip(self):
+        recs = self.records(['assemble'])
+        with open(self.source, 'w') as f:
+            f.write(' '.join([r['encoding'] for r in recs]))
+        dis = self.records(['disassemble'])
+        self.assertEqual([r['encoding'] for r in dis], [r['encoding'] for r in recs])
+
+    def test_unknown_label_is_error(self):
+        instlist = siminstlist()
+        errors = instlist.appendlines(['beq t0,zero,missing', 'nop'])
+        self.assertEqual([lineno for lineno, line in errors], [1])
+
+    def test_csv_output(self):
+        simcli.main(['assemble', '--format', 'csv', '-o', self.output, self.source])
+        with open(self.output) as f:
+            lines = f.read().split('\n')
+        self.assertEqual(lines[0], 'kind,addr,encoding,text')
+        self.assertEqual(len([l for l in lines if l]), 5)
+
+    def test_analyze_superscalar_issue_rows(self):
+        recs = self.records(['analyze', '--model', 'superscalar', '--width', '2'])
+        issues = [r for r in recs if r['kind'] == 'issue']
+        self.assertEqual(sorted([r['addr'] for r in issues]), [0, 4, 8, 12])
+        self.assertNotIn('stalls', issues[0])
+        self.assertEqual(issues[0]['slot'], 0)
+        self.assertEqual(recs[-1]['kind'], 'result')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from simarch import siminstlist, simcpustate, simcpustate_rv, runsystem
+from simcov import simcoverage, simcovcollector
+
+# a0 selects whether the branch skips the addi
+PROGRAM = ['       beq  a0,zero,skip',
+           '       nop',
+           '       addi t0,t0,1',
+           'skip:  addi t1,t1,1',
+           '       break']
+
+def runcov(a0, coverage = None, lines = PROGRAM, cpuclass = simcpustate):
+    instlist = siminstlist()
+    if cpuclass is simcpustate_rv:
+        instlist.isa = 'rv'
+    instlist.appendlines(lines)
+    cpu = cpuclass()
+    cpu.loadinstlist(instlist, 0)
+    cpu.gpreg[cpu.sysreg_args[0]] = a0
+    collector = simcovcollector(cpu.instmem, coverage)
+    collector.attach()
+    cpu.run(100)
+    return cpu, collector.detach()
+
+class coveragetest(unittest.TestCase):
+    def test_instructions_and_branch_direction(self):
+        cpu, cov = runcov(0)
+        self.assertEqual(cov.uncovered(cpu.instmem), [8])
+        self.assertEqual(cov.branch(0), (True, False))
+        self.assertEqual(cov.partial(cpu.instmem), [(0, True, False)])
+        stats = cov.stats(cpu.instmem)
+        self.assertEqual((stats.insts, stats.executed, stats.branches, stats.both),
+                         (5, 4, 1, 0))
+
+    def test_merge_runs(self):
+        cpu, cov = runcov(0)
+        cpu, other = runcov(1)
+        self.assertTrue(cov.merge(other))
+        self.assertEqual(cov.uncovered(cpu.instmem), [])
+        self.assertEqual(cov.partial(cpu.instmem), [])
+        self.assertEqual(cov.count(), (5, 2))
+        self.assertFalse(cov.merge(simcoverage(0, 3)))
+
+    def test_trampolines_released(self):
+        instlist = siminstlist()
+        instlist.appendlines(PROGRAM)
+        cpu = simcpustate()
+        cpu.loadinstlist(instlist, 0)
+        ops = dict(cpu.instmem)
+        collector = simcovcollector(cpu.instmem)
+        collector.attach()
+        self.assertEqual(len(collector.hooked), 5)
+        cpu.run(100)
+        # the skipped addi and the not taken direction are still waited for
+        self.assertEqual(collector.hooked, set([0, 8]))
+        collector.detach()
+        self.assertEqual(cpu.instmem, ops)
+
+    def test_save_and_load(self):
+        cpu, cov = runcov(1)
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tmpdir, 'prog.cov')
+            cov.save(fname)
+            loaded = simcoverage.load(fname)
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertEqual((loaded.base, loaded.words), (cov.base, cov.words))
+        self.assertEqual(loaded.insts, cov.insts)
+        self.assertEqual(loaded.branches, cov.branches)
+        self.assertIsNone(simcoverage.fromstring('garbage'))
+
+    def test_accumulated_coverage_skips_hooks(self):
+        cpu, cov = runcov(1)
+        cpu, cov = runcov(0, cov)
+        self.assertEqual(cov.branch(0), (True, True))
+
+    def test_riscv_branch(self):
+        cpu, cov = runcov(5, lines = ['beq  a0,zero,8', 'addi t0,t0,1', 'ebreak'],
+                          cpuclass = simcpustate_rv)
+        self.assertEqual(cov.branch(0), (False, True))
+        self.assertTrue(cov.executed(4))
+
+    def test_runsystem_coverage(self):
+        res = runsystem({'source': PROGRAM, 'coverage': True})
+        cov = pickle.loads(pickle.dumps(res['coverage']))
+        self.assertEqual(cov.branch(0), (True, False))
+        self.assertNotIn('coverage', runsystem({'source': PROGRAM}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from simarch import siminstlist, simcpustate, DATA_BASE
+from simobj import simimage, writeimage, readimage
+
+SOURCE = ['        .data',
+          'msg:    .asciiz "hi#\\n"',
+          '        .align 2',
+          'tab:    .word 1, 2, 0x30:2',
+          'ptr:    .word tab',
+          'half:   .half 0x1234',
+          'buf:    .space 3',
+          '        .byte 0xff',
+          '        .text',
+          'main:   lui  t0,0x1001',
+          '        lw   t1,8(t0)   # tab',
+          '        nop']
+
+def makelist(lines = SOURCE):
+    instlist = siminstlist()
+    errors = instlist.appendlines(lines)
+    return instlist, errors
+
+class directivetest(unittest.TestCase):
+    def test_data_layout_and_labels(self):
+        instlist, errors = makelist()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(instlist.instlist), 3)
+        self.assertEqual(instlist.labels, {'main': 0})
+        self.assertEqual(instlist.datalabels, {'msg': DATA_BASE, 'tab': DATA_BASE + 8,
+                                               'ptr': DATA_BASE + 24, 'half': DATA_BASE + 28,
+                                               'buf': DATA_BASE + 30})
+        addr, data = instlist.sections[0]
+        self.assertEqual(addr, DATA_BASE)
+        self.assertEqual(str(data[0:5]), 'hi#\n\0')
+        self.assertEqual(str(data[8:12]), '\0\0\0\1')
+        self.assertEqual(len(data), 34)
+        self.assertEqual(data[33], 0xff)
+
+    def test_section_loaded_to_memory(self):
+        instlist, errors = makelist()
+        cpu = simcpustate()
+        cpu.loadinstlist(instlist, 0)
+        cpu.run(3)
+        self.assertEqual(cpu.gpreg[9], 1)
+        self.assertEqual(cpu.memory[DATA_BASE + 16], 0x30)
+        self.assertEqual(cpu.memory[DATA_BASE + 24], DATA_BASE + 8)
+        self.assertEqual(cpu.rdmem(DATA_BASE + 33, 8), 0xff)
+
+    def test_label_on_auto_aligned_data(self):
+        instlist, errors = makelist(['.data', '.space 3', 'w:  .word -1', 'h:', '.byte 1',
+                                     '    .half 2', 'e:', '.text',
+                                     'lui  t0,0x1001', 'lw   t1,4(t0)'])
+        self.assertEqual(errors, [])
+        self.assertEqual(instlist.datalabels, {'w': DATA_BASE + 4, 'h': DATA_BASE + 8,
+                                               'e': DATA_BASE + 12})
+        cpu = simcpustate()
+        cpu.loadinstlist(instlist, 0)
+        cpu.run(2)
+        self.assertEqual(cpu.gpreg[9], 0xffffffff)
+
+    def test_errors(self):
+        instlist, errors = makelist(['.word 1', '.data', 'addi t0,zero,1',
+                                     '.bogus 3', '.ascii "open'])
+        self.assertEqual([lineno for lineno, line in errors], [1, 3, 4, 5])
+
+    def test_branch_after_bad_line(self):
+        source = ['top: addi t0,t0,1', 'addi t1,zero,99999999', 'j end', 'nop',
+                  'addi t2,zero,5', 'end: beq zero,zero,top', 'nop']
+        instlist, errors = makelist(source)
+        self.assertEqual(errors, [(2, source[1])])
+        good = siminstlist()
+        good.appendlines(source[0:1] + source[2:])
+        self.assertEqual(instlist.labels, {'top': 0, 'end': 4})
+        self.assertEqual([inst.encoding for inst in instlist.instlist],
+                         [inst.encoding for inst in good.instlist])
+
+    def test_image_keeps_data_out_of_text(self):
+        instlist, errors = makelist()
+        image = simimage.frominstlist(instlist, 0x400000)
+        self.assertEqual(len(image.segments), 1)
+        self.assertEqual(image.datasegs[0][0], DATA_BASE)
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tmpdir, 'prog.elf')
+            writeimage(fname, image)
+            loaded = readimage(fname)
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertEqual(loaded.segments, image.segments)
+        self.assertEqual(loaded.datasegs, image.datasegs)
+        cpu = simcpustate()
+        loaded.load(cpu)
+        self.assertNotIn(DATA_BASE, cpu.instmem)
+        self.assertEqual(cpu.memory[DATA_BASE + 8], 1)
+        il = loaded.instlist()
+        self.assertEqual(il.datalabels['tab'], DATA_BASE + 8)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from simarch import siminstlist
+
+def makelist(lines):
+    instlist = siminstlist()
+    for line in lines:
+        instlist.append(line)
+    return instlist
+
+def fullcycles(lines):
+    return makelist(lines).analyze_stall_forward()
+
+class edittest(unittest.TestCase):
+    lines = ['lw   t0,0(a0)', 'addi t1,t2,1', 'addi t3,t0,1', 'sw   t3,4(a0)']
+
+    def test_replace_introduces_load_use(self):
+        instlist = makelist(self.lines)
+        instlist.analyze_stall_forward()
+        instlist.replace(1, 'addi t1,t0,1')
+        lines = list(self.lines)
+        lines[1] = 'addi t1,t0,1'
+        self.assertEqual(instlist.cycles, fullcycles(lines))
+        self.assertEqual(instlist.instlist[1].stalls, 1)
+
+    def test_insert_and_delete(self):
+        instlist = makelist(self.lines)
+        instlist.analyze_stall_forward()
+        instlist.insert(1, 'nop')
+        lines = list(self.lines)
+        lines.insert(1, 'nop')
+        self.assertEqual(instlist.cycles, fullcycles(lines))
+        instlist.delete(1)
+        self.assertEqual(instlist.cycles, fullcycles(self.lines))
+
+    def test_forwarding_matches_full_analysis(self):
+        instlist = makelist(self.lines)
+        instlist.analyze_stall_forward()
+        instlist.replace(0, 'addi t0,zero,5')
+        lines = list(self.lines)
+        lines[0] = 'addi t0,zero,5'
+        full = makelist(lines)
+        full.analyze_stall_forward()
+        self.assertEqual([inst.forward for inst in instlist.instlist],
+                         [inst.forward for inst in full.instlist])
+        self.assertEqual(instlist.cycles, full.cycles)
+
+    def test_branches_follow_edit_between_branch_and_target(self):
+        instlist = siminstlist()
+        instlist.appendlines(['beq  t0,t1,end', 'nop', 'addi t0,t0,1',
+                              'end:  addi t1,t1,1', 'bne  t0,t1,-12', 'j    4'])
+        instlist.insert(1, 'addi t2,t2,1')
+        self.assertEqual(instlist.labels, {'end': 4})
+        self.assertEqual([inst.target(4 * k) for k, inst in enumerate(instlist.instlist)],
+                         [16, None, None, None, None, 12, 8])
+        self.assertEqual(instlist.instlist[0].args[-1].text, 'end')
+        # the deleted nop is replaced by its successor as the jump target
+        instlist.delete(2)
+        self.assertEqual([inst.target(4 * k) for k, inst in enumerate(instlist.instlist)],
+                         [12, None, None, None, 8, 8])
+        full = siminstlist()
+        full.appendlines(['beq  t0,t1,end', 'addi t2,t2,1', 'addi t0,t0,1',
+                          'end:  addi t1,t1,1', 'bne  t0,t1,-12', 'j    8'])
+        self.assertEqual([inst.encoding for inst in instlist.instlist],
+                         [inst.encoding for inst in full.instlist])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+
+from simarch import siminstlist, simcpustate, simbus, simdevice
+from simarch import CP0_CAUSE, CP0_EPC, EXC_INT
+from simperiph import simtimer
+
+def makelist(lines):
+    instlist = siminstlist()
+    for line in lines:
+        instlist.append(line)
+    return instlist
+
+def programcpu(lines):
+    cpu = simcpustate()
+    cpu.loadinstlist(makelist(lines), 0)
+    return cpu
+
+LOOP = ['addi t0,t0,1', 'beq  zero,zero,-8', 'nop']
+
+class scheddevice(simdevice):
+    """
+    Schedules callback delay cycles after register write
+    """
+    def __init__(self, cpustate, delay, callback):
+        self.cpustate = cpustate
+        self.delay = delay
+        self.callback = callback
+    def rdreg(self, offset):
+        return 0
+    def wrreg(self, offset, val):
+        self.cpustate.after(self.delay, self.callback)
+
+class eventtest(unittest.TestCase):
+    def test_event_fires_at_due_cycle(self):
+        cpu = programcpu(LOOP)
+        fired = []
+        cpu.after(7, lambda cpu: fired.append((cpu.cycle, cpu.gpreg[8])))
+        self.assertEqual(cpu.run(20), 20)
+        self.assertEqual(fired, [(7, 3)])
+        self.assertEqual(cpu.cycle, 20)
+
+    def test_cancelled_event_not_called(self):
+        cpu = programcpu(LOOP)
+        fired = []
+        event = cpu.after(3, fired.append)
+        cpu.cancelevent(event)
+        cpu.run(10)
+        self.assertEqual(fired, [])
+
+    def test_event_scheduled_from_plain_loop(self):
+        cpu = programcpu(['lui  t1,0x1', 'sw   zero,0(t1)'] + LOOP)
+        fired = []
+        bus = simbus()
+        bus.register(scheddevice(cpu, 4, lambda cpu: fired.append(cpu.cycle)),
+                     0x10000, 0x10)
+        cpu.attachbus(bus)
+        cpu.run(20)
+        self.assertEqual(fired, [5])
+
+    def test_plain_loop_after_last_event(self):
+        cpu = programcpu(['mfc0 t1,9'] + LOOP)
+        simtimer(cpu)
+        cpu.run(1)
+        self.assertFalse(cpu.eventmode)
+        self.assertEqual(cpu.gpreg[9], 0)
+        fired = []
+        cpu.after(2, lambda cpu: fired.append(cpu.cycle))
+        self.assertEqual(cpu.run(10), 10)
+        self.assertEqual(fired, [3])
+        self.assertFalse(cpu.eventmode)
+        self.assertEqual(cpu.cycle, 11)
+
+    def test_compare_interrupt(self):
+        cpu = programcpu(['addi t0,zero,10', 'mtc0 t0,11',
+                          'ori  t0,zero,0x8001', 'mtc0 t0,12'] + LOOP)
+        cpu.loadinstlist(makelist(['addi t2,zero,1', 'beq  zero,zero,-4',
+                                   'nop']), cpu.excvector)
+        cpu.excpolicy = 'vector'
+        cpu.run(20)
+        self.assertEqual(cpu.gpreg[10], 1)
+        self.assertEqual(cpu.exccode, EXC_INT)
+        self.assertTrue(cpu.cp0[CP0_CAUSE] & (1 << 15))
+        self.assertIn(cpu.cp0[CP0_EPC], (16, 20, 24))
+
+    def test_interval_timer(self):
+        cpu = programcpu(LOOP)
+        timer = simtimer(cpu)
+        timer.wrreg(4, 5)
+        timer.wrreg(0, 1 | 4)
+        cpu.run(12)
+        self.assertEqual(timer.status, 1)
+        self.assertEqual(timer.rdreg(12), 2)
+
+    def test_step_back_stops_at_event(self):
+        cpu = programcpu(LOOP)
+        cpu.setundolog(100)
+        fired = []
+        cpu.after(4, lambda cpu: fired.append(cpu.cycle))
+        cpu.run(10)
+        self.assertEqual(fired, [4])
+        self.assertEqual(cpu.step_back(10), 5)
+        self.assertEqual(cpu.cycle, 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+from simarch import siminstlist, simcpustate
+from simarch import EXC_ADES, EXC_OV, EXC_TR, EXC_BP
+from simarch import CP0_EPC, CP0_CAUSE, CP0_BADVADDR, CAUSE_BD
+
+def makelist(lines):
+    instlist = siminstlist()
+    for line in lines:
+        instlist.append(line)
+    return instlist
+
+def programcpu(lines):
+    cpu = simcpustate()
+    cpu.loadinstlist(makelist(lines), 0)
+    return cpu
+
+class exceptiontest(unittest.TestCase):
+    def test_overflow_halts_before_instruction(self):
+        cpu = programcpu(['lui  t0,0x7fff', 'ori  t0,t0,0xffff',
+                          'addi t1,t0,1', 'addi t2,zero,1'])
+        cpu.run(10)
+        self.assertEqual(cpu.stopreason, 'exception')
+        self.assertEqual(cpu.exccode, EXC_OV)
+        self.assertEqual(cpu.pc, 8)
+        self.assertEqual(cpu.gpreg[9], 0)
+        self.assertEqual(cpu.cp0[CP0_EPC], 8)
+
+    def test_unaligned_store_sets_badvaddr(self):
+        cpu = programcpu(['addi t0,zero,0x101', 'sw   t0,0(t0)'])
+        cpu.run(10)
+        self.assertEqual(cpu.exccode, EXC_ADES)
+        self.assertEqual(cpu.cp0[CP0_BADVADDR], 0x101)
+        self.assertNotIn(0x100, cpu.memory)
+
+    def test_divide_by_zero_in_delay_slot(self):
+        cpu = programcpu(['addi t0,zero,5', 'beq  zero,zero,16',
+                          'div  0,t0,zero', 'nop'])
+        cpu.run(10)
+        self.assertEqual(cpu.exccode, EXC_TR)
+        self.assertEqual(cpu.cp0[CP0_EPC], 4)
+        self.assertTrue(cpu.cp0[CP0_CAUSE] & CAUSE_BD)
+
+    def test_vector_policy_and_host_handler(self):
+        cpu = programcpu(['break', 'addi t0,zero,1'])
+        cpu.loadinstlist(makelist(['addi t1,zero,2']), cpu.excvector)
+        cpu.excpolicy = 'vector'
+        cpu.run(2)
+        self.assertEqual(cpu.gpreg[9], 2)
+        self.assertEqual(cpu.cp0[CP0_EPC], 0)
+
+        cpu = programcpu(['break', 'addi t0,zero,1'])
+        codes = []
+        def handler(cpu, exccode):
+            codes.append(exccode)
+            cpu.pc += 4
+            return True
+        cpu.excpolicy = handler
+        cpu.run(2)
+        self.assertEqual(codes, [EXC_BP])
+        self.assertEqual(cpu.gpreg[8], 1)
+
+    def test_step_back_over_exception(self):
+        cpu = programcpu(['break', 'addi t0,zero,1'])
+        cpu.loadinstlist(makelist(['addi t1,zero,2']), cpu.excvector)
+        cpu.excpolicy = 'vector'
+        cpu.setundolog(10)
+        cpu.run(2)
+        self.assertEqual(cpu.step_back(2), 2)
+        self.assertEqual(cpu.pc, 0)
+        self.assertEqual(cpu.cp0, [0] * 32)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from simarch import siminstlist, REG_HI
+from simflow import simdataflow, regset, EXITLIVE
+
+PROGRAM = ['main:  addi t0,zero,3',
+           '       addi t1,zero,5',
+           'loop:  add  t2,t2,t0',
+           '       addi t0,t0,-1',
+           '       bne  t0,zero,loop',
+           '       nop',
+           '       mult t2,t2',
+           '       mflo v0',
+           '       jr   ra',
+           '       nop']
+
+def makeflow(lines, **kwargs):
+    instlist = siminstlist()
+    instlist.appendlines(lines)
+    flow = simdataflow(instlist, **kwargs)
+    flow.solve()
+    return flow
+
+class dataflowtest(unittest.TestCase):
+    def test_dead_writes(self):
+        flow = makeflow(PROGRAM)
+        # t1 is never read, HI of mult is not used
+        self.assertEqual(flow.deadwrites(), [(1, regset([9])), (6, 1 << REG_HI)])
+
+    def test_uninitialized_read_in_loop(self):
+        flow = makeflow(PROGRAM)
+        self.assertEqual(flow.uninitreads(), [(2, regset([10]))])
+        flow = makeflow(PROGRAM, entrydefined = regset([0, 10, 31]))
+        self.assertEqual(flow.uninitreads(), [])
+
+    def test_def_chains_over_back_edge(self):
+        flow = makeflow(PROGRAM)
+        self.assertEqual(flow.defsreaching(2, 8), [0, 3])
+        self.assertEqual(flow.defsreaching(2, 10), [-1, 2])
+        self.assertEqual(flow.defsreaching(7, 10), [2])
+
+    def test_liveness_and_pressure(self):
+        flow = makeflow(PROGRAM, exitlive = regset([2]))
+        self.assertTrue(flow.liveout[4] & regset([8, 10]))
+        self.assertFalse(flow.livein[0] & regset([8]))
+        self.assertEqual(flow.liveout[9], regset([2]))
+        self.assertEqual(flow.pressure()[6], 2)
+        self.assertEqual(makeflow(PROGRAM).liveout[9], EXITLIVE)
+
+    def test_syscall_registers(self):
+        flow = makeflow(['addi v0,zero,1', 'addi a0,zero,7', 'addi a1,zero,2',
+                         'syscall', 'jr   ra', 'nop'], exitlive = 0)
+        self.assertEqual(flow.deadwrites(), [(3, regset([2]))])
+
+    def test_call_return_values(self):
+        flow = makeflow(['main:  jal  f', '       nop', '       addu s0,v0,v0',
+                         '       addi v0,zero,10', '       syscall', '       nop',
+                         'f:     addi v0,zero,5', '       jr   ra', '       nop'])
+        self.assertEqual(flow.uninitreads(), [])
+        self.assertEqual(flow.defsreaching(2, 2), [0])
+        self.assertEqual(flow.defsreaching(2, 16), [-1])
+        # t0 is not set by f but it may be
+        self.assertEqual(makeflow(['jal  f', 'nop', 'addu s0,t0,t0',
+                                   'f: jr ra', 'nop']).uninitreads(), [])
+        self.assertEqual(makeflow(['jal  f', 'nop', 'addu s0,s1,s1',
+                                   'f: jr ra', 'nop']).uninitreads(), [(2, regset([17]))])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from simarch import siminstlist, simmuldiv
+
+def makelist(lines):
+    instlist = siminstlist()
+    for line in lines:
+        instlist.append(line)
+    return instlist
+
+class muldivtest(unittest.TestCase):
+    def test_mflo_waits_for_multiply(self):
+        instlist = makelist(['mult t0,t1', 'mflo t2'])
+        base = instlist.analyze_stall_forward()
+        cycles = instlist.analyze_stall_forward(simmuldiv(multlatency = 4))
+        self.assertEqual(instlist.instlist[1].stalls, 3)
+        self.assertEqual(cycles, base + 3)
+        self.assertEqual(instlist.muldivstats, (4, 0, 3))
+
+    def test_independent_instructions_overlap(self):
+        instlist = makelist(['div  0,t0,t1', 'addi t2,zero,1', 'addi t3,zero,2',
+                             'mflo t4'])
+        instlist.analyze_stall_forward(simmuldiv(divlatency = 8))
+        self.assertEqual(instlist.instlist[3].stalls, 5)
+        self.assertEqual(instlist.muldivstats.overlap, 2)
+
+    def test_back_to_back_multiply(self):
+        instlist = makelist(['mult t0,t1', 'multu t2,t3', 'mfhi t4'])
+        instlist.analyze_stall_forward(simmuldiv(multlatency = 3))
+        self.assertEqual([inst.stalls for inst in instlist.instlist], [0, 2, 2])
+        self.assertEqual(instlist.muldivstats, (6, 0, 4))
+
+    def test_without_unit_unchanged(self):
+        instlist = makelist(['mult t0,t1', 'mflo t2'])
+        self.assertEqual(instlist.analyze_stall_forward(), 4 + 2)
+        self.assertEqual(instlist.instlist[1].stalls, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+from simarch import simsystem, runsystem, siminstlist, simcpustate
+from simarch import simsyscalls, simconsole
+
+# each core atomically adds its number plus one to the counter at 0x100
+ATOMIC_ADD = ['retry: ll   t0,0x100(zero)',
+              '       addi t1,a0,1',
+              '       add  t0,t0,t1',
+              '       sc   t0,0x100(zero)',
+              '       beq  t0,zero,retry',
+              '       nop',
+              '       addi v0,zero,10',
+              '       syscall']
+
+def makelist(lines):
+    instlist = siminstlist()
+    instlist.appendlines(lines)
+    return instlist
+
+class multicoretest(unittest.TestCase):
+    def test_atomic_add_all_cores(self):
+        res = runsystem({'source': ATOMIC_ADD, 'ncores': 4, 'quantum': 2})
+        self.assertEqual([core['stopreason'] for core in res['cores']], ['exit'] * 4)
+        system = simsystem(4, quantum = 2, syscalls = simsyscalls(simconsole()))
+        system.memory[0x100] = 0
+        system.loadinstlist(makelist(ATOMIC_ADD))
+        system.start()
+        system.run(1000)
+        self.assertTrue(system.halted)
+        self.assertEqual(system.memory[0x100], 1 + 2 + 3 + 4)
+
+    def test_store_breaks_reservation(self):
+        system = simsystem(2, quantum = 1)
+        system.memory[0x100] = 0
+        system.loadinstlist(makelist(['ll   t0,0x100(zero)', 'sc   t0,0x100(zero)']))
+        system.start()
+        cpu0, cpu1 = system.cores
+        cpu0.run(1)
+        cpu1.wrmem(0x100, 32, 5)
+        cpu0.run(1)
+        self.assertEqual(cpu0.gpreg[8], 0)
+        self.assertNotIn(cpu0, system.reservations)
+
+    def test_failed_sc_drops_reservation(self):
+        system = simsystem(2, quantum = 1)
+        system.memory[0x100] = 0
+        system.memory[0x104] = 0
+        system.loadinstlist(makelist(['ll   t0,0x100(zero)', 'sc   t0,0x104(zero)',
+                                      'll   t0,0x100(zero)', 'lw   t1,1(zero)']))
+        system.start()
+        cpu0, cpu1 = system.cores
+        cpu0.run(2)
+        self.assertEqual(cpu0.gpreg[8], 0)
+        self.assertEqual(system.reservations, {})
+        self.assertFalse(cpu0.llwatch or cpu1.llwatch)
+        self.assertNotIn('wrmem', cpu1.__dict__)
+        # exception clears the LL bit and the reservation as well
+        cpu0.run(2)
+        self.assertFalse(cpu0.llbit)
+        self.assertEqual(system.reservations, {})
+        self.assertFalse(cpu1.llwatch)
+
+    def test_core_number_and_stacks(self):
+        system = simsystem(3)
+        system.loadinstlist(makelist(['nop']))
+        system.start(0, stacktop = 0x80000)
+        self.assertEqual([cpu.gpreg[4] for cpu in system.cores], [0, 1, 2])
+        self.assertEqual([cpu.gpreg[29] for cpu in system.cores],
+                         [0x80000, 0x70000, 0x60000])
+        self.assertIs(system.cores[0].memory, system.cores[2].memory)
+
+    def test_step_back_restores_ll_bit(self):
+        cpu = simcpustate()
+        cpu.memory[0x100] = 0
+        cpu.loadinstlist(makelist(['ll   t0,0x100(zero)', 'nop']))
+        cpu.setundolog(10)
+        cpu.run(1)
+        self.assertTrue(cpu.llbit)
+        cpu.step_back()
+        self.assertFalse(cpu.llbit)
+
+if __name__ == '__main__':
+    unittest.main()
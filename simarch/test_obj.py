@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from simarch import siminstlist, simcpustate, DATA_BASE
+from simobj import simimage, writeimage, readimage
+
+SOURCE = ['start: addi t0,zero,3',
+          'loop:  addi t0,t0,-1',
+          '       bne  t0,zero,loop',
+          '       nop']
+
+class objtest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.instlist = siminstlist()
+        self.instlist.base = 0x1000
+        self.assertEqual(self.instlist.appendlines(SOURCE), [])
+        self.image = simimage.frominstlist(self.instlist, 0x1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def roundtrip(self, ext):
+        fname = os.path.join(self.tmpdir, 'prog' + ext)
+        self.assertTrue(writeimage(fname, self.image))
+        return readimage(fname, base = 0x1000)
+
+    def test_formats_keep_segments(self):
+        for ext in ('.bin', '.hex', '.srec', '.elf'):
+            image = self.roundtrip(ext)
+            self.assertEqual(image.merge(), self.image.merge(), ext)
+
+    def test_elf_symbols_and_entry(self):
+        image = self.roundtrip('.elf')
+        self.assertEqual(image.entry, 0x1000)
+        self.assertEqual(image.symbols, {'start': 0x1000, 'loop': 0x1004})
+
+    def test_instlist_from_image(self):
+        il = self.roundtrip('.elf').instlist()
+        self.assertEqual(il.base, 0x1000)
+        self.assertEqual(il.labels, self.instlist.labels)
+        self.assertEqual([inst.encoding for inst in il.instlist],
+                         [inst.encoding for inst in self.instlist.instlist])
+
+    def test_data_kept_out_of_code(self):
+        instlist = siminstlist()
+        instlist.appendlines(['.data', 'val: .word 7', '.text', 'lui  t0,0x1001', 'lw   t1,0(t0)'])
+        self.image = simimage.frominstlist(instlist, 0x1000)
+        self.assertEqual(len(self.roundtrip('.bin').segments[0][1]), 8)
+        for ext in ('.hex', '.srec'):
+            image = self.roundtrip(ext)
+            self.assertEqual(image.segments, self.image.segments, ext)
+            self.assertEqual(image.datasegs, self.image.datasegs, ext)
+            cpu = simcpustate()
+            image.load(cpu)
+            self.assertEqual(sorted(cpu.instmem), [0x1000, 0x1004])
+            self.assertEqual(cpu.memory[DATA_BASE], 7)
+
+    def test_little_endian_words(self):
+        image = simimage.frominstlist(self.instlist, 0x1000, bigendian = False)
+        data = image.segments[0][1]
+        word = self.instlist.instlist[0].encoding
+        self.assertEqual(ord(data[0]), word & 0xff)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+from simarch import siminstlist, simcpustate
+from simopt import simpeephole
+
+PROGRAM = ['main:  addi t0,zero,4',
+           '       nop',
+           'loop:  lw   t1,0x100(zero)',
+           '       addi t2,t1,1',
+           '       add  t3,t3,t2',
+           '       addi t0,t0,-1',
+           '       bne  t0,zero,loop',
+           '       nop',
+           '       or   t4,t3,zero',
+           '       or   t5,t4,zero',
+           '       break']
+
+def makelist(lines):
+    instlist = siminstlist()
+    instlist.appendlines(lines)
+    return instlist
+
+def runlist(instlist):
+    cpu = simcpustate()
+    cpu.memory[0x100] = 2
+    cpu.loadinstlist(instlist, 0)
+    cpu.run(1000)
+    return cpu
+
+class peepholetest(unittest.TestCase):
+    def test_fewer_cycles_same_result(self):
+        instlist = makelist(PROGRAM)
+        before = instlist.analyze_stall_forward()
+        opt = simpeephole(instlist)
+        optlist = opt.optimize()
+        self.assertLess(optlist.analyze_stall_forward(), before)
+        self.assertEqual(len(optlist.instlist), len(instlist.instlist) - 2)
+        self.assertEqual(sorted([kind for kind, i, text in opt.log]), ['fold', 'nop', 'slot'])
+        self.assertIn(('fold', 9, 'or    t5,t4,zero -> move  t5,t3'), opt.log)
+        ref = runlist(instlist)
+        res = runlist(optlist)
+        self.assertEqual(res.gpreg[11:14], ref.gpreg[11:14])
+        self.assertEqual(res.gpreg[13], 4 * 3)
+
+    def test_labels_and_targets_follow_moves(self):
+        optlist = simpeephole(makelist(PROGRAM)).optimize()
+        self.assertEqual(optlist.labels, {'main': 0, 'loop': 1})
+        branch = optlist.instlist[4]
+        self.assertEqual(branch.operation, 'bne')
+        self.assertEqual(branch.target(4 * 4), 4)
+
+    def test_source_list_untouched(self):
+        instlist = makelist(PROGRAM)
+        texts = [inst.astext() for inst in instlist.instlist]
+        simpeephole(instlist).optimize()
+        self.assertEqual([inst.astext() for inst in instlist.instlist], texts)
+
+    def test_dependent_slot_not_filled(self):
+        instlist = makelist(['addi t0,zero,1', 'beq  t0,zero,8', 'nop', 'break'])
+        optlist = simpeephole(instlist).optimize()
+        self.assertEqual([inst.operation for inst in optlist.instlist],
+                         ['addi', 'beq', 'nop', 'break'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from simarch import siminstlist, simcpustate, simconsole, simbus, simdevice
+from simperiph import mzapo
+
+class regdevice(simdevice):
+    def __init__(self):
+        self.regs = {}
+    def rdreg(self, offset):
+        return self.regs.get(offset, 0)
+    def wrreg(self, offset, val):
+        self.regs[offset] = val
+
+class bustest(unittest.TestCase):
+    def test_register_overlap(self):
+        bus = simbus()
+        self.assertTrue(bus.register(regdevice(), 0x1000, 0x10))
+        self.assertTrue(bus.register(regdevice(), 0x1010, 0x10))
+        self.assertFalse(bus.register(regdevice(), 0x100c, 0x10))
+        self.assertFalse(bus.register(regdevice(), 0x0ff0, 0x20))
+        self.assertEqual(bus.lookup(0x1014)[1], 4)
+        self.assertIsNone(bus.lookup(0x1020)[0])
+
+    def test_subword_access(self):
+        dev = regdevice()
+        dev.wrmem(0, 32, 0x11223344)
+        dev.wrmem(1, 8, 0xaa)
+        self.assertEqual(dev.rdmem(0, 32), 0x11aa3344)
+        self.assertEqual(dev.rdmem(2, 16), 0x3344)
+
+class mzapotest(unittest.TestCase):
+    def test_program_io(self):
+        console = simconsole('x')
+        board = mzapo(console)
+        instlist = siminstlist()
+        for line in ['lui  t0,0xffff', 'ori  t0,t0,0xc000',
+                     'lw   t1,0(t0)', 'lw   t2,4(t0)',
+                     'addi t3,zero,0x4f', 'sw   t3,12(t0)',
+                     'addi t3,zero,0x4b', 'sw   t3,12(t0)',
+                     'addi t3,zero,0x55', 'sw   t3,0x104(t0)',
+                     'lw   t4,0x124(t0)', 'sw   t3,0x100(zero)',
+                     'lw   t5,0x100(zero)']:
+            instlist.append(line)
+        cpu = simcpustate()
+        board.attach(cpu)
+        board.spiled.knobs = 0x1234
+        cpu.loadinstlist(instlist, 0)
+        cpu.run(13)
+        self.assertEqual(cpu.gpreg[9], 1)
+        self.assertEqual(cpu.gpreg[10], ord('x'))
+        self.assertEqual(console.getvalue(), 'OK')
+        self.assertEqual(board.spiled.led_line, 0x55)
+        self.assertEqual(cpu.gpreg[12], 0x1234)
+        # plain RAM is still reachable with the bus attached
+        self.assertEqual(cpu.gpreg[13], 0x55)
+
+    def test_lcd_framebuffer(self):
+        board = mzapo()
+        lcd = board.lcd
+        lcd.wrmem(0, 16, 0xf800)
+        lcd.wrmem(2, 32, 0x07e0001f)
+        self.assertEqual(lcd.pixel(0, 0), 0xf800)
+        self.assertEqual(lcd.pixel(1, 0), 0x07e0)
+        self.assertEqual(lcd.pixel(2, 0), 0x001f)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+
+from simarch import siminst, siminstlist, simcpustate
+from simpipeview import simpipeview, simtrace, simstreamtiming
+
+BODY = ['lw   t0,0(a0)', 'addi t1,t0,1', 'sw   t1,4(a0)', 'addi a0,a0,8',
+        'lw   t2,0(a0)', 'nop', 'add  t3,t2,t1']
+
+def makelist(lines):
+    instlist = siminstlist()
+    for line in lines:
+        instlist.append(line)
+    return instlist
+
+class pipeviewtest(unittest.TestCase):
+    def setUp(self):
+        self.instlist = makelist(BODY * 50)
+        self.cycles = self.instlist.analyze_stall_forward()
+
+    def test_rows_match_list_analysis(self):
+        view = simpipeview(self.instlist.instlist, checkpoint = 16, cachesize = 4)
+        rows = view.rows(0, len(self.instlist.instlist))
+        self.assertEqual([row.stalls for row in rows],
+                         [inst.stalls for inst in self.instlist.instlist])
+        self.assertEqual([row.forward for row in rows],
+                         [inst.forward for inst in self.instlist.instlist])
+        self.assertEqual(view.cycles(), self.cycles)
+
+    def test_window_after_checkpoints(self):
+        full = simpipeview(self.instlist.instlist, checkpoint = 16)
+        expected = full.rows(0, 350)[200:230]
+        view = simpipeview(self.instlist.instlist, checkpoint = 16, cachesize = 2)
+        self.assertEqual(view.rows(200, 230), expected)
+        self.assertLessEqual(len(view.cache), 2)
+
+    def test_rows_by_cycle(self):
+        view = simpipeview(self.instlist.instlist, checkpoint = 16)
+        rows = view.rowsbycycle(100, 110)
+        self.assertTrue(rows)
+        for row in rows:
+            self.assertTrue((row.fetch < 110) and (row.end > 100))
+
+    def test_trace_of_loop(self):
+        instlist = makelist(['addi t0,zero,3', 'lw   t1,0(zero)', 'add  t2,t2,t1',
+                             'addi t0,t0,-1', 'bne  t0,zero,-16', 'nop'])
+        cpu = simcpustate()
+        cpu.memory[0] = 1
+        cpu.loadinstlist(instlist, 0)
+        pcs = []
+        while cpu.run(1):
+            pcs.append(cpu.pc)
+            if cpu.pc == 6 * 4:
+                break
+        trace = simtrace([0] + pcs[:-1], cpu.instmem)
+        view = simpipeview(trace)
+        self.assertEqual(len(view), 16)
+        self.assertEqual([row.stalls for row in view.rows(0, 16)].count(1), 3)
+
+class streamtimingtest(unittest.TestCase):
+    def test_consume_matches_list_analysis(self):
+        body = makelist(BODY).instlist
+        instlist = siminstlist()
+        instlist.instlist = body * 50
+        cycles = instlist.analyze_stall_forward()
+        stalls = sum([inst.stalls for inst in body]) * 50
+        reports = []
+        timing = simstreamtiming()
+        stats = timing.consume(iter(instlist.instlist), reports.append, 100)
+        self.assertEqual(stats.cycles, cycles)
+        self.assertEqual(stats.stalls, stalls)
+        self.assertEqual(len(reports), 3)
+        self.assertLessEqual(len(timing.memo), 2 * len(BODY))
+
+    def test_memo_bounded_for_decoded_trace(self):
+        words = [inst.encoding for inst in makelist(BODY).instlist] * 200
+        timing = simstreamtiming()
+        stats = timing.consume(siminst.decode(w) for w in words)
+        self.assertEqual(stats.insts, len(words))
+        self.assertLessEqual(len(timing.memo), 2 * len(BODY))
+        small = simstreamtiming(memosize = 4)
+        self.assertEqual(small.consume(siminst.decode(w) for w in words), stats)
+        self.assertLessEqual(len(small.memo), 4)
+
+    def test_run_restores_instruction_memory(self):
+        instlist = makelist(['addi t0,zero,100', 'lw   t1,0x100(zero)', 'add  t2,t2,t1',
+                             'addi t0,t0,-1', 'bne  t0,zero,-16', 'nop', 'break'])
+        cpu = simcpustate()
+        cpu.memory[0x100] = 1
+        cpu.loadinstlist(instlist, 0)
+        ops = dict(cpu.instmem)
+        stats = simstreamtiming().run(cpu, 10000)
+        self.assertEqual(cpu.instmem, ops)
+        self.assertEqual(stats.insts, 1 + 5 * 100)
+        self.assertEqual(stats.stalls, 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from simarch import siminstlist, simcpustate
+from simprof import simprofiler, stallmap
+
+# main calls leaf twice, leaf has a load-use stall
+PROGRAM = ['main:  jal  leaf',
+           '       nop',
+           '       jal  leaf',
+           '       nop',
+           '       break',
+           'leaf:  lw   t0,0x100(zero)',
+           '       addi t1,t0,1',
+           '       jr   ra',
+           '       nop']
+
+def programcpu():
+    instlist = siminstlist()
+    instlist.appendlines(PROGRAM)
+    cpu = simcpustate()
+    cpu.memory[0x100] = 0
+    cpu.loadinstlist(instlist, 0)
+    return cpu, instlist
+
+class proftest(unittest.TestCase):
+    def test_call_paths(self):
+        cpu, instlist = programcpu()
+        prof = simprofiler(cpu, instlist.symbols(), stallmap(instlist))
+        prof.attach()
+        cpu.run(100)
+        res = dict([(';'.join(path), (insts, stalls, calls))
+                    for path, insts, stalls, calls in prof.results()])
+        self.assertEqual(res['main;leaf'], (8, 2, 2))
+        self.assertEqual(res['main'][0], 4)
+
+    def test_folded_output(self):
+        cpu, instlist = programcpu()
+        prof = simprofiler(cpu, instlist.symbols(), stallmap(instlist))
+        prof.attach()
+        cpu.run(100)
+        self.assertEqual(prof.folded('stalls'), ['main;leaf 2\n'])
+
+    def test_stall_map_from_timing(self):
+        cpu, instlist = programcpu()
+        self.assertEqual(stallmap(instlist), {6 * 4: 1})
+        self.assertEqual([inst.stalls for inst in instlist.instlist], [0] * len(PROGRAM))
+        prof = simprofiler(cpu, instlist.symbols())
+        prof.attach()
+        cpu.run(100)
+        self.assertEqual(prof.folded('stalls'), [])
+
+    def test_detach_restores_instructions(self):
+        cpu, instlist = programcpu()
+        ops = dict(cpu.instmem)
+        prof = simprofiler(cpu)
+        prof.attach()
+        prof.detach()
+        self.assertEqual(cpu.instmem, ops)
+
+if __name__ == '__main__':
+    unittest.main()
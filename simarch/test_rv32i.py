@@ -0,0 +1,61 @@
+import unittest
+
+from simarch import siminst, siminstlist, simcpustate_rv
+
+# encodings produced by GNU as for rv32i
+KNOWN = [
+    ('addi  t0,t0,-1', 0xfff28293),
+    ('bne   t0,zero,-4', 0xfe029ee3),
+    ('jal   ra,-8', 0xff9ff0ef),
+    ('lw    a0,8(sp)', 0x00812503),
+    ('sw    a0,-4(sp)', 0xfea12e23),
+    ('lui   a0,0x12345', 0x12345537),
+    ('add   a0,a1,a2', 0x00c58533),
+    ('sub   a0,a1,a2', 0x40c58533),
+    ('srai  a0,a1,3', 0x4035d513),
+]
+
+class rv32itest(unittest.TestCase):
+    def test_encode(self):
+        for text, encoding in KNOWN:
+            inst = siminst.parse_rv(text)
+            self.assertIsNotNone(inst, text)
+            self.assertEqual(inst.encoding, encoding, text)
+            self.assertEqual(inst.isa, 'rv')
+
+    def test_decode_roundtrip(self):
+        for text, encoding in KNOWN:
+            inst = siminst.decode_rv(encoding)
+            self.assertIsNotNone(inst, text)
+            self.assertEqual(inst.encoding, encoding, text)
+            again = siminst.parse_rv(inst.astext())
+            self.assertEqual(again.encoding, encoding, text)
+
+    def test_execute_loop(self):
+        instlist = siminstlist()
+        for text in ['li    t0,5', 'li    a0,0', 'add   a0,a0,t0',
+                     'addi  t0,t0,-1', 'bnez  t0,-8', 'sw    a0,0x100(zero)',
+                     'lw    a1,0x100(zero)']:
+            self.assertIsNotNone(instlist.append_rv(text), text)
+        cpu = simcpustate_rv()
+        cpu.loadinstlist(instlist, 0)
+        self.assertEqual(cpu.run(2 + 3 * 5 + 2), 2 + 3 * 5 + 2)
+        self.assertEqual(cpu.gpreg[10], 15)
+        self.assertEqual(cpu.gpreg[11], 15)
+        self.assertEqual(cpu.gpreg[5], 0)
+        self.assertEqual(cpu.pc, 7 * 4)
+
+    def test_load_use_forwarding(self):
+        instlist = siminstlist()
+        instlist.append_rv('lw    t0,0(sp)')
+        instlist.append_rv('add   t1,t0,sp')
+        instlist.append_rv('sub   t2,sp,t1')
+        instlist.analyze_stall_forward()
+        insts = instlist.instlist
+        self.assertEqual(insts[1].stalls, 1)
+        self.assertEqual(insts[1].forward, (1, 0))
+        self.assertEqual(insts[2].stalls, 0)
+        self.assertEqual(insts[2].forward, (0, 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import json
+
+from simserver import simserver, RPC_METHOD_NOT_FOUND, RPC_SESSION_ERROR
+from simserver import RPC_SIMULATION_ERROR, RPC_INVALID_PARAMS, RPC_INTERNAL_ERROR
+
+class fakechannel(object):
+    def __init__(self):
+        self.replies = []
+    def reply(self, obj):
+        self.replies.append(obj)
+
+SOURCE = '\n'.join(['addi t0,zero,100', 'loop: addi t0,t0,-1',
+                    'bne  t0,zero,-8', 'nop', 'addi v0,zero,10', 'syscall'])
+
+class servertest(unittest.TestCase):
+    def setUp(self):
+        self.server = simserver(('127.0.0.1', 0), slicesteps = 50)
+        self.channel = fakechannel()
+
+    def tearDown(self):
+        self.server.close()
+
+    def call(self, method, reqid = 1, **params):
+        req = {'jsonrpc': '2.0', 'method': method, 'params': params}
+        if reqid is not None:
+            req['id'] = reqid
+        self.server.request(self.channel, json.dumps(req))
+        if self.channel.replies:
+            return self.channel.replies.pop()
+        return None
+
+    def runjobs(self):
+        slices = 0
+        while self.server.jobs:
+            self.server.runslices()
+            slices += 1
+        return slices
+
+    def newsession(self):
+        sid = self.call('create')['result']['session']
+        res = self.call('assemble', session = sid, source = SOURCE)['result']
+        self.assertEqual(res['errors'], [])
+        self.call('load', session = sid)
+        return sid
+
+    def test_sliced_run(self):
+        sid = self.newsession()
+        self.assertIsNone(self.call('run', reqid = 7, session = sid, steps = 1000))
+        busy = self.call('regs', session = sid)
+        self.assertEqual(busy['error']['code'], RPC_SESSION_ERROR)
+        self.assertTrue(self.runjobs() > 1)
+        res = self.channel.replies.pop()
+        self.assertEqual(res['id'], 7)
+        self.assertEqual(res['result']['exitcode'], 0)
+        self.assertEqual(res['result']['steps'], 1 + 3 * 100 + 2)
+
+    def test_errors(self):
+        res = self.call('nosuch')
+        self.assertEqual(res['error']['code'], RPC_METHOD_NOT_FOUND)
+        self.server.request(self.channel, '{bad json')
+        self.assertIsNone(self.channel.replies.pop()['id'])
+
+    def test_bad_params_replied(self):
+        sid = self.newsession()
+        res = self.call('assemble', session = sid, source = 5)
+        self.assertEqual(res['error']['code'], RPC_INVALID_PARAMS)
+        self.server.request(self.channel, '{"jsonrpc": "2.0", "id": 2, "method": "run",'
+                            ' "params": {"session": %s, "steps": 1e400}}'%(json.dumps(sid)))
+        self.assertEqual(self.channel.replies.pop()['error']['code'], RPC_INVALID_PARAMS)
+        def failing():
+            raise RuntimeError('broken')
+        self.server.sessions[sid].regs = failing
+        self.assertEqual(self.call('regs', session = sid)['error']['code'], RPC_INTERNAL_ERROR)
+        self.assertEqual(self.server.jobs, [])
+        self.assertIn('result', self.call('state', session = sid))
+
+    def test_readmem_count_bounded(self):
+        sid = self.newsession()
+        self.assertEqual(len(self.call('readmem', session = sid, addr = 0, count = 4)['result']), 4)
+        res = self.call('readmem', session = sid, addr = 0, count = 10**8)
+        self.assertEqual(res['error']['code'], RPC_INVALID_PARAMS)
+
+    def test_session_ids_not_sequential(self):
+        sida = self.newsession()
+        sidb = self.newsession()
+        self.assertEqual(len(sida), 32)
+        self.assertNotEqual(sida, sidb)
+        res = self.call('regs', session = 1)
+        self.assertEqual(res['error']['code'], RPC_SESSION_ERROR)
+
+    def test_notifications_not_replied(self):
+        sid = self.newsession()
+        self.assertIsNone(self.call('nosuch', reqid = None))
+        self.assertIsNone(self.call('regs', reqid = None, session = 999))
+        self.assertIsNone(self.call('run', reqid = None, session = sid, steps = 1000))
+        self.runjobs()
+        self.assertEqual(self.channel.replies, [])
+        self.assertTrue(self.call('state', session = sid)['result']['halted'])
+
+    def test_dropped_channel_releases_session(self):
+        sid = self.newsession()
+        self.call('run', session = sid, steps = 1000)
+        self.server.dropchannel(self.channel)
+        self.assertEqual(self.server.jobs, [])
+        self.assertIn('result', self.call('regs', session = sid))
+
+    def test_run_failure_isolated(self):
+        sida = self.newsession()
+        sidb = self.newsession()
+        def failing(maxsteps):
+            raise RuntimeError('broken')
+        self.server.sessions[sida].cpu.run = failing
+        self.call('run', reqid = 1, session = sida, steps = 1000)
+        self.call('run', reqid = 2, session = sidb, steps = 1000)
+        self.runjobs()
+        replies = dict((r['id'], r) for r in self.channel.replies)
+        self.assertEqual(replies[1]['error']['code'], RPC_SIMULATION_ERROR)
+        self.assertEqual(replies[2]['result']['exitcode'], 0)
+        self.assertIn('result', self.call('regs', session = sida))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from simarch import siminstlist
+from simobj import simimage
+import simstats
+
+def encodings(lines, isa = 'mips'):
+    instlist = siminstlist()
+    if isa == 'riscv':
+        instlist.isa = 'rv'
+    instlist.appendlines(lines)
+    return instlist
+
+@unittest.skipIf(simstats.numpy is None, 'numpy is not available')
+class statstest(unittest.TestCase):
+    def test_mnemonics_and_unknown(self):
+        instlist = encodings(['addi t0,zero,1', 'addi t1,t0,-3', 'add  t2,t0,t1',
+                              'lw   t3,8(sp)'])
+        words = [inst.encoding for inst in instlist.instlist] + [0xfc000000]
+        mix = simstats.analyze_mix(words)
+        self.assertEqual(mix.count, 5)
+        self.assertEqual(mix.unknown, 1)
+        self.assertEqual(mix.mnemonic, {'addi': 2, 'add': 1, 'lw': 1})
+        self.assertEqual(mix.opcode[0x08], 2)
+        self.assertEqual(mix.funct[0x20], 1)
+        self.assertEqual(mix.rs[29], 1)
+
+    def test_branch_offsets_in_bytes(self):
+        lines = ['beq  t0,t1,-8', 'bne  t0,zero,0x40']
+        mix = simstats.analyze_mix([inst.encoding for inst in encodings(lines).instlist])
+        self.assertEqual(mix.branch, {-8: 1, 0x40: 1})
+        rv = encodings(lines + ['jal  ra,0x800', 'jal  zero,-0x1000'], 'riscv')
+        mix = simstats.analyze_mix([inst.encoding for inst in rv.instlist], 'riscv')
+        self.assertEqual(mix.branch, {-8: 1, 0x40: 1, 0x800: 1, -0x1000: 1})
+
+    def test_image_mix(self):
+        instlist = encodings(['addi t0,zero,1', 'nop'])
+        image = simimage.frominstlist(instlist, 0x400, bigendian = False)
+        mix = simstats.analyze_image_mix(image)
+        self.assertEqual(mix.count, 2)
+        self.assertEqual(mix.mnemonic.get('addi'), 1)
+
+if __name__ == '__main__':
+    unittest.main()
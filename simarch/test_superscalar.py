@@ -0,0 +1,52 @@
+import unittest
+
+from simarch import siminst, siminstlist, REG_HI, REG_LO
+
+def makelist(lines):
+    instlist = siminstlist()
+    for line in lines:
+        instlist.append(line)
+    return instlist
+
+MIXED = ['addi t0,zero,1', 'addi t1,zero,2', 'add  t2,t0,t1',
+         'lw   t3,0(t2)', 'add  t4,t3,t3', 'sw   t4,4(t2)',
+         'lw   t5,8(t2)', 'or   t6,t5,t0', 'beq  t6,zero,8', 'nop']
+
+class superscalartest(unittest.TestCase):
+    def test_register_masks(self):
+        inst = siminst.parse('add  t2,t0,t1')
+        self.assertEqual(inst.rdmask, (1 << 8) | (1 << 9))
+        self.assertEqual(inst.wrmask, 1 << 10)
+        inst = siminst.parse('jal  0x100')
+        self.assertEqual(inst.wrregs, (31,))
+        inst = siminst.parse('mult t0,t1')
+        self.assertEqual(inst.wrmask, (1 << REG_HI) | (1 << REG_LO))
+        inst = siminst.parse_rv('jal  ra,8')
+        self.assertEqual(inst.wrregs, (1,))
+
+    def test_single_issue_matches_pipeline(self):
+        instlist = makelist(MIXED)
+        res = instlist.analyze_superscalar(width = 1)
+        self.assertEqual(res.cycles, instlist.analyze_stall_forward())
+        self.assertTrue(all(len(group) == 1 for cycle, group in res.groups))
+
+    def test_dual_issue_pairing(self):
+        instlist = makelist(MIXED)
+        res = instlist.analyze_superscalar(width = 2)
+        groups = [group for cycle, group in res.groups]
+        # independent immediates pair, the dependent add waits
+        self.assertEqual(groups[0], [0, 1])
+        self.assertEqual(groups[1], [2])
+        # branch is issued alone in slot 0
+        self.assertIn([8, 9], groups)
+        self.assertTrue(res.cycles < instlist.analyze_superscalar(width = 1).cycles)
+
+    def test_memory_pairing_limit(self):
+        instlist = makelist(['lw   t0,0(sp)', 'lw   t1,4(sp)', 'lw   t2,8(sp)'])
+        res = instlist.analyze_superscalar(width = 2, maxmem = 1)
+        self.assertEqual(len(res.groups), 3)
+        res = instlist.analyze_superscalar(width = 2, maxmem = 2)
+        self.assertEqual([g for c, g in res.groups], [[0, 1], [2]])
+
+if __name__ == '__main__':
+    unittest.main()
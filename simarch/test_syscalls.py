@@ -0,0 +1,83 @@
+import unittest
+
+from simarch import siminstlist, simcpustate, simcpustate_rv
+from simarch import simconsole, simsyscalls
+
+def mipsprogram(lines, input = ''):
+    instlist = siminstlist()
+    for line in lines:
+        instlist.append(line)
+    cpu = simcpustate()
+    console = simconsole(input)
+    cpu.syscalls = simsyscalls(console)
+    cpu.loadinstlist(instlist, 0)
+    return cpu, console
+
+class syscalltest(unittest.TestCase):
+    def test_print_and_exit(self):
+        cpu, console = mipsprogram([
+            'addi v0,zero,4', 'addi a0,zero,0x100', 'syscall', 'nop',
+            'addi v0,zero,1', 'addi a0,zero,-42', 'syscall', 'nop',
+            'addi v0,zero,17', 'addi a0,zero,3', 'syscall', 'nop',
+            'addi t0,zero,1'])
+        cpu.wrmemblock(0x100, 'value \0')
+        cpu.run(100)
+        self.assertTrue(cpu.halted)
+        self.assertEqual(cpu.exitcode, 3)
+        self.assertEqual(console.getvalue(), 'value -42')
+        self.assertEqual(cpu.gpreg[8], 0)
+
+    def test_read_int_and_sbrk(self):
+        cpu, console = mipsprogram([
+            'addi v0,zero,5', 'syscall', 'add  s0,v0,zero',
+            'addi v0,zero,9', 'addi a0,zero,5', 'syscall', 'add  s1,v0,zero',
+            'addi v0,zero,9', 'addi a0,zero,4', 'syscall', 'add  s2,v0,zero',
+            'addi v0,zero,10', 'syscall'], input = '1234\n')
+        cpu.run(100)
+        self.assertEqual(cpu.exitcode, 0)
+        self.assertEqual(cpu.gpreg[16], 1234)
+        self.assertEqual(cpu.gpreg[17], 0x10040000)
+        self.assertEqual(cpu.gpreg[18], 0x10040008)
+        self.assertEqual(cpu.syscalls.brk, 0x1004000c)
+
+    def test_linux_write_buffered(self):
+        cpu, console = mipsprogram([
+            'addi v0,zero,4004', 'addi a0,zero,1', 'addi a1,zero,0x200',
+            'addi a2,zero,3', 'syscall', 'add  s0,v0,zero', 'add s1,a3,zero',
+            'addi v0,zero,4004', 'addi a0,zero,7', 'syscall',
+            'add  s2,v0,zero', 'add s3,a3,zero'])
+        cpu.wrmemblock(0x200, 'abc')
+        cpu.run(12)
+        self.assertEqual(console.getvalue(), 'abc')
+        self.assertEqual((cpu.gpreg[16], cpu.gpreg[17]), (3, 0))
+        # bad file descriptor reported as positive errno with a3 set
+        self.assertEqual((cpu.gpreg[18], cpu.gpreg[19]), (9, 1))
+
+    def test_console_flush_bulk(self):
+        out = []
+        class sink(object):
+            def write(self, s):
+                out.append(s)
+        console = simconsole(output = sink(), bufsize = 4)
+        console.write('ab')
+        self.assertEqual(out, [])
+        console.write('cd')
+        self.assertEqual(out, ['abcd'])
+        console.write('e')
+        console.flush()
+        self.assertEqual(out, ['abcd', 'e'])
+
+    def test_riscv_ecall(self):
+        instlist = siminstlist()
+        for line in ['li   a7,93', 'li   a0,7', 'ecall', 'li   t0,1']:
+            instlist.append_rv(line)
+        cpu = simcpustate_rv()
+        cpu.syscalls = simsyscalls()
+        cpu.loadinstlist(instlist, 0)
+        cpu.run(10)
+        self.assertTrue(cpu.halted)
+        self.assertEqual(cpu.exitcode, 7)
+        self.assertEqual(cpu.gpreg[5], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from simarch import siminstlist, simmuldiv, pipeconfig, simtiming
+
+PROGRAM = ['loop:  lw   t0,0(a0)',
+           '       addi t1,t0,1',
+           '       mult t1,t1',
+           '       mflo t2',
+           '       addi a0,a0,4',
+           '       bne  a0,a1,loop',
+           '       nop']
+
+def makelist(lines = PROGRAM):
+    instlist = siminstlist()
+    instlist.appendlines(lines)
+    return instlist
+
+def snapshot(instlist):
+    return [(inst.stalls, inst.forward) for inst in instlist.instlist]
+
+class timingtest(unittest.TestCase):
+    def test_list_not_modified(self):
+        instlist = makelist()
+        before = snapshot(instlist)
+        attrs = set(instlist.__dict__)
+        for model in ('forward', 'nofwd', 'cfg'):
+            res = instlist.timing(pipeconfig(model))
+            self.assertIsInstance(res, simtiming)
+            self.assertEqual(len(res), len(instlist.instlist))
+        instlist.timing(pipeconfig('forward', simmuldiv(multlatency = 4)))
+        self.assertEqual(snapshot(instlist), before)
+        self.assertEqual(set(instlist.__dict__), attrs)
+
+    def test_matches_wrappers(self):
+        for model, analyze in (('nofwd', 'analyze'), ('forward', 'analyze_stall_forward'),
+                               ('cfg', 'analyze_cfg')):
+            instlist = makelist()
+            res = instlist.timing(pipeconfig(model))
+            self.assertEqual(getattr(instlist, analyze)(), res.cycles)
+            self.assertEqual([inst.stalls for inst in instlist.instlist], list(res.stalls))
+            self.assertEqual([inst.forward for inst in instlist.instlist],
+                             [res.forward(i) for i in range(0, len(res))])
+
+    def test_configurations_sweep(self):
+        instlist = makelist()
+        results = [instlist.timing(pipeconfig('forward', simmuldiv(multlatency = l)))
+                   for l in (1, 4, 8)]
+        cycles = [res.cycles for res in results]
+        self.assertEqual(cycles, sorted(cycles))
+        self.assertLess(cycles[0], cycles[2])
+        self.assertEqual(results[1].muldivstats.busy, 4)
+        self.assertEqual(results[2].stalls[1], 1)
+        self.assertEqual(instlist.timing().cycles, instlist.timing(pipeconfig()).cycles)
+
+    def test_cfg_loop_back_edge(self):
+        # lw at the loop head follows the branch delay slot only
+        instlist = makelist(['loop: addi t0,t0,1', 'lw   t1,0(a0)', 'add  t2,t2,t1',
+                             'bne  t0,a1,loop', 'nop'])
+        forward = instlist.timing()
+        cfg = instlist.timing(pipeconfig('cfg'))
+        self.assertEqual(cfg.stalls[2], 1)
+        self.assertEqual(cfg.cycles, forward.cycles)
+        self.assertEqual(instlist.timing(pipeconfig('cfg', None, 0x400)).cycles, cfg.cycles)
+
+    def test_empty_list(self):
+        self.assertEqual(siminstlist().timing(pipeconfig('cfg')).cycles, 4)
+
+if __name__ == '__main__':
+    unittest.main()
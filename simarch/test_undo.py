@@ -0,0 +1,109 @@
+import unittest
+
+from simarch import siminstlist, simcpustate, simsyscalls, simconsole
+from simperiph import mzapo
+
+PROGRAM = ['addi t0,zero,3', 'addi t1,zero,0', 'add  t1,t1,t0',
+           'sw   t1,0x100(zero)', 'addi t0,t0,-1', 'bne  t0,zero,-16',
+           'nop', 'mult t1,t1', 'mflo t2']
+
+def programcpu(lines = PROGRAM):
+    instlist = siminstlist()
+    for line in lines:
+        instlist.append(line)
+    cpu = simcpustate()
+    cpu.loadinstlist(instlist, 0)
+    return cpu
+
+def archstate(cpu):
+    return (list(cpu.gpreg), cpu.pc, cpu.b_pend_pc, cpu.mhi, cpu.mlo,
+            dict(cpu.memory))
+
+class undotest(unittest.TestCase):
+    def test_step_back_restores_each_state(self):
+        cpu = programcpu()
+        cpu.setundolog(100)
+        states = [archstate(cpu)]
+        while cpu.run(1):
+            states.append(archstate(cpu))
+            if cpu.pc == 9 * 4:
+                break
+        self.assertEqual(cpu.gpreg[10], 36)
+        for state in reversed(states[:-1]):
+            self.assertEqual(cpu.step_back(), 1)
+            self.assertEqual(archstate(cpu), state)
+        self.assertEqual(cpu.step_back(), 0)
+
+    def test_replay_after_step_back(self):
+        cpu = programcpu()
+        cpu.setundolog(100)
+        cpu.run(10)
+        state = archstate(cpu)
+        cpu.run(5)
+        self.assertEqual(cpu.step_back(5), 5)
+        self.assertEqual(archstate(cpu), state)
+        cpu.run(5)
+        cpu.step_back(5)
+        self.assertEqual(archstate(cpu), state)
+
+    def test_capacity_bounds_log(self):
+        cpu = programcpu()
+        cpu.setundolog(4)
+        cpu.run(10)
+        self.assertEqual(cpu.step_back(10), 4)
+
+    def test_heap_break_undone(self):
+        cpu = programcpu(['addi v0,zero,9', 'addi a0,zero,16', 'syscall',
+                          'addi t0,zero,1'])
+        cpu.syscalls = simsyscalls(simconsole())
+        cpu.setundolog(10)
+        cpu.run(4)
+        self.assertEqual(cpu.syscalls.brk, 0x10040010)
+        cpu.step_back(2)
+        self.assertEqual(cpu.syscalls.brk, 0x10040000)
+        self.assertEqual(cpu.gpreg[2], 9)
+
+    def test_device_write_not_undone(self):
+        cpu = programcpu(['lui  t0,0xffff', 'ori  t0,t0,0xc000',
+                          'addi t1,zero,7', 'sw   t1,0x104(t0)',
+                          'addi t2,zero,1'])
+        board = mzapo()
+        board.attach(cpu)
+        cpu.setundolog(10)
+        cpu.run(5)
+        self.assertEqual(board.spiled.led_line, 7)
+        self.assertEqual(cpu.step_back(5), 1)
+        self.assertEqual(cpu.pc, 4 * 4)
+        self.assertNotIn(0xffffc104, cpu.memory)
+
+    def test_device_read_not_undone(self):
+        cpu = programcpu(['lui  t0,0xffff', 'ori  t0,t0,0xc000',
+                          'lw   t1,4(t0)', 'addi t2,zero,1'])
+        board = mzapo(simconsole('ab'))
+        board.attach(cpu)
+        cpu.setundolog(10)
+        cpu.run(4)
+        self.assertEqual(cpu.gpreg[9], ord('a'))
+        # the received character is consumed, re-execution would read 'b'
+        self.assertEqual(cpu.step_back(4), 1)
+        self.assertEqual(cpu.pc, 3 * 4)
+
+    def test_snapshot_restores_shared_memory_in_place(self):
+        cpu = programcpu()
+        cpu.syscalls = simsyscalls(simconsole())
+        memory = cpu.memory
+        snap = cpu.snapshot()
+        cpu.syscalls.brk += 0x100
+        cpu.run(100)
+        self.assertTrue(cpu.halted)
+        cpu.restore(snap)
+        self.assertIs(cpu.memory, memory)
+        self.assertEqual(cpu.syscalls.brk, 0x10040000)
+        self.assertFalse(cpu.halted)
+        self.assertEqual(cpu.pc, 0)
+        self.assertNotIn(0x100, cpu.memory)
+        cpu.run(100)
+        self.assertEqual(cpu.gpreg[10], 36)
+
+if __name__ == '__main__':
+    unittest.main()